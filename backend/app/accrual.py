@@ -0,0 +1,198 @@
+import argparse
+import calendar
+import json
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, case, exists, extract, func, insert, literal, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import AccrualRun, LeaveBalance, User
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+ACCRUAL_POLICY_FILE = os.getenv("ACCRUAL_POLICY_FILE")
+ACCRUAL_ROLES = [role.strip() for role in os.getenv("ACCRUAL_ROLES", "associate").split(",") if role.strip()]
+
+# annual_days: yearly allowance
+# frequency: "monthly" credits annual_days / 12 every period; "annual" credits the allowance in January
+#            and a pro-rated share to anyone who joins later in the year
+# carry_over_cap: balance kept at year end (None keeps everything, 0 lapses it)
+# prorate: scale the first credit by the join date
+DEFAULT_ACCRUAL_POLICIES = {
+    "AL": {"annual_days": 18, "frequency": "monthly", "carry_over_cap": 10, "prorate": True},
+    "CL": {"annual_days": 6, "frequency": "annual", "carry_over_cap": 0, "prorate": True},
+    "Sick": {"annual_days": 6, "frequency": "annual", "carry_over_cap": 0, "prorate": True},
+}
+
+
+class AccrualError(Exception):
+    """Invalid policy or period, or a period that has already been applied"""
+    pass
+
+
+def load_policies(path: Optional[str] = ACCRUAL_POLICY_FILE) -> Dict[str, Dict[str, Any]]:
+    """Accrual policies from a JSON file (same shape as DEFAULT_ACCRUAL_POLICIES), validated"""
+    if not path:
+        return DEFAULT_ACCRUAL_POLICIES
+    with open(path) as f:
+        policies = json.load(f)
+    for leave_type, policy in policies.items():
+        if not isinstance(policy.get("annual_days"), (int, float)) or policy["annual_days"] < 0:
+            raise AccrualError(f"{leave_type}: annual_days must be a non-negative number")
+        if policy.get("frequency") not in ("monthly", "annual"):
+            raise AccrualError(f"{leave_type}: frequency must be 'monthly' or 'annual'")
+        cap = policy.get("carry_over_cap")
+        if cap is not None and (not isinstance(cap, (int, float)) or cap < 0):
+            raise AccrualError(f"{leave_type}: carry_over_cap must be null or a non-negative number")
+        policy.setdefault("prorate", True)
+    return policies
+
+
+def parse_period(period: str) -> Tuple[int, int]:
+    try:
+        year, month = (int(part) for part in period.split("-"))
+        date(year, month, 1)
+    except ValueError:
+        raise AccrualError(f"Period must be YYYY-MM, got '{period}'")
+    return year, month
+
+
+def credit_expression(policy: Dict[str, Any], year: int, month: int):
+    """Per-user credit for one period as a SQL expression over the users table"""
+    days_in_month = calendar.monthrange(year, month)[1]
+    month_start = date(year, month, 1)
+    annual_days = float(policy["annual_days"])
+
+    if policy["frequency"] == "monthly":
+        amount = annual_days / 12
+        if not policy["prorate"]:
+            return literal(round(amount, 2))
+        # Joined this month: only the days from the join date count
+        return func.round(case(
+            (User.joined_on >= month_start,
+             amount * (days_in_month - extract("day", User.joined_on) + 1) / days_in_month),
+            else_=amount
+        ), 2)
+
+    if not policy["prorate"]:
+        return literal(annual_days)
+    # Joined this year: one twelfth per remaining month, counting the join month
+    return func.round(case(
+        (User.joined_on >= date(year, 1, 1), annual_days * (13 - extract("month", User.joined_on)) / 12.0),
+        else_=annual_days
+    ), 2)
+
+
+def run_accrual(db: Session, period: str, policies: Optional[Dict[str, Dict[str, Any]]] = None,
+                dry_run: bool = False, ran_by: Optional[str] = None, roles=None) -> Dict[str, Any]:
+    """
+    Apply one month's accruals (and, in January, the year-end carry-over caps) to every eligible user.
+
+    Everything runs as a handful of set-based statements per leave type inside one transaction;
+    a dry run rolls it back and only returns the report.
+    """
+    started = time.perf_counter()
+    policies = policies or load_policies()
+    roles = roles or ACCRUAL_ROLES
+    year, month = parse_period(period)
+    month_start = date(year, month, 1)
+    month_end = date(year, month, calendar.monthrange(year, month)[1])
+
+    already_applied = db.query(AccrualRun.id).filter_by(period=period).first() is not None
+    if already_applied and not dry_run:
+        raise AccrualError(f"Accrual for {period} has already been applied")
+
+    eligible_user = and_(User.role.in_(roles), or_(User.joined_on.is_(None), User.joined_on <= month_end))
+    eligible_ids = select(User.id).where(eligible_user)
+    report = {"period": period, "dry_run": dry_run, "already_applied": already_applied,
+              "rollover": month == 1, "leave_types": {}}
+
+    try:
+        for leave_type, policy in policies.items():
+            type_rows = and_(LeaveBalance.leave_type == leave_type, LeaveBalance.user_id.in_(eligible_ids))
+            balance_before = db.execute(select(func.coalesce(func.sum(LeaveBalance.balance), 0.0)).where(type_rows)).scalar()
+
+            # Every eligible user gets a balance row for every policy leave type
+            created = db.execute(insert(LeaveBalance).from_select(
+                ["user_id", "leave_type", "balance"],
+                select(User.id, literal(leave_type), literal(0.0)).where(
+                    eligible_user,
+                    ~exists().where(LeaveBalance.user_id == User.id, LeaveBalance.leave_type == leave_type)
+                )
+            )).rowcount
+
+            forfeited = 0.0
+            if month == 1 and policy.get("carry_over_cap") is not None:
+                cap = float(policy["carry_over_cap"])
+                over_cap = and_(type_rows, LeaveBalance.balance > cap)
+                forfeited = db.execute(
+                    select(func.coalesce(func.sum(LeaveBalance.balance - cap), 0.0)).where(over_cap)
+                ).scalar()
+                db.execute(update(LeaveBalance).where(over_cap).values(balance=cap).execution_options(synchronize_session=False))
+
+            if policy["frequency"] == "monthly":
+                credited_users = eligible_ids
+            elif month == 1:
+                credited_users = eligible_ids
+            else:
+                # Annual allowances were granted in January; only this month's joiners are owed a share
+                credited_users = eligible_ids.where(User.joined_on >= month_start)
+            credit = select(credit_expression(policy, year, month)).where(User.id == LeaveBalance.user_id).scalar_subquery()
+            credited = db.execute(
+                update(LeaveBalance)
+                .where(LeaveBalance.leave_type == leave_type, LeaveBalance.user_id.in_(credited_users))
+                .values(balance=LeaveBalance.balance + credit)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+            balance_after = db.execute(select(func.coalesce(func.sum(LeaveBalance.balance), 0.0)).where(type_rows)).scalar()
+            report["leave_types"][leave_type] = {
+                "rows_created": created,
+                "users_credited": credited,
+                "days_credited": round(balance_after - balance_before + forfeited, 2),
+                "days_forfeited": round(forfeited, 2),
+                "balance_before": round(balance_before, 2),
+                "balance_after": round(balance_after, 2),
+            }
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        if dry_run:
+            db.rollback()
+        else:
+            db.add(AccrualRun(period=period, ran_by=ran_by, report=json.dumps(report)))
+            db.commit()
+            logger.info(f"Accrual for {period} applied: {report['leave_types']}")
+        return report
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error running accrual for {period}: {e}")
+        db.rollback()
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply monthly leave accruals and January carry-over caps")
+    parser.add_argument("period", help="YYYY-MM")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without saving")
+    parser.add_argument("--policy-file", default=ACCRUAL_POLICY_FILE, help="JSON accrual policies")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = run_accrual(db, args.period, load_policies(args.policy_file), dry_run=args.dry_run, ran_by="cli")
+    except AccrualError as e:
+        raise SystemExit(f"❌ {e}")
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
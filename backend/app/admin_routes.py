@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, ORJSONResponse
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from collections import defaultdict
 import calendar
-from pydantic import BaseModel
-from typing import Optional
+import json
+import logging
+import os
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 
 from .database import get_db
-from .models import User, Team, Threshold, LeaveRequest, LeaveLog, Notification
+from .models import User, Team, Threshold, LeaveRequest, LeaveLog, Notification, AccrualRun
 from .auth import get_current_user
 from .logic import (
     process_leave_application, convert_cl_to_al,
@@ -15,6 +21,16 @@ from .logic import (
     calculate_weekly_shrinkage_with_carry_forward
 )
 from .email_utils import send_leave_email
+from .email_outbox import get_outbox_stats, requeue_dead_message
+from .bulk_import import BulkImportError, import_org, parse_users_csv
+from .executors import import_pool
+from .accrual import AccrualError, run_accrual
+from .leave_rollup import rebuild_leave_rollup
+from .slow_queries import slow_query_log
+from .profiler import profiler_control
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin")
 
@@ -40,13 +56,107 @@ class NotificationInput(BaseModel):
     user_id: int
     message: str
 
+class UserListItem(BaseModel):
+    id: int
+    username: Optional[str] = None
+    role: Optional[str] = None
+    team_id: Optional[int] = None
+    reports_to_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class TeamListItem(BaseModel):
+    id: int
+    name: Optional[str] = None
+    manager_id: Optional[int] = None
+    shrinkage_limit: Optional[float] = None
+
+class ThresholdListItem(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    month: Optional[str] = None
+    leave_count: Optional[int] = None
+
+class UserPage(BaseModel):
+    items: List[UserListItem]
+    next_after_id: Optional[int] = None
+    total: Optional[int] = None
+
+class TeamPage(BaseModel):
+    items: List[TeamListItem]
+    next_after_id: Optional[int] = None
+    total: Optional[int] = None
+
+class ThresholdPage(BaseModel):
+    items: List[ThresholdListItem]
+    next_after_id: Optional[int] = None
+    total: Optional[int] = None
+
+# -------------------- List Pagination --------------------
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Columns each list endpoint may return; hashed_password is deliberately absent
+USER_LIST_COLUMNS = {"id": User.id, "username": User.username, "role": User.role,
+                     "team_id": User.team_id, "reports_to_id": User.reports_to_id}
+TEAM_LIST_COLUMNS = {"id": Team.id, "name": Team.name, "manager_id": Team.manager_id,
+                     "shrinkage_limit": Team.shrinkage_limit}
+THRESHOLD_LIST_COLUMNS = {"id": Threshold.id, "user_id": Threshold.user_id, "month": Threshold.month,
+                          "leave_count": Threshold.leave_count}
+
+def project_columns(available: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """Columns named in a comma-separated `fields` parameter (all by default); id is always included for paging"""
+    if not fields:
+        return available
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s) {unknown}; choose from {list(available)}")
+    if "id" not in names:
+        names.insert(0, "id")
+    return {name: available[name] for name in names}
+
+def keyset_page(db: Session, columns: Dict[str, Any], filters: list, after_id: Optional[int],
+                limit: int, include_total: bool) -> ORJSONResponse:
+    """One page of rows ordered by id, starting after `after_id`, serialized with orjson"""
+    id_column = columns["id"]
+    stmt = select(*columns.values()).where(*filters)
+    if after_id is not None:
+        stmt = stmt.where(id_column > after_id)
+    rows = db.execute(stmt.order_by(id_column).limit(limit + 1)).all()
+
+    keys = list(columns)
+    items = [dict(zip(keys, row)) for row in rows[:limit]]
+    page = {"items": items, "next_after_id": items[-1]["id"] if len(rows) > limit else None, "total": None}
+    if include_total:
+        page["total"] = db.execute(select(func.count(id_column)).where(*filters)).scalar()
+    return ORJSONResponse(page)
+
 # -------------------- Users --------------------
-@router.get("/users")
-def list_users(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/users", response_model=UserPage)
+def list_users(
+    role: Optional[str] = Query(None),
+    team_id: Optional[int] = Query(None),
+    manager_id: Optional[int] = Query(None, description="Only users reporting to this manager"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,username"),
+    after_id: Optional[int] = Query(None, description="next_after_id from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     check_admin(current_user)
-    return db.query(User).all()
-
-@router.post("/users")
+    filters = []
+    if role:
+        filters.append(User.role == role)
+    if team_id is not None:
+        filters.append(User.team_id == team_id)
+    if manager_id is not None:
+        filters.append(User.reports_to_id == manager_id)
+    return keyset_page(db, project_columns(USER_LIST_COLUMNS, fields), filters, after_id, limit, include_total)
+
+@router.post("/users", response_model=UserListItem)
 def create_user(user_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     check_admin(current_user)
     password = user_data.pop("password", None)
@@ -60,7 +170,28 @@ def create_user(user_data: dict, db: Session = Depends(get_db), current_user: Us
     db.refresh(user)
     return user
 
-@router.put("/users/{user_id}")
+@router.post("/users/bulk-import")
+async def bulk_import_users(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Import users, teams and reporting lines from JSON ({"teams": [...], "users": [...]}) or a users CSV body"""
+    check_admin(current_user)
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            payload = {"teams": [], "users": parse_users_csv(body.decode("utf-8"))}
+        else:
+            payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse import file: {e}")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Import JSON must be an object with 'teams' and 'users' lists")
+
+    try:
+        # Password hashing is CPU-bound; keep it off the event loop and Starlette's shared threadpool
+        return await import_pool.run(import_org, db, payload)
+    except BulkImportError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+
+@router.put("/users/{user_id}", response_model=UserListItem)
 def update_user(user_id: int, user_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     check_admin(current_user)
     user = db.query(User).get(user_id)
@@ -85,10 +216,19 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User
     return {"message": "User deleted"}
 
 # -------------------- Teams --------------------
-@router.get("/teams")
-def list_teams(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/teams", response_model=TeamPage)
+def list_teams(
+    manager_id: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    after_id: Optional[int] = Query(None, description="next_after_id from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     check_admin(current_user)
-    return db.query(Team).all()
+    filters = [Team.manager_id == manager_id] if manager_id is not None else []
+    return keyset_page(db, project_columns(TEAM_LIST_COLUMNS, fields), filters, after_id, limit, include_total)
 
 @router.post("/teams")
 def create_team(team_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -120,10 +260,27 @@ def delete_team(team_id: int, db: Session = Depends(get_db), current_user: User
     return {"message": "Team deleted"}
 
 # -------------------- Thresholds --------------------
-@router.get("/thresholds")
-def list_thresholds(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/thresholds", response_model=ThresholdPage)
+def list_thresholds(
+    user_id: Optional[int] = Query(None),
+    month: Optional[str] = Query(None, description="YYYY-MM"),
+    team_id: Optional[int] = Query(None, description="Only thresholds of users in this team"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    after_id: Optional[int] = Query(None, description="next_after_id from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     check_admin(current_user)
-    return db.query(Threshold).all()
+    filters = []
+    if user_id is not None:
+        filters.append(Threshold.user_id == user_id)
+    if month:
+        filters.append(Threshold.month == month)
+    if team_id is not None:
+        filters.append(Threshold.user_id.in_(select(User.id).where(User.team_id == team_id)))
+    return keyset_page(db, project_columns(THRESHOLD_LIST_COLUMNS, fields), filters, after_id, limit, include_total)
 
 @router.post("/thresholds")
 def create_threshold(thresh_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -154,14 +311,111 @@ def delete_threshold(threshold_id: int, db: Session = Depends(get_db), current_u
     db.commit()
     return {"message": "Threshold deleted"}
 
-# -------------------- Calendar --------------------
-@router.get("/availability/next-30-days")
-def get_l5_calendar(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    if current_user.role != "l5":
-        raise HTTPException(status_code=403, detail="Only L5 Admins can access this")
+# -------------------- Email Outbox --------------------
+@router.get("/email-outbox")
+def email_outbox_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    check_admin(current_user)
+    return get_outbox_stats(db)
+
+@router.post("/email-outbox/{message_id}/retry")
+def retry_dead_email(message_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    check_admin(current_user)
+    if not requeue_dead_message(db, message_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered email not found")
+    return {"message": "Email requeued"}
 
+# -------------------- Accruals --------------------
+@router.get("/accruals")
+def list_accrual_runs(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    check_admin(current_user)
+    runs = db.query(AccrualRun).order_by(AccrualRun.period.desc()).all()
+    return [
+        {"period": run.period, "ran_at": run.ran_at, "ran_by": run.ran_by, "report": json.loads(run.report or "{}")}
+        for run in runs
+    ]
+
+@router.post("/accruals/{period}")
+def apply_accrual(period: str, dry_run: bool = Query(True, description="Report only; pass false to apply"),
+                  db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Apply a month's leave accruals (and January carry-over caps) to the whole org"""
+    check_admin(current_user)
+    try:
+        return run_accrual(db, period, dry_run=dry_run, ran_by=current_user.username)
+    except AccrualError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/leave-rollup/rebuild")
+def rebuild_rollup(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Recompute leave_rollup from leave_requests, repairing any drift"""
+    check_admin(current_user)
+    try:
+        rows = rebuild_leave_rollup(db.connection())
+        db.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Leave rollup rebuild failed: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Leave rollup rebuild failed")
+    return {"rows": rows}
+
+# -------------------- Slow Queries --------------------
+@router.get("/slow-queries")
+def list_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    full_scans_only: bool = Query(False, description="Only statements whose plan scans a whole table"),
+    current_user: User = Depends(get_current_user)
+):
+    """Most recent statements over the slow-query threshold, newest first, with their query plans"""
+    check_admin(current_user)
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "recorded": slow_query_log.recorded,
+        "entries": slow_query_log.entries(limit, full_scans_only),
+    }
+
+@router.delete("/slow-queries")
+def clear_slow_queries(current_user: User = Depends(get_current_user)):
+    check_admin(current_user)
+    slow_query_log.clear()
+    return {"message": "Slow-query log cleared"}
+
+# -------------------- Profiler --------------------
+class ProfilerArm(BaseModel):
+    requests: int = Field(1, ge=1, le=20)
+    path_prefix: str = ""
+    minutes: int = Field(10, ge=1, le=60)
+
+@router.get("/profiler")
+def profiler_status(current_user: User = Depends(get_current_user)):
+    check_admin(current_user)
+    return {**profiler_control.status(), "profiles": profiler_control.list_profiles()}
+
+@router.post("/profiler")
+def arm_profiler(data: ProfilerArm, current_user: User = Depends(get_current_user)):
+    """Profile the next `requests` requests under `path_prefix` (still subject to the profiler's rate limit)"""
+    check_admin(current_user)
+    logger.info(f"Profiler armed by {current_user.username}: {data.requests} request(s) under '{data.path_prefix}'")
+    return profiler_control.arm(data.requests, data.path_prefix, data.minutes)
+
+@router.delete("/profiler")
+def disarm_profiler(current_user: User = Depends(get_current_user)):
+    check_admin(current_user)
+    profiler_control.disarm()
+    return {"message": "Profiler disarmed"}
+
+@router.get("/profiles/{request_id}")
+def download_profile(request_id: str, current_user: User = Depends(get_current_user)):
+    """Speedscope JSON for one profiled request (open it at https://www.speedscope.app)"""
+    check_admin(current_user)
+    path = profiler_control.profile_path(request_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
+# -------------------- Calendar --------------------
+def build_l5_org_grid(db: Session, l5: User) -> List[Dict[str, Any]]:
+    """Per-team shrinkage for the next 30 weekdays across every team under the L5's managers"""
     # Step 1: Get all L4 managers who report to this L5
-    l4_managers = db.query(User).filter_by(reports_to_id=current_user.id, role="manager").all()
+    l4_managers = db.query(User).filter_by(reports_to_id=l5.id, role="manager").all()
     manager_ids = [m.id for m in l4_managers]
 
     # Step 2: Get all teams managed by these L4s
@@ -192,40 +446,22 @@ def get_l5_calendar(db: Session = Depends(get_db), current_user: User = Depends(
 
     return response
 
+def l5_org_grid_response(request: Request, db: Session, l5: User):
+    """The org grid from the response cache; every grid route shares the L5's entry"""
+    return response_cache.respond(request, db, scope=f"l5:{l5.id}", build=lambda: build_l5_org_grid(db, l5),
+                                  cache_key="l5-org-grid")
+
+@router.get("/availability/next-30-days")
+def get_l5_calendar(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    if current_user.role != "l5":
+        raise HTTPException(status_code=403, detail="Only L5 Admins can access this")
+    return l5_org_grid_response(request, db, current_user)
+
 @router.get("/availability/l5-next-30-days")
-def get_l5_availability(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_l5_availability(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     if current_user.role != "l5":
         raise HTTPException(status_code=403, detail="Only L5s allowed")
-
-    managers = db.query(User).filter_by(reports_to_id=current_user.id, role="manager").all()
-    manager_ids = [m.id for m in managers]
-
-    teams = db.query(Team).filter(Team.manager_id.in_(manager_ids)).all()
-
-    today = datetime.today().date()
-    result = []
-
-    for i in range(30):
-        target_date = today + timedelta(days=i)
-        if target_date.weekday() >= 5:
-            continue
-
-        day_data = {"date": target_date.isoformat(), "shrinkage_by_team": {}}
-        for team in teams:
-            total = db.query(User).filter_by(team_id=team.id, role="associate").count()
-            on_leave = db.query(LeaveRequest).join(User).filter(
-                LeaveRequest.start_date <= target_date,
-                LeaveRequest.end_date >= target_date,
-                LeaveRequest.status == "Approved",
-                User.team_id == team.id
-            ).count()
-
-            shrink = round((on_leave / total) * 100, 2) if total > 0 else 0
-            day_data["shrinkage_by_team"][team.name] = shrink
-
-        result.append(day_data)
-
-    return result
+    return l5_org_grid_response(request, db, current_user)
 
 # @router.get("/manager/monthly-shrinkage")
 # def get_monthly_carry_forward_report(year: int, month: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session, aliased
+
+from .data_versions import ORG_SCOPE, data_version
+from .database import SessionLocal
+from .models import LeaveLog, LeaveRequest, Team, User
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+ANALYTICS_BATCH_ROWS = int(os.getenv("ANALYTICS_BATCH_ROWS", 10000))
+MANIFEST_NAME = "_manifest.json"
+
+# format -> (file extension, media type)
+EXPORT_FORMATS = {
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+Manager = aliased(User)
+
+# Leaves are partitioned by the month they start in
+MONTH_KEY = (extract("year", LeaveRequest.start_date) * 100 + extract("month", LeaveRequest.start_date)).label("month_key")
+
+
+def require_pyarrow():
+    """Import pyarrow on first use so the API starts without it"""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for analytics exports: pip install pyarrow") from e
+    return pyarrow
+
+
+def leave_fact_schema(pa):
+    return pa.schema([
+        ("leave_id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("username", pa.string()),
+        ("role", pa.string()),
+        ("team_id", pa.int64()),
+        ("team_name", pa.string()),
+        ("manager_id", pa.int64()),
+        ("manager_username", pa.string()),
+        ("leave_type", pa.string()),
+        ("status", pa.string()),
+        ("start_date", pa.date32()),
+        ("end_date", pa.date32()),
+        ("is_half_day", pa.bool_()),
+        ("days", pa.float64()),
+        ("applied_on", pa.timestamp("us")),
+        ("month", pa.string()),
+    ])
+
+
+def build_leave_facts_query(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                            month_key: Optional[int] = None):
+    """Leave requests joined with their associate, team and manager"""
+    stmt = select(
+        LeaveRequest.id, LeaveRequest.user_id, User.username, User.role, User.team_id, Team.name,
+        User.reports_to_id, Manager.username, LeaveRequest.leave_type, LeaveRequest.status,
+        LeaveRequest.start_date, LeaveRequest.end_date, LeaveRequest.is_half_day, LeaveRequest.applied_on
+    ).join(
+        User, LeaveRequest.user_id == User.id
+    ).outerjoin(
+        Team, User.team_id == Team.id
+    ).outerjoin(
+        Manager, User.reports_to_id == Manager.id
+    )
+
+    if start_date:
+        stmt = stmt.where(LeaveRequest.end_date >= start_date)
+    if end_date:
+        stmt = stmt.where(LeaveRequest.start_date <= end_date)
+    if month_key is not None:
+        stmt = stmt.where(MONTH_KEY == month_key)
+    return stmt.order_by(LeaveRequest.id)
+
+
+def month_label(month_key: int) -> str:
+    return f"{month_key // 100:04d}-{month_key % 100:02d}"
+
+
+def iter_record_batches(db: Session, stmt, pa, batch_rows: int = ANALYTICS_BATCH_ROWS) -> Iterator[Any]:
+    """Stream query results as Arrow record batches of up to `batch_rows` rows"""
+    schema = leave_fact_schema(pa)
+    result = db.execute(stmt.execution_options(yield_per=batch_rows))
+    for rows in result.partitions():
+        (leave_ids, user_ids, usernames, roles, team_ids, team_names, manager_ids, manager_usernames,
+         leave_types, statuses, starts, ends, half_days, applied) = zip(*rows)
+        half_days = [bool(half) for half in half_days]
+        days = [
+            0.5 if half else ((end - start).days + 1 if start and end else None)
+            for start, end, half in zip(starts, ends, half_days)
+        ]
+        months = [start.strftime("%Y-%m") if start else None for start in starts]
+        columns = [
+            leave_ids, user_ids, usernames, roles, team_ids, team_names, manager_ids, manager_usernames,
+            leave_types, statuses, starts, ends, half_days, days, applied, months
+        ]
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+
+
+def write_leave_facts(db: Session, sink, fmt: str = "parquet", stmt=None,
+                      batch_rows: int = ANALYTICS_BATCH_ROWS) -> int:
+    """Write leave facts to `sink` (path or file) as an Arrow IPC file or Parquet; returns the row count"""
+    pa = require_pyarrow()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported analytics format: {fmt}")
+    schema = leave_fact_schema(pa)
+    stmt = stmt if stmt is not None else build_leave_facts_query()
+
+    # The IPC file format (not the stream format) so readers can memory-map it
+    if fmt == "arrow":
+        writer = pa.ipc.new_file(sink, schema)
+    else:
+        writer = pa.parquet.ParquetWriter(sink, schema)
+    rows = 0
+    try:
+        for batch in iter_record_batches(db, stmt, pa, batch_rows):
+            if fmt == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_batch(batch, row_group_size=batch_rows)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+def month_fingerprints(db: Session, since: Optional[int] = None) -> Dict[int, str]:
+    """
+    Per start-month fingerprint that changes when a leave in that month is added, removed or logged.
+
+    Each row also carries its user's team and manager, so any user or team write (the org version)
+    changes every month's fingerprint.
+    """
+    org_version = data_version(db, ORG_SCOPE)
+    query = db.query(
+        MONTH_KEY, func.count(func.distinct(LeaveRequest.id)), func.max(LeaveRequest.id), func.max(LeaveLog.id)
+    ).outerjoin(
+        LeaveLog, LeaveLog.leave_request_id == LeaveRequest.id
+    ).filter(LeaveRequest.start_date.isnot(None))
+    if since is not None:
+        query = query.filter(MONTH_KEY >= since)
+    return {
+        int(month_key): f"{count}:{max_leave_id}:{max_log_id}:{org_version}"
+        for month_key, count, max_leave_id, max_log_id in query.group_by(MONTH_KEY).all()
+    }
+
+
+def export_month_partitions(db: Session, out_dir: str, fmt: str = "parquet", since: Optional[str] = None,
+                            full: bool = False, batch_rows: int = ANALYTICS_BATCH_ROWS) -> Dict[str, List[str]]:
+    """
+    Write one file per start month under `out_dir/month=YYYY-MM/`, rewriting only changed months.
+
+    A manifest records each month's fingerprint; `since` (YYYY-MM) limits the run to later months
+    and `full` rewrites everything.
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    since_key = int(since.replace("-", "")) if since else None
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {"format": fmt, "partitions": {}}
+    if os.path.exists(manifest_path) and not full:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != fmt:
+            manifest = {"format": fmt, "partitions": {}}
+
+    partitions = manifest["partitions"]
+    summary = {"written": [], "unchanged": [], "removed": []}
+    current = month_fingerprints(db, since_key)
+
+    for month_key, fingerprint in sorted(current.items()):
+        label = month_label(month_key)
+        entry = partitions.get(label)
+        if entry and entry["fingerprint"] == fingerprint and os.path.exists(os.path.join(out_dir, entry["path"])):
+            summary["unchanged"].append(label)
+            continue
+
+        relative_path = os.path.join(f"month={label}", f"part-0.{extension}")
+        path = os.path.join(out_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        rows = write_leave_facts(db, tmp_path, fmt, build_leave_facts_query(month_key=month_key), batch_rows)
+        os.replace(tmp_path, path)
+        partitions[label] = {"fingerprint": fingerprint, "rows": rows, "path": relative_path}
+        summary["written"].append(label)
+
+    # Months in range that no longer have any leaves
+    for label in list(partitions):
+        month_key = int(label.replace("-", ""))
+        if month_key not in current and (since_key is None or month_key >= since_key):
+            shutil.rmtree(os.path.join(out_dir, f"month={label}"), ignore_errors=True)
+            del partitions[label]
+            summary["removed"].append(label)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logger.info(f"Analytics export to {out_dir}: {len(summary['written'])} written, "
+                f"{len(summary['unchanged'])} unchanged, {len(summary['removed'])} removed")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export leave facts as month-partitioned Parquet or Arrow files")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="parquet")
+    parser.add_argument("--since", help="Only export months from YYYY-MM onwards")
+    parser.add_argument("--full", action="store_true", help="Rewrite every partition, ignoring the manifest")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        summary = export_month_partitions(db, args.out, args.format, args.since, args.full)
+    finally:
+        db.close()
+    for key in ("written", "unchanged", "removed"):
+        print(f"{key}: {', '.join(summary[key]) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
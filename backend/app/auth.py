@@ -9,6 +9,7 @@ import secrets
 from typing import Optional
 
 from .models import User
+from .executors import PoolSaturated, auth_pool
 from app.database import get_db
 import logging
 
@@ -152,8 +153,15 @@ def check_rate_limit(username: str, ip: str):
     else:
         login_attempts[key] = (0, None)
 
+def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """The user if the password matches; the bcrypt check is the CPU-heavy part of logging in"""
+    user = db.query(User).filter(User.username == username).first()
+    if user and user.check_password(password):
+        return user
+    return None
+
 @router.post("/auth/token", response_model=Token)
-def login(
+async def login(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(get_db)
@@ -166,8 +174,9 @@ def login(
         # Check rate limiting before processing
         check_rate_limit(form_data.username, client_ip)
         
-        user = db.query(User).filter(User.username == form_data.username).first()
-        if not user or not user.check_password(form_data.password):
+        # On the auth pool: a burst of exports cannot take the threads logins need
+        user = await auth_pool.run(authenticate_user, db, form_data.username, form_data.password)
+        if not user:
             # Increment failed attempts
             key = f"{form_data.username}:{client_ip}"
             attempts, _ = login_attempts.get(key, (0, None))
@@ -199,7 +208,7 @@ def login(
         logger.info(f"User logged in: {user.username}")
         return create_tokens(user)
         
-    except HTTPException:
+    except (HTTPException, PoolSaturated):
         raise
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
@@ -0,0 +1,312 @@
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from io import StringIO
+from typing import Any, Dict, List, Optional, Tuple
+
+from passlib.hash import bcrypt
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import LeaveBalance, Team, User
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+BULK_IMPORT_HASH_WORKERS = int(os.getenv("BULK_IMPORT_HASH_WORKERS", os.cpu_count() or 1))
+BULK_IMPORT_BCRYPT_ROUNDS = int(os.getenv("BULK_IMPORT_BCRYPT_ROUNDS", 0)) or None  # None: passlib default
+DEFAULT_LEAVE_BALANCES = {"AL": 10, "CL": 10, "Sick": 10}
+VALID_ROLES = {"associate", "manager", "l5"}
+LOOKUP_CHUNK_SIZE = 500  # stays well under SQLite's bound-parameter limit
+BALANCE_COLUMN_PREFIX = "balance_"
+# Fields looked up, compared or hashed as text; anything else in a row would fail deep inside the import
+USER_TEXT_FIELDS = ("username", "password", "hashed_password", "role", "team", "manager")
+TEAM_TEXT_FIELDS = ("name", "manager")
+
+
+class BulkImportError(Exception):
+    """Raised with every validation problem found in an import file"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} validation error(s) in import")
+
+
+# -------------------- Parsing --------------------
+def _blank_to_none(value: Optional[str]) -> Optional[str]:
+    value = value.strip() if isinstance(value, str) else value
+    return value or None
+
+
+def parse_users_csv(text: str) -> List[Dict[str, Any]]:
+    """
+    Users CSV with columns username, password, role, team, manager and optional joined_on (YYYY-MM-DD).
+
+    Optional hashed_password replaces password; balance_<type> columns (e.g. balance_AL) override default balances.
+    """
+    users = []
+    for row in csv.DictReader(StringIO(text)):
+        user = {key: _blank_to_none(row.get(key))
+                for key in ("username", "password", "hashed_password", "role", "team", "manager", "joined_on")}
+        balances = {
+            key[len(BALANCE_COLUMN_PREFIX):]: float(value)
+            for key, value in row.items()
+            if key and key.startswith(BALANCE_COLUMN_PREFIX) and _blank_to_none(value) is not None
+        }
+        if balances:
+            user["balances"] = {**DEFAULT_LEAVE_BALANCES, **balances}
+        users.append(user)
+    return users
+
+
+def parse_teams_csv(text: str) -> List[Dict[str, Any]]:
+    """Teams CSV with columns name, manager and optional shrinkage_limit"""
+    teams = []
+    for row in csv.DictReader(StringIO(text)):
+        team = {"name": _blank_to_none(row.get("name")), "manager": _blank_to_none(row.get("manager"))}
+        if _blank_to_none(row.get("shrinkage_limit")) is not None:
+            team["shrinkage_limit"] = float(row["shrinkage_limit"])
+        teams.append(team)
+    return teams
+
+
+def load_payload(path: str, teams_path: Optional[str] = None) -> Dict[str, Any]:
+    """Read a JSON payload ({"teams": [...], "users": [...]}) or a users CSV plus optional teams CSV"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        payload = json.loads(text)
+    else:
+        payload = {"teams": [], "users": parse_users_csv(text)}
+    if teams_path:
+        with open(teams_path, encoding="utf-8") as f:
+            payload["teams"] = payload.get("teams", []) + parse_teams_csv(f.read())
+    return payload
+
+
+# -------------------- Password Hashing --------------------
+def _hash_password(args: Tuple[str, Optional[int]]) -> str:
+    password, rounds = args
+    return (bcrypt.using(rounds=rounds) if rounds else bcrypt).hash(password)
+
+
+def hash_passwords(passwords: List[str], workers: int = BULK_IMPORT_HASH_WORKERS,
+                   rounds: Optional[int] = BULK_IMPORT_BCRYPT_ROUNDS) -> List[str]:
+    """bcrypt-hash passwords across a process pool, preserving order"""
+    jobs = [(password, rounds) for password in passwords]
+    if workers <= 1 or len(jobs) < 2:
+        return [_hash_password(job) for job in jobs]
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return list(executor.map(_hash_password, jobs, chunksize=chunksize))
+
+
+# -------------------- Validation --------------------
+def _existing_by_name(db: Session, column, names: List[str]) -> Dict[str, int]:
+    """Map names to ids for rows that already exist, querying in chunks"""
+    model = column.class_
+    found = {}
+    for i in range(0, len(names), LOOKUP_CHUNK_SIZE):
+        chunk = names[i:i + LOOKUP_CHUNK_SIZE]
+        for row_id, name in db.execute(select(model.id, column).where(column.in_(chunk))):
+            found.setdefault(name, row_id)
+    return found
+
+
+def _shape_errors(section: str, rows: Any, text_fields: Tuple[str, ...]) -> List[str]:
+    """Problems with the structure of a `users` or `teams` list, before any value is looked up"""
+    if not isinstance(rows, list):
+        return [f"{section} must be a list of objects"]
+    errors = []
+    for row, entry in enumerate(rows, start=1):
+        if not isinstance(entry, dict):
+            errors.append(f"{section} row {row}: must be an object")
+            continue
+        for field in text_fields:
+            if entry.get(field) is not None and not isinstance(entry[field], str):
+                errors.append(f"{section} row {row}: {field} must be a string")
+        if entry.get("balances") is not None and not isinstance(entry["balances"], dict):
+            errors.append(f"{section} row {row}: balances must be an object")
+    return errors
+
+
+def validate_payload(db: Session, payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Check the whole payload in one pass; returns (teams, users) or raises BulkImportError with every problem"""
+    errors = []
+    teams = payload.get("teams") or []
+    users = payload.get("users") or []
+    if not users and not teams:
+        raise BulkImportError(["Import contains no users or teams"])
+    shape_errors = _shape_errors("teams", teams, TEAM_TEXT_FIELDS) + _shape_errors("users", users, USER_TEXT_FIELDS)
+    if shape_errors:
+        raise BulkImportError(shape_errors)
+
+    usernames = [user.get("username") for user in users]
+    existing_users = _existing_by_name(db, User.username, [name for name in usernames if name])
+    team_names = {team.get("name") for team in teams} | {user.get("team") for user in users}
+    existing_teams = _existing_by_name(db, Team.name, sorted(name for name in team_names if name))
+    known_users = set(existing_users) | {name for name in usernames if name}
+
+    seen = set()
+    for row, user in enumerate(users, start=1):
+        name = user.get("username")
+        if not name:
+            errors.append(f"users row {row}: username is required")
+            continue
+        if name in seen:
+            errors.append(f"users row {row}: duplicate username '{name}'")
+        seen.add(name)
+        if name in existing_users:
+            errors.append(f"users row {row}: user '{name}' already exists")
+        if user.get("role") not in VALID_ROLES:
+            errors.append(f"users row {row}: role must be one of {sorted(VALID_ROLES)}")
+        if not user.get("password") and not user.get("hashed_password"):
+            errors.append(f"users row {row}: password is required")
+        if user.get("joined_on"):
+            try:
+                user["joined_on"] = date.fromisoformat(str(user["joined_on"]))
+            except ValueError:
+                errors.append(f"users row {row}: joined_on must be YYYY-MM-DD")
+        manager = user.get("manager")
+        if manager == name:
+            errors.append(f"users row {row}: '{name}' cannot report to themselves")
+        elif manager and manager not in known_users:
+            errors.append(f"users row {row}: unknown manager '{manager}'")
+
+    seen_teams = set()
+    for row, team in enumerate(teams, start=1):
+        name = team.get("name")
+        if not name:
+            errors.append(f"teams row {row}: name is required")
+            continue
+        if name in seen_teams or name in existing_teams:
+            errors.append(f"teams row {row}: team '{name}' already exists")
+        seen_teams.add(name)
+        if team.get("manager") and team["manager"] not in known_users:
+            errors.append(f"teams row {row}: unknown manager '{team['manager']}'")
+
+    if errors:
+        raise BulkImportError(errors)
+    return teams, users
+
+
+# -------------------- Import --------------------
+def import_org(db: Session, payload: Dict[str, Any], workers: int = BULK_IMPORT_HASH_WORKERS,
+               rounds: Optional[int] = BULK_IMPORT_BCRYPT_ROUNDS) -> Dict[str, Any]:
+    """
+    Validate and insert teams, users, reporting lines and leave balances in a single transaction.
+
+    Teams that users reference but the payload does not define are created without a manager.
+    Users get DEFAULT_LEAVE_BALANCES unless they carry their own "balances" mapping ({} for none).
+    """
+    started = time.perf_counter()
+    teams, users = validate_payload(db, payload)
+
+    to_hash = [user for user in users if not user.get("hashed_password")]
+    for user, hashed in zip(to_hash, hash_passwords([user["password"] for user in to_hash], workers, rounds)):
+        user["hashed_password"] = hashed
+    hashed_at = time.perf_counter()
+
+    try:
+        # Teams first, so users can be inserted with their team_id
+        team_rows = {team["name"]: team for team in teams}
+        for user in users:
+            if user.get("team") and user["team"] not in team_rows:
+                team_rows[user["team"]] = {"name": user["team"]}
+        existing_teams = _existing_by_name(db, Team.name, list(team_rows))
+        new_teams = [
+            {"name": name, "shrinkage_limit": team.get("shrinkage_limit", 10.0)}
+            for name, team in team_rows.items() if name not in existing_teams
+        ]
+        if new_teams:
+            db.execute(insert(Team), new_teams)
+        team_ids = _existing_by_name(db, Team.name, list(team_rows))
+
+        if users:
+            db.execute(insert(User), [
+                {
+                    "username": user["username"],
+                    "hashed_password": user["hashed_password"],
+                    "role": user["role"],
+                    "team_id": team_ids.get(user.get("team")),
+                    "joined_on": user.get("joined_on"),
+                }
+                for user in users
+            ])
+
+        # Reporting lines and team managers can point anywhere in the file, so resolve them once every id exists
+        referenced = {user["username"] for user in users}
+        referenced |= {user["manager"] for user in users if user.get("manager")}
+        referenced |= {team["manager"] for team in teams if team.get("manager")}
+        user_ids = _existing_by_name(db, User.username, sorted(referenced))
+
+        reporting_lines = [
+            {"id": user_ids[user["username"]], "reports_to_id": user_ids[user["manager"]]}
+            for user in users if user.get("manager")
+        ]
+        if reporting_lines:
+            db.execute(update(User), reporting_lines)
+        team_managers = [
+            {"id": team_ids[team["name"]], "manager_id": user_ids[team["manager"]]}
+            for team in teams if team.get("manager")
+        ]
+        if team_managers:
+            db.execute(update(Team), team_managers)
+
+        balances = [
+            {"user_id": user_ids[user["username"]], "leave_type": leave_type, "balance": balance}
+            for user in users
+            for leave_type, balance in (user["balances"] if user.get("balances") is not None else DEFAULT_LEAVE_BALANCES).items()
+        ]
+        if balances:
+            db.execute(insert(LeaveBalance), balances)
+
+        db.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during bulk import: {e}")
+        db.rollback()
+        raise
+
+    summary = {
+        "users_created": len(users),
+        "teams_created": len(new_teams),
+        "reporting_lines": len(reporting_lines),
+        "balances_created": len(balances),
+        "hash_seconds": round(hashed_at - started, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Bulk import finished: {summary}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users, teams and reporting lines")
+    parser.add_argument("path", help="users CSV, or JSON with 'teams' and 'users' lists")
+    parser.add_argument("--teams", help="Optional teams CSV (name, manager, shrinkage_limit)")
+    parser.add_argument("--workers", type=int, default=BULK_IMPORT_HASH_WORKERS, help="Password hashing processes")
+    args = parser.parse_args()
+
+    payload = load_payload(args.path, args.teams)
+    db = SessionLocal()
+    try:
+        summary = import_org(db, payload, workers=args.workers)
+    except BulkImportError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        raise SystemExit(1)
+    finally:
+        db.close()
+    print(f"✅ Imported {summary['users_created']} users and {summary['teams_created']} teams "
+          f"in {summary['total_seconds']}s (hashing {summary['hash_seconds']}s)")
+
+
+if __name__ == "__main__":
+    main()
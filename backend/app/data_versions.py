@@ -0,0 +1,128 @@
+"""
+Per-scope data versions in the cache_versions table, bumped in the same transaction as every write
+to a tracked table. Response and report caches key their entries on these versions.
+
+The hooks are installed when this module is imported, which app.database does, so every writer
+(the API, bulk_import, seed and accrual CLIs, ad-hoc scripts) bumps them. Models are looked up
+through the module at call time because app.database imports this while app.models may still be
+initialising.
+"""
+from typing import Dict
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from . import models
+
+# Scopes: "global" (any tracked write), "team:<id>" (leaves and members of a team), "manager:<id>" (leaves and
+# members of a manager's direct reports), "all-teams" (writes every team-scoped payload depends on) and "org"
+# (users and teams only, for payloads that denormalise who is in which team under which manager).
+GLOBAL_SCOPE = "global"
+ALL_TEAMS_SCOPE = "all-teams"  # bumped by writes that cannot be pinned to particular teams
+ORG_SCOPE = "org"
+
+
+def tracked_models() -> tuple:
+    """Writes to these tables can change a cached payload"""
+    return (models.LeaveRequest, models.LeaveLog, models.User, models.Team, models.OptionalLeaveDate)
+
+
+def team_scope(team_id: int) -> str:
+    return f"team:{team_id}"
+
+
+def manager_scope(manager_id: int) -> str:
+    return f"manager:{manager_id}"
+
+
+def _bump_statement(bind, scopes):
+    table = models.CacheVersion.__table__
+    insert = postgresql.insert if bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(table).values([{"scope": scope, "version": 1} for scope in sorted(scopes)])
+    return stmt.on_conflict_do_update(index_elements=["scope"], set_={"version": table.c.version + 1})
+
+
+def _reporting_scopes(connection, user_ids) -> set:
+    """team: and manager: scopes of the given users"""
+    User = models.User
+    rows = connection.execute(select(User.team_id, User.reports_to_id).where(User.id.in_(user_ids)))
+    scopes = set()
+    for team_id, reports_to_id in rows:
+        if team_id:
+            scopes.add(team_scope(team_id))
+        if reports_to_id:
+            scopes.add(manager_scope(reports_to_id))
+    return scopes
+
+
+def _user_scopes(user) -> set:
+    """Scopes of a user's current and previous team and manager"""
+    scopes = set()
+    for attribute, scope in (("team_id", team_scope), ("reports_to_id", manager_scope)):
+        history = get_history(user, attribute)
+        for value in (*history.added, *history.unchanged, *history.deleted):
+            if value:
+                scopes.add(scope(value))
+    return scopes
+
+
+def _after_flush(session: Session, flush_context):
+    scopes, user_ids, leave_ids = set(), set(), set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, models.LeaveRequest):
+            user_ids.add(instance.user_id)
+        elif isinstance(instance, models.LeaveLog):
+            leave_ids.add(instance.leave_request_id)
+        elif isinstance(instance, models.User):
+            scopes |= _user_scopes(instance) | {ORG_SCOPE}
+        elif isinstance(instance, models.Team):
+            scopes |= {team_scope(instance.id), ORG_SCOPE}
+        elif isinstance(instance, models.OptionalLeaveDate):
+            scopes.add(ALL_TEAMS_SCOPE)
+        else:
+            continue
+        scopes.add(GLOBAL_SCOPE)
+    if not scopes:
+        return
+    connection = session.connection()
+    if leave_ids:
+        LeaveRequest = models.LeaveRequest
+        user_ids |= set(connection.execute(select(LeaveRequest.user_id).where(LeaveRequest.id.in_(leave_ids))).scalars())
+    user_ids.discard(None)
+    if user_ids:
+        scopes |= _reporting_scopes(connection, user_ids)
+    connection.execute(_bump_statement(connection, scopes))
+
+
+def _do_orm_execute(state):
+    # Core-style insert(User) / update(LeaveRequest) through the session skip the flush
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None \
+            and issubclass(state.bind_mapper.class_, tracked_models()):
+        scopes = {GLOBAL_SCOPE, ALL_TEAMS_SCOPE}
+        if issubclass(state.bind_mapper.class_, (models.User, models.Team)):
+            scopes.add(ORG_SCOPE)
+        connection = state.session.connection()
+        connection.execute(_bump_statement(connection, scopes))
+
+
+def install_version_hooks():
+    """Bump the affected data versions inside every session transaction that writes a tracked table"""
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+
+def data_versions(db: Session, scopes) -> Dict[str, int]:
+    """Current version of each scope in one query; shared by every worker because it lives in the database"""
+    CacheVersion = models.CacheVersion
+    found = dict(db.execute(select(CacheVersion.scope, CacheVersion.version).where(CacheVersion.scope.in_(scopes))).all())
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+def data_version(db: Session, scope: str = GLOBAL_SCOPE) -> int:
+    return data_versions(db, [scope])[scope]
+
+
+install_version_hooks()
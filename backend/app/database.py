@@ -3,7 +3,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # -------------------- Configuration --------------------
-DATABASE_URL = "sqlite:///app/app.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///app/app.db")
 ECHO_LOG = os.getenv("SQLALCHEMY_ECHO", "False").lower() == "true"
 
 # -------------------- Engine & Session --------------------
@@ -25,3 +25,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Registered with the session factory rather than the app, so CLIs and scripts that write through
+# SessionLocal bump the cache versions and keep leave_rollup current too
+from . import data_versions, leave_rollup  # noqa: E402,F401
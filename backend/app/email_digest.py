@@ -0,0 +1,82 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .email_utils import MANAGER_DIGEST_WINDOW_MINUTES, queue_email, render_manager_digest_email
+from .logic import EMAIL_DOMAIN, get_pending_approvals, split_urgent_approvals
+from .models import LeaveRequest, ManagerDigestState, User
+
+logger = logging.getLogger(__name__)
+
+
+def queue_due_manager_digests(db: Session, now: Optional[datetime] = None,
+                              window_minutes: int = MANAGER_DIGEST_WINDOW_MINUTES) -> int:
+    """
+    Queue one digest email per manager whose new pending leaves have waited a full window.
+
+    A manager's window opens with the first pending leave applied after their last digest;
+    every pending leave that arrives before it closes goes into the same email.
+    Returns the number of digests queued.
+    """
+    now = now or datetime.utcnow()
+    window_start_cutoff = now - timedelta(minutes=window_minutes)
+    try:
+        # Oldest not-yet-digested pending leave per manager, kept only once its window has closed
+        due = db.query(
+            User.reports_to_id, func.min(LeaveRequest.applied_on)
+        ).select_from(LeaveRequest).join(
+            User, LeaveRequest.user_id == User.id
+        ).outerjoin(
+            ManagerDigestState, ManagerDigestState.manager_id == User.reports_to_id
+        ).filter(
+            LeaveRequest.status == "Pending",
+            User.reports_to_id.isnot(None),
+            or_(
+                ManagerDigestState.last_sent_at.is_(None),
+                LeaveRequest.applied_on > ManagerDigestState.last_sent_at
+            )
+        ).group_by(User.reports_to_id).having(
+            func.min(LeaveRequest.applied_on) <= window_start_cutoff
+        ).all()
+
+        due_manager_ids = [manager_id for manager_id, _ in due]
+        if not due_manager_ids:
+            return 0
+
+        managers = {m.id: m for m in db.query(User).filter(User.id.in_(due_manager_ids)).all()}
+        states = {s.manager_id: s for s in db.query(ManagerDigestState).filter(
+            ManagerDigestState.manager_id.in_(due_manager_ids)
+        ).all()}
+
+        queued = 0
+        for manager_id in due_manager_ids:
+            manager = managers.get(manager_id)
+            if not manager:
+                continue
+            approvals = get_pending_approvals(db, manager_id)
+            if approvals:
+                urgent_ids = {leave["leave_id"] for leave in split_urgent_approvals(approvals, today=now.date())}
+                subject, html_body = render_manager_digest_email(manager.username, approvals, urgent_ids)
+                queue_email(db, f"{manager.username}{EMAIL_DOMAIN}", subject, html_body)
+                queued += 1
+
+            state = states.get(manager_id)
+            if state is None:
+                state = ManagerDigestState(manager_id=manager_id)
+                db.add(state)
+            state.last_sent_at = now
+
+        db.commit()
+        if queued:
+            logger.info(f"Queued {queued} manager digest email(s)")
+        return queued
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error queuing manager digests: {e}")
+        db.rollback()
+        return 0
+
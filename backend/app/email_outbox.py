@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .email_digest import queue_due_manager_digests
+from .email_utils import MANAGER_DIGEST_ENABLED, deliver_email
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", 5))
+OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", 30))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", 3600))
+OUTBOX_CLAIM_TIMEOUT_SECONDS = float(os.getenv("EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS", 600))
+
+
+class OutboxMetrics:
+    """Thread-safe delivery counters for the outbox worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_batch_seconds = 0.0
+        self.last_drain_at: Optional[datetime] = None
+
+    def record_batch(self, sent: int, failed: int, dead: int, elapsed: float) -> None:
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+            self.dead_lettered += dead
+            self.batches += 1
+            self.last_batch_size = sent + failed
+            self.last_batch_seconds = elapsed
+            self.last_drain_at = datetime.utcnow()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            rate = self.last_batch_size / self.last_batch_seconds if self.last_batch_seconds > 0 else 0.0
+            return {
+                "sent": self.sent,
+                "failed_attempts": self.failed,
+                "dead_lettered": self.dead_lettered,
+                "batches": self.batches,
+                "last_batch_size": self.last_batch_size,
+                "last_batch_seconds": round(self.last_batch_seconds, 4),
+                "last_batch_messages_per_second": round(rate, 2),
+                "last_drain_at": self.last_drain_at.isoformat() if self.last_drain_at else None,
+            }
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given attempt number (1-based)"""
+    delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_due_messages(db: Session, now: datetime, limit: int) -> List[EmailOutbox]:
+    """Mark up to `limit` due messages as Sending and return them"""
+    # Messages stuck in Sending (worker crashed mid-batch) become due again
+    db.execute(
+        update(EmailOutbox)
+        .where(
+            EmailOutbox.status == "Sending",
+            EmailOutbox.claimed_at < now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT_SECONDS),
+        )
+        .values(status="Pending", claimed_at=None)
+    )
+
+    candidate_ids = [
+        row[0] for row in db.query(EmailOutbox.id).filter(
+            EmailOutbox.status == "Pending",
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit).all()
+    ]
+
+    claimed_ids = []
+    for message_id in candidate_ids:
+        # Conditional update so two workers never claim the same message
+        result = db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message_id, EmailOutbox.status == "Pending")
+            .values(status="Sending", claimed_at=now)
+        )
+        if result.rowcount == 1:
+            claimed_ids.append(message_id)
+    db.commit()
+
+    if not claimed_ids:
+        return []
+    return db.query(EmailOutbox).filter(EmailOutbox.id.in_(claimed_ids)).order_by(EmailOutbox.id).all()
+
+
+def drain_outbox_once(
+    session_factory: Callable[[], Session] = SessionLocal,
+    sender: Callable[[str, str, str], None] = deliver_email,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    metrics: Optional[OutboxMetrics] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """Deliver one batch of due messages; returns how many were attempted"""
+    db = session_factory()
+    started = time.perf_counter()
+    sent = failed = dead = 0
+    try:
+        messages = claim_due_messages(db, now or datetime.utcnow(), batch_size)
+        for message in messages:
+            message.attempts = (message.attempts or 0) + 1
+            try:
+                sender(message.to_email, message.subject, message.html_body)
+            except Exception as e:
+                failed += 1
+                message.last_error = str(e)[:500]
+                message.claimed_at = None
+                if message.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    message.status = "Dead"
+                    dead += 1
+                    logger.error(f"Email {message.id} to {message.to_email} dead-lettered after {message.attempts} attempts: {e}")
+                else:
+                    message.status = "Pending"
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_delay(message.attempts))
+                    logger.warning(f"Email {message.id} to {message.to_email} failed (attempt {message.attempts}), retrying: {e}")
+            else:
+                sent += 1
+                message.status = "Sent"
+                message.sent_at = datetime.utcnow()
+                message.last_error = None
+            # Commit per message so a crash never re-sends already delivered mail
+            db.commit()
+        return len(messages)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error draining email outbox: {e}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+        if metrics is not None and (sent or failed):
+            metrics.record_batch(sent, failed, dead, time.perf_counter() - started)
+
+
+def get_outbox_stats(db: Session, metrics: Optional[OutboxMetrics] = None) -> Dict[str, Any]:
+    """Message counts by status plus worker throughput metrics"""
+    counts = dict(db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+    oldest_pending = db.query(func.min(EmailOutbox.created_at)).filter(EmailOutbox.status == "Pending").scalar()
+    return {
+        "counts": {status: counts.get(status, 0) for status in ("Pending", "Sending", "Sent", "Dead")},
+        "oldest_pending_at": oldest_pending.isoformat() if oldest_pending else None,
+        "worker": (metrics or outbox_worker.metrics).snapshot(),
+    }
+
+
+def requeue_dead_message(db: Session, message_id: int) -> bool:
+    """Move a dead-lettered message back to Pending with a fresh attempt budget"""
+    result = db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == message_id, EmailOutbox.status == "Dead")
+        .values(status="Pending", attempts=0, next_attempt_at=datetime.utcnow(), last_error=None)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+class OutboxWorker:
+    """Asyncio task that drains the email outbox in a background thread"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        sender: Callable[[str, str, str], None] = deliver_email,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.sender = sender
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.metrics = OutboxMetrics()
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def tick(self) -> int:
+        """Queue any due manager digests, then deliver one batch"""
+        if MANAGER_DIGEST_ENABLED:
+            db = self.session_factory()
+            try:
+                queue_due_manager_digests(db)
+            finally:
+                db.close()
+        return drain_outbox_once(self.session_factory, self.sender, self.batch_size, self.metrics)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run(self) -> None:
+        self._stop = self._stop or asyncio.Event()
+        logger.info("Email outbox worker started")
+        while not self._stop.is_set():
+            try:
+                processed = await asyncio.to_thread(self.tick)
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+                processed = 0
+            # A full batch means more mail is probably waiting; otherwise idle until the next poll
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Email outbox worker stopped")
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+outbox_worker = OutboxWorker()
@@ -1,34 +1,80 @@
 import os
-import smtplib
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+from .models import EmailOutbox
+from .smtp_pool import SMTPConnectionPool
+
 SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 3))
+SMTP_POOL_IDLE_SECONDS = float(os.getenv("SMTP_POOL_IDLE_SECONDS", 60))
 EMAIL_FROM = os.getenv("EMAIL_FROM")
+MANAGER_DIGEST_ENABLED = os.getenv("EMAIL_DIGEST_MODE", "false").lower() == "true"
+MANAGER_DIGEST_WINDOW_MINUTES = int(os.getenv("EMAIL_DIGEST_WINDOW_MINUTES", 30))
+
+_smtp_pool = None
+_smtp_pool_config = None
+_smtp_pool_lock = threading.Lock()
+
+def get_smtp_pool():
+    """Shared SMTP pool, rebuilt whenever the SMTP settings change"""
+    global _smtp_pool, _smtp_pool_config
+    config = (SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_USE_TLS, SMTP_POOL_SIZE, SMTP_POOL_IDLE_SECONDS)
+    with _smtp_pool_lock:
+        if _smtp_pool is None or _smtp_pool_config != config:
+            if _smtp_pool is not None:
+                _smtp_pool.close()
+            _smtp_pool = SMTPConnectionPool(
+                SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD,
+                use_tls=SMTP_USE_TLS, max_size=SMTP_POOL_SIZE, idle_timeout=SMTP_POOL_IDLE_SECONDS
+            )
+            _smtp_pool_config = config
+        return _smtp_pool
+
+def close_smtp_pool():
+    """Quit all pooled SMTP sessions (called on shutdown)"""
+    global _smtp_pool, _smtp_pool_config
+    with _smtp_pool_lock:
+        if _smtp_pool is not None:
+            _smtp_pool.close()
+        _smtp_pool = None
+        _smtp_pool_config = None
+
+def build_message(to_email, subject, html_body):
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_FROM
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+def deliver_email(to_email, subject, html_body):
+    """Send a single email over a pooled SMTP session, raising on any failure (used by the outbox worker)."""
+    msg = build_message(to_email, subject, html_body)
+    get_smtp_pool().sendmail(EMAIL_FROM, to_email, msg.as_string())
 
 def send_email(to_email, subject, html_body):
     try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_FROM
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(html_body, 'html'))
-
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(EMAIL_FROM, to_email, msg.as_string())
+        deliver_email(to_email, subject, html_body)
         print(f"✅ Email sent to {to_email}")
     except Exception as e:
         print(f"❌ Failed to send email to {to_email}. Error: {e}")
 
-def send_leave_email(to_email, associate_name, leave_type, start_date, end_date, status, backup_name):
-    """Send email to associate for leave update."""
+def queue_email(db, to_email, subject, html_body):
+    """Add an email to the outbox; it is delivered once the caller's transaction commits."""
+    entry = EmailOutbox(to_email=to_email, subject=subject, html_body=html_body, status="Pending")
+    db.add(entry)
+    return entry
+
+def render_leave_email(associate_name, leave_type, start_date, end_date, status, backup_name):
+    """Return (subject, html_body) for an associate leave update, or None if no email is sent."""
     if status.lower() == "rejected":
-        return  # Skip sending rejected emails
+        return None  # Skip sending rejected emails
 
     subject_prefix = "✅ Leave Approved" if status.lower() == "approved" else "🕒 Leave Pending"
     color = "green" if status.lower() == "approved" else "orange"
@@ -53,10 +99,10 @@ def send_leave_email(to_email, associate_name, leave_type, start_date, end_date,
     </body>
     </html>
     """
-    send_email(to_email, subject, html_body)
+    return subject, html_body
 
-def send_manager_email(to_email, associate_name, leave_type, start_date, end_date, backup_name, reason="Pending due to system rules"):
-    """Send email to manager for pending leave approval."""
+def render_manager_email(associate_name, leave_type, start_date, end_date, backup_name, reason="Pending due to system rules"):
+    """Return (subject, html_body) for a manager pending-approval notice."""
     subject = f"⚠️ Action Required: Leave Pending for {associate_name}"
     html_body = f"""
     <html>
@@ -76,4 +122,58 @@ def send_manager_email(to_email, associate_name, leave_type, start_date, end_dat
     </body>
     </html>
     """
-    send_email(to_email, subject, html_body)
\ No newline at end of file
+    return subject, html_body
+
+def render_manager_digest_email(manager_name, approvals, urgent_ids):
+    """Return (subject, html_body) summarising all pending approvals for one manager."""
+    urgent_count = sum(1 for leave in approvals if leave["leave_id"] in urgent_ids)
+    subject = f"⚠️ Action Required: {len(approvals)} leave request(s) pending"
+    if urgent_count:
+        subject += f" ({urgent_count} urgent)"
+    rows = "".join(
+        f"""
+        <tr{' style="background: #fff3e0;"' if leave["leave_id"] in urgent_ids else ""}>
+          <td>{leave["associate"]}</td><td>{leave["leave_type"]}</td>
+          <td>{leave["start_date"]}</td><td>{leave["end_date"]}</td><td>{leave["days"]}</td>
+          <td>{leave["backup_person"] or ""}</td>
+          <td>{"<strong style='color: red;'>Urgent</strong>" if leave["leave_id"] in urgent_ids else ""}</td>
+        </tr>"""
+        for leave in approvals
+    )
+    html_body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; color: #333;">
+      <h2 style="color: orange;">Pending Leave Requests</h2>
+      <p>Hi <strong>{manager_name}</strong>,</p>
+      <p>You have <strong>{len(approvals)}</strong> leave request(s) awaiting your approval{f", <strong>{urgent_count}</strong> starting within a week" if urgent_count else ""}.</p>
+      <table style="border-collapse: collapse; width: 100%; margin-top: 10px;">
+        <tr><th align="left">Associate</th><th align="left">Leave Type</th><th align="left">Start Date</th>
+            <th align="left">End Date</th><th align="left">Days</th><th align="left">Backup</th><th></th></tr>{rows}
+      </table>
+      <p style="margin-top: 20px;">Please log in to review and approve these leaves.</p>
+      <p>Regards,<br>Leave Management System</p>
+    </body>
+    </html>
+    """
+    return subject, html_body
+
+def send_leave_email(to_email, associate_name, leave_type, start_date, end_date, status, backup_name):
+    """Send email to associate for leave update."""
+    rendered = render_leave_email(associate_name, leave_type, start_date, end_date, status, backup_name)
+    if rendered:
+        send_email(to_email, *rendered)
+
+def send_manager_email(to_email, associate_name, leave_type, start_date, end_date, backup_name, reason="Pending due to system rules"):
+    """Send email to manager for pending leave approval."""
+    send_email(to_email, *render_manager_email(associate_name, leave_type, start_date, end_date, backup_name, reason))
+
+def queue_leave_email(db, to_email, associate_name, leave_type, start_date, end_date, status, backup_name):
+    """Queue the associate leave update email in the outbox."""
+    rendered = render_leave_email(associate_name, leave_type, start_date, end_date, status, backup_name)
+    if rendered:
+        return queue_email(db, to_email, *rendered)
+    return None
+
+def queue_manager_email(db, to_email, associate_name, leave_type, start_date, end_date, backup_name, reason="Pending due to system rules"):
+    """Queue the manager pending-approval email in the outbox."""
+    return queue_email(db, to_email, *render_manager_email(associate_name, leave_type, start_date, end_date, backup_name, reason))
@@ -0,0 +1,201 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from .metrics import Counter, Gauge, Histogram, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+THREAD = "thread"
+PROCESS = "process"
+
+EXECUTOR_AUTH_WORKERS = int(os.getenv("EXECUTOR_AUTH_WORKERS", 4))
+EXECUTOR_AUTH_QUEUE = int(os.getenv("EXECUTOR_AUTH_QUEUE", 64))
+EXECUTOR_REPORT_WORKERS = int(os.getenv("EXECUTOR_REPORT_WORKERS", 2))
+EXECUTOR_REPORT_QUEUE = int(os.getenv("EXECUTOR_REPORT_QUEUE", 16))
+EXECUTOR_CPU_WORKERS = int(os.getenv("EXECUTOR_CPU_WORKERS", os.getenv("REPORT_JOB_WORKERS", 2)))
+EXECUTOR_CPU_QUEUE = int(os.getenv("EXECUTOR_CPU_QUEUE", 8))
+EXECUTOR_IMPORT_WORKERS = int(os.getenv("EXECUTOR_IMPORT_WORKERS", 1))
+EXECUTOR_IMPORT_QUEUE = int(os.getenv("EXECUTOR_IMPORT_QUEUE", 2))
+
+EXECUTOR_TASKS = Counter("executor_tasks_total", "Tasks by pool and outcome", ("pool", "outcome"))
+EXECUTOR_PENDING = Gauge("executor_tasks_pending", "Tasks queued or running per pool", ("pool",))
+EXECUTOR_QUEUE_SECONDS = Histogram("executor_queue_seconds", "Time tasks waited for a worker", ("pool",))
+EXECUTOR_RUN_SECONDS = Histogram("executor_run_seconds", "Time tasks ran on a worker", ("pool",))
+REGISTRY.extend([EXECUTOR_TASKS, EXECUTOR_PENDING, EXECUTOR_QUEUE_SECONDS, EXECUTOR_RUN_SECONDS])
+
+_DONE = object()  # end of a streamed iterator
+
+
+class PoolSaturated(RuntimeError):
+    """Every worker of a pool is busy and its queue is full"""
+
+    def __init__(self, pool: str):
+        self.pool = pool
+        super().__init__(f"The '{pool}' executor pool is saturated, try again shortly")
+
+
+def _timed_call(fn: Callable, submitted_at: float, args: tuple, kwargs: dict):
+    """Runs on the worker: how long the task queued, and its result. Wall clock, since it may be another process"""
+    return time.time() - submitted_at, fn(*args, **kwargs)
+
+
+class ExecutorPool:
+    """
+    A named pool with its own workers and a bounded queue, so one kind of work cannot starve another.
+
+    Thread pools run tasks in a copy of the caller's context (request id, query accounting); process
+    pools need picklable, module-level functions. Submitting beyond `max_workers + max_queue` raises
+    PoolSaturated instead of queueing. Cancelling a returned future stops the task if it has not
+    started yet; a task already running finishes and its result is discarded.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int):
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == PROCESS:
+                # spawn, not fork: the server process has live threads (outbox worker, SMTP pool)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"pool-{self.name}")
+        return self._executor
+
+    def _admit(self, force: bool = False):
+        with self._lock:
+            if not force and self._pending >= self.max_workers + self.max_queue:
+                EXECUTOR_TASKS.inc(self.name, "rejected")
+                raise PoolSaturated(self.name)
+            self._pending += 1
+            executor = self._get_executor()
+        EXECUTOR_PENDING.inc(self.name)
+        return executor
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        EXECUTOR_PENDING.dec(self.name)
+
+    def _submit(self, fn: Callable, args: tuple, kwargs: dict, force: bool = False) -> Future:
+        executor = self._admit(force)
+        submitted_at = time.time()
+        try:
+            if self.kind == THREAD:
+                inner = executor.submit(contextvars.copy_context().run, _timed_call, fn, submitted_at, args, kwargs)
+            else:
+                inner = executor.submit(_timed_call, fn, submitted_at, args, kwargs)
+        except BaseException:
+            self._release()
+            raise
+        outer = Future()
+        outer.add_done_callback(partial(self._cancel_inner, inner))
+        inner.add_done_callback(partial(self._settle, outer, submitted_at))
+        return outer
+
+    @staticmethod
+    def _cancel_inner(inner: Future, outer: Future):
+        if outer.cancelled():
+            inner.cancel()
+
+    def _settle(self, outer: Future, submitted_at: float, inner: Future):
+        self._release()
+        if inner.cancelled():
+            EXECUTOR_TASKS.inc(self.name, "cancelled")
+            outer.cancel()
+            return
+        error = inner.exception()
+        if error is None:
+            queue_seconds, result = inner.result()
+            EXECUTOR_QUEUE_SECONDS.observe(queue_seconds, self.name)
+            EXECUTOR_RUN_SECONDS.observe(max(0.0, time.time() - submitted_at - queue_seconds), self.name)
+        EXECUTOR_TASKS.inc(self.name, "error" if error is not None else "discarded" if outer.cancelled() else "ok")
+        try:
+            if error is not None:
+                outer.set_exception(error)
+            else:
+                outer.set_result(result)
+        except InvalidStateError:
+            pass  # the caller cancelled while the task was already running
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) and return its future; raises PoolSaturated when the queue is full"""
+        return self._submit(fn, args, kwargs)
+
+    def call(self, fn: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """Run fn in the pool and block for its result, cancelling it if `timeout` passes first"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def run(self, fn: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """Await fn in the pool; if the awaiting task is cancelled or times out, so is the queued task"""
+        return await asyncio.wait_for(asyncio.wrap_future(self.submit(fn, *args, **kwargs)), timeout)
+
+    async def stream(self, iterator: Iterator) -> AsyncIterator:
+        """
+        Async iterator over a blocking iterator, each next() running in this (thread) pool.
+
+        The first chunk is fetched here, so a saturated pool fails before a response starts; later
+        chunks skip the queue limit, so a stream that has started is never cut off halfway.
+        """
+        if self.kind != THREAD:
+            raise ValueError("Only thread pools can stream an iterator")
+        first = await self.run(next, iterator, _DONE)
+        return self._stream_rest(iterator, first)
+
+    async def _stream_rest(self, iterator: Iterator, chunk: Any) -> AsyncIterator:
+        while chunk is not _DONE:
+            yield chunk
+            chunk = await asyncio.wrap_future(self._submit(next, (iterator, _DONE), {}, force=True))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "kind": self.kind, "max_workers": self.max_workers,
+                "max_queue": self.max_queue, "pending": self._pending}
+
+    def shutdown(self):
+        """Drop queued tasks; running ones finish in the background"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Password hashing (bcrypt releases the GIL, so threads run hashes in parallel)
+auth_pool = ExecutorPool("auth", THREAD, EXECUTOR_AUTH_WORKERS, EXECUTOR_AUTH_QUEUE)
+# Year-long analytics and exports: blocking database reads plus file and CSV assembly
+report_pool = ExecutorPool("reports", THREAD, EXECUTOR_REPORT_WORKERS, EXECUTOR_REPORT_QUEUE)
+# Pure CPU work that holds the GIL, such as ReportLab PDF rendering
+cpu_pool = ExecutorPool("cpu", PROCESS, EXECUTOR_CPU_WORKERS, EXECUTOR_CPU_QUEUE)
+# Admin bulk imports: one transaction each, fanning password hashing out to their own process pool
+import_pool = ExecutorPool("imports", THREAD, EXECUTOR_IMPORT_WORKERS, EXECUTOR_IMPORT_QUEUE)
+
+POOLS = {pool.name: pool for pool in (auth_pool, report_pool, cpu_pool, import_pool)}
+
+
+def shutdown_pools():
+    for pool in POOLS.values():
+        pool.shutdown()
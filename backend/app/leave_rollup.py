@@ -0,0 +1,282 @@
+"""
+leave_rollup: associates' working leave days by (team, year, month, leave type, status).
+
+The maintenance hooks are installed when this module is imported, which app.database does, so
+every writer keeps the table current, not only the API. Models are looked up through the module
+at call time because app.database imports this while app.models may still be initialising.
+
+    python -m app.leave_rollup --rebuild    # recompute from leave_requests after drift
+"""
+import argparse
+import json
+import logging
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import PASSIVE_NO_INITIALIZE, get_history
+from sqlalchemy.orm.util import identity_key
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = ("team_id", "year", "month", "leave_type", "status")
+LEAVE_FIELDS = ("user_id", "leave_type", "status", "start_date", "end_date", "is_half_day")
+USER_FIELDS = ("team_id", "role")
+
+RollupKey = Tuple[int, int, int, str, str]
+
+
+def count_weekdays(start: date, end: date) -> int:
+    """Monday-Friday dates in [start, end]"""
+    total = (end - start).days + 1
+    if total <= 0:
+        return 0
+    weeks, extra = divmod(total, 7)
+    return weeks * 5 + sum(1 for i in range(extra) if (start.weekday() + i) % 7 < 5)
+
+
+def month_days(start: Optional[date], end: Optional[date], is_half_day: bool) -> Dict[Tuple[int, int], float]:
+    """A leave's working days per (year, month); a half day counts 0.5 in the month it starts"""
+    if not start or not end or end < start:
+        return {}
+    if is_half_day:
+        return {(start.year, start.month): 0.5}
+    days = {}
+    current = start
+    while current <= end:
+        month_end = date(current.year, current.month, monthrange(current.year, current.month)[1])
+        chunk_end = min(end, month_end)
+        weekdays = count_weekdays(current, chunk_end)
+        if weekdays:
+            days[(current.year, current.month)] = float(weekdays)
+        current = chunk_end + timedelta(days=1)
+    return days
+
+
+def _accumulate(totals: Dict[RollupKey, float], team_id: int, leave: Dict, sign: float = 1.0):
+    for (year, month), days in month_days(leave["start_date"], leave["end_date"], bool(leave["is_half_day"])).items():
+        totals[(team_id, year, month, leave["leave_type"] or "", leave["status"] or "")] += sign * days
+
+
+def _upsert_statement(bind):
+    insert = postgresql.insert if bind.dialect.name == "postgresql" else sqlite.insert
+    table = models.LeaveRollup.__table__
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(index_elements=list(ROLLUP_KEY), set_={"days": table.c.days + stmt.excluded.days})
+
+
+def apply_deltas(connection, deltas: Dict[RollupKey, float]):
+    rows = [dict(zip(ROLLUP_KEY, key), days=days) for key, days in sorted(deltas.items()) if days]
+    if rows:
+        connection.execute(_upsert_statement(connection), rows)
+
+
+def rebuild_leave_rollup(connection) -> int:
+    """Recompute the rollup from every leave request; returns the number of rollup rows"""
+    totals: Dict[RollupKey, float] = defaultdict(float)
+    User, LeaveRequest = models.User, models.LeaveRequest
+    rows = connection.execute(
+        select(User.team_id, *(getattr(LeaveRequest, field) for field in LEAVE_FIELDS if field != "user_id"))
+        .join(User, LeaveRequest.user_id == User.id)
+        .where(User.role == "associate", User.team_id.isnot(None))
+    )
+    for row in rows:
+        _accumulate(totals, row.team_id, row._mapping)
+    connection.execute(delete(models.LeaveRollup.__table__))
+    if totals:
+        connection.execute(models.LeaveRollup.__table__.insert(),
+                           [dict(zip(ROLLUP_KEY, key), days=days) for key, days in sorted(totals.items()) if days])
+    logger.info(f"Leave rollup rebuilt: {len(totals)} rows")
+    return len(totals)
+
+
+# -------------------- Incremental maintenance --------------------
+LEAVES_BEFORE_KEY = "leave_rollup_leaves_before"
+USERS_BEFORE_KEY = "leave_rollup_users_before"
+
+
+def _changed(instance, fields) -> Dict:
+    """New values of the fields set on an instance since it was loaded; loads nothing"""
+    changed = {}
+    for field in fields:
+        history = get_history(instance, field, passive=PASSIVE_NO_INITIALIZE)
+        if history.added:
+            changed[field] = history.added[0]
+    return changed
+
+
+def _pending_ids(session: Session, model, fields) -> List[int]:
+    """Persistent instances of `model` this flush deletes or changes one of `fields` on"""
+    return [instance.id for instance in (*session.dirty, *session.deleted)
+            if isinstance(instance, model) and instance.id is not None
+            and (instance in session.deleted or _changed(instance, fields))]
+
+
+def _snapshot(connection, model, fields, ids) -> Dict[int, Dict]:
+    rows = connection.execute(select(model.id, *(getattr(model, field) for field in fields)).where(model.id.in_(ids)))
+    return {row.id: dict(row._mapping) for row in rows}
+
+
+def _before_flush(session: Session, flush_context, instances):
+    # Attributes are expired after commit, so the values a change replaces are read from the database
+    for key, model, fields in ((LEAVES_BEFORE_KEY, models.LeaveRequest, LEAVE_FIELDS),
+                               (USERS_BEFORE_KEY, models.User, USER_FIELDS)):
+        ids = _pending_ids(session, model, fields)
+        if ids:
+            session.info[key] = _snapshot(session.connection(), model, fields, ids)
+
+
+def _associate_teams(session: Session, connection, user_ids: Iterable[int]) -> Dict[int, int]:
+    """team_id of each user that is an associate in a team; from the session when already loaded"""
+    teams, missing = {}, set()
+    for user_id in set(user_ids) - {None}:
+        user = session.identity_map.get(identity_key(models.User, user_id))
+        if user is None:
+            missing.add(user_id)
+        elif user in session.deleted:
+            continue
+        elif user.role == "associate" and user.team_id:
+            teams[user_id] = user.team_id
+    if missing:
+        User = models.User
+        teams.update(connection.execute(
+            select(User.id, User.team_id).where(User.id.in_(missing), User.role == "associate", User.team_id.isnot(None))
+        ).all())
+    return teams
+
+
+def _rollup_team(user: Optional[Dict]) -> Optional[int]:
+    """The team a user's leave is counted under, if any"""
+    if user and user["role"] == "associate" and user["team_id"]:
+        return user["team_id"]
+    return None
+
+
+def _leaves_before_flush(connection, user_ids, leaves_before: Dict[int, Dict], new_ids) -> List[Dict]:
+    """The users' leaves as the rollup last counted them: leaves this flush changed are taken from the snapshot"""
+    LeaveRequest = models.LeaveRequest
+    leaves = {leave_id: leave for leave_id, leave in _snapshot(
+        connection, LeaveRequest, LEAVE_FIELDS, select(LeaveRequest.id).where(LeaveRequest.user_id.in_(user_ids))
+    ).items() if leave_id not in new_ids}
+    leaves.update(leaves_before)
+    return [leave for leave in leaves.values() if leave["user_id"] in user_ids]
+
+
+def _after_flush(session: Session, flush_context):
+    leaves_before = session.info.pop(LEAVES_BEFORE_KEY, {})
+    users_before = session.info.pop(USERS_BEFORE_KEY, {})
+    changes = []  # (leave values before, leave values after); None where the leave does not exist
+    moves = {}  # user id -> (team their leave was counted under, team it is counted under now)
+    new_leave_ids = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, models.User) and instance.id in users_before:
+            old = users_before[instance.id]
+            new = None if instance in session.deleted else {**old, **_changed(instance, USER_FIELDS)}
+            if _rollup_team(old) != _rollup_team(new):
+                moves[instance.id] = (_rollup_team(old), _rollup_team(new))
+        elif isinstance(instance, models.LeaveRequest):
+            if instance in session.new:
+                new_leave_ids.add(instance.id)
+                changes.append((None, {field: getattr(instance, field) for field in LEAVE_FIELDS}))
+            elif instance.id in leaves_before:
+                old = leaves_before[instance.id]
+                changes.append((old, None if instance in session.deleted else {**old, **_changed(instance, LEAVE_FIELDS)}))
+    if not changes and not moves:
+        return
+    connection = session.connection()
+    deltas: Dict[RollupKey, float] = defaultdict(float)
+    if moves:
+        # Re-attribute a moved associate's leave: off the old team's buckets, onto the new team's
+        for leave in _leaves_before_flush(connection, list(moves), leaves_before, new_leave_ids):
+            old_team, new_team = moves[leave["user_id"]]
+            if old_team:
+                _accumulate(deltas, old_team, leave, sign=-1.0)
+            if new_team:
+                _accumulate(deltas, new_team, leave)
+    if changes:
+        # Leave edits are counted under the owners' teams after this flush, so they compose with moves
+        teams = _associate_teams(session, connection,
+                                 [leave["user_id"] for change in changes for leave in change if leave])
+        for old, new in changes:
+            if old and old["user_id"] in teams:
+                _accumulate(deltas, teams[old["user_id"]], old, sign=-1.0)
+            if new and new["user_id"] in teams:
+                _accumulate(deltas, teams[new["user_id"]], new)
+    apply_deltas(connection, deltas)
+
+
+def _statement_columns(state) -> set:
+    """Column names a Core insert/update through the session sets, from its values and parameters"""
+    names = set(state.statement.compile().params)
+    parameters = state.parameters
+    for row in ([parameters] if isinstance(parameters, dict) else parameters or []):
+        names.update(row)
+    return names
+
+
+def _do_orm_execute(state):
+    # Core-style statements through the session skip the flush: bulk leave writes, deleted users and
+    # updates that move users between teams or roles fall back to a full rebuild
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return None
+    model = state.bind_mapper.class_
+    if issubclass(model, models.LeaveRequest):
+        needs_rebuild = True
+    elif issubclass(model, models.User):
+        needs_rebuild = state.is_delete or (state.is_update and bool(_statement_columns(state) & set(USER_FIELDS)))
+    else:
+        needs_rebuild = False
+    if needs_rebuild:
+        result = state.invoke_statement()
+        rebuild_leave_rollup(state.session.connection())
+        return result
+    return None
+
+
+def install_rollup_hooks():
+    """Keep leave_rollup in step with leave_requests inside the same transaction as every leave write"""
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+
+
+# -------------------- Reads --------------------
+def rollup_days(db: Session, team_ids: List[int], year: int, month: Optional[int] = None,
+                status: str = "Approved") -> List[Tuple[int, str, float]]:
+    """(month, leave_type, working days) for the teams' associates, summed across teams"""
+    LeaveRollup = models.LeaveRollup
+    stmt = select(LeaveRollup.month, LeaveRollup.leave_type, func.sum(LeaveRollup.days)).where(
+        LeaveRollup.team_id.in_(team_ids), LeaveRollup.year == year, LeaveRollup.status == status
+    ).group_by(LeaveRollup.month, LeaveRollup.leave_type)
+    if month is not None:
+        stmt = stmt.where(LeaveRollup.month == month)
+    return [(row_month, leave_type, days or 0.0) for row_month, leave_type, days in db.execute(stmt)]
+
+
+install_rollup_hooks()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the leave_rollup table")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every row from leave_requests")
+    args = parser.parse_args()
+
+    from .database import engine
+    with engine.begin() as conn:
+        models.LeaveRollup.__table__.create(conn, checkfirst=True)
+        if args.rebuild:
+            rows = rebuild_leave_rollup(conn)
+        else:
+            rows = conn.execute(select(func.count()).select_from(models.LeaveRollup.__table__)).scalar()
+    print(json.dumps({"rebuilt": args.rebuild, "rows": rows}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 from datetime import datetime, timedelta, date, UTC
 from calendar import monthrange
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from app.models import LeaveRequest, User, Threshold, LeaveLog, LeaveBalance
-from app.email_utils import send_leave_email, send_manager_email
+from app.leave_rollup import count_weekdays, rollup_days
+from app.email_utils import queue_leave_email, queue_manager_email, MANAGER_DIGEST_ENABLED
 from typing import Optional, Dict, List, Any, Union
 import logging
 
@@ -18,6 +20,7 @@ WEEKLY_TARGET = 15.0
 MONTHLY_LEAVE_LIMIT = 5
 SAFE_SHRINKAGE_THRESHOLD = 6.0
 OPTIONAL_LEAVE_MAX_DAYS = 2
+URGENT_APPROVAL_DAYS = 7
 EMAIL_DOMAIN = "@amazon.com"
 
 class LeaveProcessingError(Exception):
@@ -58,6 +61,18 @@ def is_optional_leave_day(db: Session, date: date) -> bool:
         logger.error(f"Error checking optional leave day: {e}")
         return False
 
+def get_optional_leave_days(db: Session, start_date: date, end_date: date) -> set:
+    """All optional leave days in a date range, in one query"""
+    try:
+        from app.models import OptionalLeaveDate
+        rows = db.query(OptionalLeaveDate.date).filter(
+            OptionalLeaveDate.date >= start_date, OptionalLeaveDate.date <= end_date
+        ).all()
+        return {row.date for row in rows}
+    except Exception as e:
+        logger.error(f"Error loading optional leave days: {e}")
+        return set()
+
 def get_team_shrinkage(db: Session, team_id: int, target_date: date) -> Dict[str, float]:
     """
     Calculate team shrinkage for a specific date, split by planned and sick leaves.
@@ -189,54 +204,23 @@ def get_dashboard_shrinkage(db: Session, team_id: int, target_date: Optional[dat
             "error": str(e)
         }
 
+def shrinkage_percent(leave_days: float, team_size: int, year: int, month: int) -> float:
+    """Leave days as a share of the team's working days in the month"""
+    working_days_in_month = count_weekdays(date(year, month, 1), date(year, month, monthrange(year, month)[1]))
+    if working_days_in_month == 0 or team_size == 0:
+        return 0.0
+    return round((leave_days / (team_size * working_days_in_month)) * 100, 2)
+
 def get_monthly_shrinkage(db: Session, team_id: int, year: int, month: int) -> float:
-    """Calculate monthly shrinkage with improved error handling and optimization"""
+    """Calculate monthly shrinkage from the leave rollup"""
     try:
-        start_date = datetime(year, month, 1).date()
-        end_date = datetime(year, month, monthrange(year, month)[1]).date()
-
         total_team_members = db.query(User).filter_by(team_id=team_id, role='associate').count()
         if total_team_members == 0:
             logger.warning(f"No team members found for team {team_id}")
             return 0.0
 
-        # Optimized query to get all relevant leaves at once
-        approved_leaves = db.query(LeaveRequest).join(
-            User, LeaveRequest.user_id == User.id
-        ).filter(
-            LeaveRequest.start_date <= end_date,
-            LeaveRequest.end_date >= start_date,
-            LeaveRequest.status == 'Approved',
-            User.team_id == team_id,
-            User.role == 'associate'
-        ).all()
-
-        leave_days = 0.0
-        for leave in approved_leaves:
-            # Calculate overlap days
-            overlap_start = max(leave.start_date, start_date)
-            overlap_end = min(leave.end_date, end_date)
-            
-            if overlap_start <= overlap_end:
-                if leave.is_half_day:
-                    # For half day, count only if the specific date is within the month
-                    if start_date <= leave.start_date <= end_date:
-                        leave_days += 0.5
-                else:
-                    # Full day calculation - count only working days
-                    current_date = overlap_start
-                    while current_date <= overlap_end:
-                        if current_date.weekday() < 5:  # Monday to Friday
-                            leave_days += 1.0
-                        current_date += timedelta(days=1)
-
-        working_days_in_month = sum(1 for d in range((end_date - start_date).days + 1) 
-                                    if (start_date + timedelta(days=d)).weekday() < 5)
-        
-        if working_days_in_month == 0 or total_team_members == 0:
-            return 0.0
-            
-        return round((leave_days / (total_team_members * working_days_in_month)) * 100, 2)
+        leave_days = sum(days for _, _, days in rollup_days(db, [team_id], year, month))
+        return shrinkage_percent(leave_days, total_team_members, year, month)
         
     except SQLAlchemyError as e:
         logger.error(f"Database error in get_monthly_shrinkage: {e}")
@@ -345,32 +329,65 @@ def has_date_overlap(db: Session, user_id: int, start_date: date, end_date: date
         logger.error(f"Database error checking date overlap: {e}")
         return True  # Default to safe value (assume overlap)
 
-def get_monthly_leave_count(db: Session, user_id: int) -> int:
+def current_month_key() -> str:
+    """Threshold month key ("YYYY-MM") for the current UTC month"""
+    return datetime.now(UTC).strftime("%Y-%m")
+
+def get_monthly_leave_count(db: Session, user_id: int, month: Optional[str] = None) -> int:
     """Get monthly leave count with error handling"""
+    return get_monthly_leave_counts(db, [user_id], month).get(user_id, 0)
+
+def get_monthly_leave_counts(db: Session, user_ids: List[int], month: Optional[str] = None) -> Dict[int, int]:
+    """Monthly leave counts for many users in one query; users without a row count as 0"""
+    month = month or current_month_key()
+    counts = {user_id: 0 for user_id in user_ids}
+    if not counts:
+        return counts
     try:
-        month_str = datetime.now(UTC).strftime("%Y-%m")
-        record = db.query(Threshold).filter_by(user_id=user_id, month=month_str).first()
-        return record.leave_count if record else 0
+        rows = db.query(Threshold.user_id, Threshold.leave_count).filter(
+            Threshold.month == month, Threshold.user_id.in_(list(counts))
+        ).all()
+        counts.update({user_id: leave_count or 0 for user_id, leave_count in rows})
     except SQLAlchemyError as e:
-        logger.error(f"Database error getting monthly leave count: {e}")
-        return 0
+        logger.error(f"Database error getting monthly leave counts: {e}")
+    return counts
+
+def _upsert(db: Session):
+    """Dialect-specific INSERT that supports ON CONFLICT"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def increment_monthly_leave(db: Session, user_id: int, limit: Optional[int] = None, month: Optional[str] = None) -> bool:
+    """
+    Atomically add one leave to the user's monthly count in the caller's transaction.
 
-def increment_monthly_leave(db: Session, user_id: int) -> None:
-    """Increment monthly leave count with error handling"""
+    With `limit`, the count only moves while it is below the limit; returns False when the limit is already reached.
+    """
     try:
-        month_str = datetime.now(UTC).strftime("%Y-%m")
-        record = db.query(Threshold).filter_by(user_id=user_id, month=month_str).first()
-        if not record:
-            record = Threshold(user_id=user_id, month=month_str, leave_count=1)
-            db.add(record)
-        else:
-            record.leave_count += 1
-        db.commit()
+        stmt = _upsert(db)(Threshold).values(user_id=user_id, month=month or current_month_key(), leave_count=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Threshold.user_id, Threshold.month],
+            set_={"leave_count": Threshold.leave_count + 1},
+            where=(Threshold.leave_count < limit) if limit is not None else None
+        )
+        return db.execute(stmt).rowcount == 1
     except SQLAlchemyError as e:
         logger.error(f"Database error incrementing monthly leave: {e}")
-        db.rollback()
         raise LeaveProcessingError(f"Failed to increment monthly leave count: {e}")
 
+def reserve_leave_allowance(db: Session, user_id: int, leave_type: str, days: float) -> Optional[str]:
+    """
+    Deduct the balance and count the leave against the monthly FCFS limit, all or nothing.
+
+    Both are conditional updates, so concurrent applications cannot overdraw either;
+    returns the reason the leave cannot be auto-approved, or None once both are reserved.
+    """
+    if not decrement_leave_balance(db, user_id, leave_type, days):
+        return "Insufficient leave balance"
+    if not increment_monthly_leave(db, user_id, limit=MONTHLY_LEAVE_LIMIT):
+        increment_leave_balance(db, user_id, leave_type, days)
+        return "Monthly FCFS limit exceeded"
+    return None
+
 def get_leave_balance(db: Session, user_id: int, leave_type: str) -> int:
     """Get leave balance with error handling"""
     try:
@@ -381,18 +398,17 @@ def get_leave_balance(db: Session, user_id: int, leave_type: str) -> int:
         return 0
 
 def decrement_leave_balance(db: Session, user_id: int, leave_type: str, days: float) -> bool:
-    """Decrement leave balance with error handling"""
+    """Deduct `days` in the caller's transaction if the balance covers it; returns False otherwise"""
     try:
-        record = db.query(LeaveBalance).filter_by(user_id=user_id, leave_type=leave_type).first()
-        if record and record.balance >= days:
-            record.balance -= days
-            db.commit()
-            return True
-        return False
+        result = db.execute(
+            update(LeaveBalance)
+            .where(LeaveBalance.user_id == user_id, LeaveBalance.leave_type == leave_type, LeaveBalance.balance >= days)
+            .values(balance=LeaveBalance.balance - days)
+        )
+        return result.rowcount > 0
     except SQLAlchemyError as e:
         logger.error(f"Database error decrementing leave balance: {e}")
-        db.rollback()
-        return False
+        raise LeaveProcessingError(f"Failed to decrement leave balance: {e}")
 
 def convert_cl_to_al(leave_type: str, start_date: date, end_date: date) -> str:
     """Convert CL to AL if leave duration exceeds threshold"""
@@ -474,10 +490,12 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
                     rejection_reasons.append("Insufficient leave balance")
                     
                 if not rejection_reasons:
-                    status = "Approved"
-                    auto_approval_reasons.append("Optional leave approved within limits")
-                    increment_monthly_leave(db, user.id)
-                    decrement_leave_balance(db, user.id, leave_type, leave_days)
+                    reason = reserve_leave_allowance(db, user.id, leave_type, leave_days)
+                    if reason:
+                        rejection_reasons.append(reason)
+                    else:
+                        status = "Approved"
+                        auto_approval_reasons.append("Optional leave approved within limits")
 
         # AUTO-APPROVAL LOGIC FOR AL AND CL
         elif leave_type.upper() in ["AL", "CL"]:
@@ -548,15 +566,16 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
                     rejection_reasons.append("Monthly shrinkage limit exceeded")
                     shrinkage_check_passed = False
 
-            # Final decision for AL/CL
+            # Final decision for AL/CL (balances and counts are reserved atomically)
+            reason = None
             if can_auto_approve and shrinkage_check_passed:
+                reason = reserve_leave_allowance(db, user.id, leave_type, leave_days)
+                if reason:
+                    rejection_reasons.append(reason)
+            if can_auto_approve and shrinkage_check_passed and not reason:
                 status = "Approved"
                 auto_approval_reasons.append("Auto-approved: Shrinkage availability confirmed")
                 auto_approval_reasons.append(f"Leave type: {leave_type}")
-                
-                # Update balances and counts
-                increment_monthly_leave(db, user.id)
-                decrement_leave_balance(db, user.id, leave_type, leave_days)
             else:
                 status = "Pending"
 
@@ -582,11 +601,15 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
                         sick_shrinkage_exceeded = True
 
             # Sick leaves are generally auto-approved unless sick shrinkage is exceeded
+            reason = None
             if not sick_shrinkage_exceeded and not exceeds_monthly_count and not insufficient_balance:
+                reason = reserve_leave_allowance(db, user.id, leave_type, leave_days)
+            if not sick_shrinkage_exceeded and not exceeds_monthly_count and not insufficient_balance and not reason:
                 status = "Approved"
                 auto_approval_reasons.append("Sick leave auto-approved")
-                increment_monthly_leave(db, user.id)
-                decrement_leave_balance(db, user.id, leave_type, leave_days)
+            elif reason:
+                status = "Pending"
+                rejection_reasons.append(reason)
             else:
                 status = "Pending"
                 if sick_shrinkage_exceeded:
@@ -609,7 +632,7 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
         )
 
         db.add(leave)
-        db.commit()
+        db.flush()
 
         # Create detailed log entry
         if status == "Approved" and auto_approval_reasons:
@@ -629,41 +652,39 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
             action=status,
             comments=comments
         ))
-        db.commit()
 
-        # Send notifications
-        try:
-            send_leave_email(
-                to_email=f"{user.username}{EMAIL_DOMAIN}",
-                associate_name=user.username,
-                leave_type=leave_type,
-                start_date=start,
-                end_date=end,
-                status=status,
-                backup_name=backup_person
-            )
+        # Queue notifications in the same transaction; the outbox worker delivers them
+        queue_leave_email(
+            db,
+            to_email=f"{user.username}{EMAIL_DOMAIN}",
+            associate_name=user.username,
+            leave_type=leave_type,
+            start_date=start,
+            end_date=end,
+            status=status,
+            backup_name=backup_person
+        )
 
-            # Send manager notification only if pending
-            if status == "Pending":
-                # Find manager
-                manager = None
-                if hasattr(user, 'team') and user.team and hasattr(user.team, 'manager_id'):
-                    manager = db.get(User, user.team.manager_id)
-                elif user.reports_to_id:
-                    manager = db.get(User, user.reports_to_id)
-                
-                if manager:
-                    send_manager_email(
-                        to_email=f"{manager.username}{EMAIL_DOMAIN}",
-                        associate_name=user.username,
-                        leave_type=leave_type,
-                        start_date=start,
-                        end_date=end,
-                        backup_name=backup_person
-                    )
-        except Exception as e:
-            logger.error(f"Error sending email notifications: {e}")
-            # Don't fail the entire process for email errors
+        # Notify manager only if pending (digest mode batches these per manager instead)
+        if status == "Pending" and not MANAGER_DIGEST_ENABLED:
+            # Find manager
+            manager = None
+            if hasattr(user, 'team') and user.team and hasattr(user.team, 'manager_id'):
+                manager = db.get(User, user.team.manager_id)
+            elif user.reports_to_id:
+                manager = db.get(User, user.reports_to_id)
+
+            if manager:
+                queue_manager_email(
+                    db,
+                    to_email=f"{manager.username}{EMAIL_DOMAIN}",
+                    associate_name=user.username,
+                    leave_type=leave_type,
+                    start_date=start,
+                    end_date=end,
+                    backup_name=backup_person
+                )
+        db.commit()
 
         # Prepare response message
         if status == "Approved":
@@ -687,6 +708,7 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
         return {"message": str(e), "status": "error"}
     except LeaveProcessingError as e:
         logger.error(f"Leave processing error: {e}")
+        db.rollback()
         return {"message": str(e), "status": "error"}
     except SQLAlchemyError as e:
         logger.error(f"Database error in process_leave_application: {e}")
@@ -697,28 +719,29 @@ def process_leave_application(db: Session, data: Dict[str, Any]) -> Dict[str, An
         db.rollback()
         return {"message": "An unexpected error occurred", "status": "error"}
 
-def decrement_monthly_leave_count(db: Session, user_id: int) -> None:
-    """Decrement monthly leave count with error handling"""
+def decrement_monthly_leave_count(db: Session, user_id: int, month: Optional[str] = None) -> None:
+    """Atomically take one leave off the user's monthly count (never below zero) in the caller's transaction"""
     try:
-        month_str = datetime.now(UTC).strftime("%Y-%m")
-        record = db.query(Threshold).filter_by(user_id=user_id, month=month_str).first()
-        if record and record.leave_count > 0:
-            record.leave_count -= 1
-            db.commit()
+        db.execute(
+            update(Threshold)
+            .where(Threshold.user_id == user_id, Threshold.month == (month or current_month_key()), Threshold.leave_count > 0)
+            .values(leave_count=Threshold.leave_count - 1)
+        )
     except SQLAlchemyError as e:
         logger.error(f"Database error decrementing monthly leave count: {e}")
-        db.rollback()
+        raise LeaveProcessingError(f"Failed to decrement monthly leave count: {e}")
 
 def increment_leave_balance(db: Session, user_id: int, leave_type: str, days: float) -> None:
-    """Increment leave balance with error handling"""
+    """Add `days` back to the balance in the caller's transaction"""
     try:
-        record = db.query(LeaveBalance).filter_by(user_id=user_id, leave_type=leave_type).first()
-        if record:
-            record.balance += days
-            db.commit()
+        db.execute(
+            update(LeaveBalance)
+            .where(LeaveBalance.user_id == user_id, LeaveBalance.leave_type == leave_type)
+            .values(balance=LeaveBalance.balance + days)
+        )
     except SQLAlchemyError as e:
         logger.error(f"Database error incrementing leave balance: {e}")
-        db.rollback()
+        raise LeaveProcessingError(f"Failed to increment leave balance: {e}")
 
 def soft_delete_leave(db: Session, user_id: int, leave_id: int) -> Dict[str, str]:
     """Soft delete leave with comprehensive error handling"""
@@ -822,7 +845,6 @@ def calculate_weekly_shrinkage_with_carry_forward(db: Session, manager_id: int,
                 "note": "No associates found"
             }
 
-        # Get all approved leaves for the month
         all_leaves = db.query(LeaveRequest).join(User).filter(
             User.team_id.in_(team_ids),
             User.role == "associate",
@@ -935,13 +957,14 @@ def get_next_30_day_shrinkage(db: Session, user_id: int) -> List[Dict[str, Any]]
         end_date = today + timedelta(days=30)
         
         # Get all approved leaves for the next 30 days
-        approved_leaves = db.query(LeaveRequest).join(User).filter(
+        approved_leaves = db.query(LeaveRequest).join(User).options(joinedload(LeaveRequest.user)).filter(
             User.team_id == team_id,
             User.role == 'associate',
             LeaveRequest.status == "Approved",
             LeaveRequest.start_date <= end_date,
             LeaveRequest.end_date >= today
         ).all()
+        optional_days = get_optional_leave_days(db, today, end_date)
 
         logger.info(f"Found {len(approved_leaves)} approved leaves")
 
@@ -953,7 +976,7 @@ def get_next_30_day_shrinkage(db: Session, user_id: int) -> List[Dict[str, Any]]
             is_weekend = target_date.weekday() >= 5
             
             # Optional leave day logic
-            is_optional_day = is_optional_leave_day(db, target_date)
+            is_optional_day = target_date in optional_days
             
             if is_optional_day:
                 results.append({
@@ -1059,12 +1082,13 @@ def get_manager_next_30_day_shrinkage(db: Session, manager_id: int) -> List[Dict
         end_date = today + timedelta(days=30)
 
         # Get all approved leaves for these associates in the next 30 days
-        approved_leaves = db.query(LeaveRequest).filter(
+        approved_leaves = db.query(LeaveRequest).options(joinedload(LeaveRequest.user)).filter(
             LeaveRequest.user_id.in_(associate_ids),
             LeaveRequest.status == "Approved",
             LeaveRequest.start_date <= end_date,
             LeaveRequest.end_date >= today
         ).all()
+        optional_days = get_optional_leave_days(db, today, end_date)
 
         logger.info(f"Found {len(approved_leaves)} approved leaves for manager's team")
 
@@ -1076,7 +1100,7 @@ def get_manager_next_30_day_shrinkage(db: Session, manager_id: int) -> List[Dict
             
             # Include ALL days (weekends and weekdays)
             is_weekend = target_date.weekday() >= 5
-            is_optional_day = is_optional_leave_day(db, target_date)
+            is_optional_day = target_date in optional_days
 
             leave_count = 0.0
             on_leave_users = []
@@ -1261,7 +1285,7 @@ def get_team_leave_calendar(db: Session, team_id: int, start_date: date, end_dat
         if not team_members:
             return {"calendar": [], "team_size": 0}
             
-        leaves = db.query(LeaveRequest).join(User).filter(
+        leaves = db.query(LeaveRequest).join(User).options(joinedload(LeaveRequest.user)).filter(
             User.team_id == team_id,
             User.role == 'associate',
             LeaveRequest.status.in_(['Approved', 'Pending']),
@@ -1309,52 +1333,28 @@ def get_team_leave_calendar(db: Session, team_id: int, start_date: date, end_dat
         return {"calendar": [], "team_size": 0, "error": str(e)}
 
 def get_leave_analytics(db: Session, team_id: int, year: int = None) -> Dict[str, Any]:
-    """Get comprehensive leave analytics for a team"""
+    """Get comprehensive leave analytics for a team: working days from the leave rollup"""
     try:
         if year is None:
             year = datetime.now().year
 
-        start_date = datetime(year, 1, 1).date()
-        end_date = datetime(year, 12, 31).date()
-
         # Get team size
         team_size = db.query(User).filter_by(team_id=team_id, role='associate').count()
         if team_size == 0:
             return {"error": "No team members found"}
 
-        # Get all leaves for the year (include any overlap)
-        leaves = db.query(LeaveRequest).join(User).filter(
-            User.team_id == team_id,
-            User.role == 'associate',
-            LeaveRequest.start_date <= end_date,
-            LeaveRequest.end_date >= start_date,
-            LeaveRequest.status == 'Approved'
-        ).all()
-
-        # Calculate analytics
-        total_leave_days = sum(
-            0.5 if leave.is_half_day else (leave.end_date - leave.start_date).days + 1
-            for leave in leaves
-        )
-
         leave_by_type = {}
         leave_by_month = {i: 0 for i in range(1, 13)}
-
-        for leave in leaves:
+        for month, leave_type, days in rollup_days(db, [team_id], year):
             # Count by type (normalize to uppercase)
-            leave_type = leave.leave_type.upper()
-            days = 0.5 if leave.is_half_day else (leave.end_date - leave.start_date).days + 1
+            leave_type = leave_type.upper()
             leave_by_type[leave_type] = leave_by_type.get(leave_type, 0) + days
-
-            # Count by month (use leave.start_date month)
-            month = leave.start_date.month
             leave_by_month[month] += days
 
-        # Calculate monthly shrinkage
-        monthly_shrinkage = {}
-        for month in range(1, 13):
-            shrinkage = get_monthly_shrinkage(db, team_id, year, month)
-            monthly_shrinkage[month] = shrinkage
+        total_leave_days = sum(leave_by_month.values())
+        monthly_shrinkage = {
+            month: shrinkage_percent(days, team_size, year, month) for month, days in leave_by_month.items()
+        }
 
         return {
             "team_size": team_size,
@@ -1501,7 +1501,7 @@ def get_pending_approvals(db: Session, manager_id: int) -> List[Dict[str, Any]]:
         if not user_ids:
             return []
             
-        pending_leaves = db.query(LeaveRequest).filter(
+        pending_leaves = db.query(LeaveRequest).options(joinedload(LeaveRequest.user)).filter(
             LeaveRequest.user_id.in_(user_ids),
             LeaveRequest.status == 'Pending'
         ).order_by(LeaveRequest.applied_on.asc()).all()
@@ -1529,6 +1529,13 @@ def get_pending_approvals(db: Session, manager_id: int) -> List[Dict[str, Any]]:
         logger.error(f"Error getting pending approvals: {e}")
         return []
 
+def split_urgent_approvals(approvals: List[Dict[str, Any]], today: Optional[date] = None,
+                           days: int = URGENT_APPROVAL_DAYS) -> List[Dict[str, Any]]:
+    """Return the pending approvals whose leave starts within `days` days"""
+    cutoff = (today or datetime.now().date()) + timedelta(days=days)
+    return [leave for leave in approvals
+            if datetime.strptime(leave["start_date"], "%Y-%m-%d").date() <= cutoff]
+
 def approve_reject_leave(db: Session, leave_id: int, manager_id: int, action: str, 
                         comments: str = "") -> Dict[str, Any]:
     """Approve or reject a leave request"""
@@ -1568,22 +1575,20 @@ def approve_reject_leave(db: Session, leave_id: int, manager_id: int, action: st
             action=action,
             comments=comments or f"Leave {action.lower()} by manager"
         ))
-        
+
+        # Queue notification email with the status change
+        queue_leave_email(
+            db,
+            to_email=f"{leave.user.username}{EMAIL_DOMAIN}",
+            associate_name=leave.user.username,
+            leave_type=leave.leave_type,
+            start_date=leave.start_date,
+            end_date=leave.end_date,
+            status=action,
+            backup_name=leave.backup_person
+        )
+
         db.commit()
-        
-        # Send notification email
-        try:
-            send_leave_email(
-                to_email=f"{leave.user.username}{EMAIL_DOMAIN}",
-                associate_name=leave.user.username,
-                leave_type=leave.leave_type,
-                start_date=leave.start_date,
-                end_date=leave.end_date,
-                status=action,
-                backup_name=leave.backup_person
-            )
-        except Exception as e:
-            logger.error(f"Error sending notification email: {e}")
             
         return {
             "message": f"Leave {action.lower()} successfully",
@@ -1,50 +1,32 @@
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
+from datetime import datetime
 import logging
-import time
 import os
 import traceback
 
-# Configure logging with more detailed format for production
-logging.basicConfig(
-    level=logging.INFO if os.getenv("ENVIRONMENT", "development") != "production" else logging.WARNING,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from .request_logging import RequestIDMiddleware, configure_logging
+
+# Log records are queued and written by a listener thread as JSON (LOG_FORMAT=text for local runs)
+configure_logging(logging.INFO if os.getenv("ENVIRONMENT", "development") != "production" else logging.WARNING)
 logger = logging.getLogger(__name__)
 
 # Load .env variables
 load_dotenv()
 
-# Request ID middleware for tracking requests
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = request.headers.get("X-Request-ID", None)
-        if request_id is None:
-            import uuid
-            request_id = str(uuid.uuid4())
-        
-        # Add request_id to all log contexts for this request
-        logger.info(f"Request {request_id} started: {request.method} {request.url.path}")
-        start_time = time.time()
-        
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(process_time)
-            logger.info(f"Request {request_id} completed in {process_time:.4f}s - Status: {response.status_code}")
-            return response
-        except Exception as e:
-            process_time = time.time() - start_time
-            logger.error(f"Request {request_id} failed after {process_time:.4f}s: {str(e)}")
-            return JSONResponse(
-                status_code=500, 
-                content={"detail": "Internal server error", "request_id": request_id}
-            )
+from .database import engine
+from .executors import PoolSaturated, shutdown_pools
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, install_query_hooks, render_metrics
+from .query_budget import QueryBudgetMiddleware, install_budget_hooks
+from .profiler import ProfilerMiddleware
+from .slow_queries import SLOW_QUERY_MS, SlowQueryMiddleware, install_slow_query_hooks
 
 # Application setup
 app = FastAPI(
@@ -74,9 +56,26 @@ app.add_middleware(
 # Add compression middleware
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Sampling profiler for requests sent with X-Profile or while armed from /admin/profiler; inside
+# RequestIDMiddleware so profiles are saved under the request ID
+app.add_middleware(ProfilerMiddleware)
+
 # Add request tracking middleware
 app.add_middleware(RequestIDMiddleware)
 
+# Per-route SQL budgets (see @query_budget on the endpoints)
+app.add_middleware(QueryBudgetMiddleware)
+install_budget_hooks(engine)
+
+# Slow statements with their EXPLAIN QUERY PLAN (see /admin/slow-queries)
+if SLOW_QUERY_MS > 0:
+    app.add_middleware(SlowQueryMiddleware)
+    install_slow_query_hooks(engine)
+
+# Outermost, so latency and SQL counts cover every other middleware too
+app.add_middleware(MetricsMiddleware)
+install_query_hooks(engine)
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -100,6 +99,12 @@ from .admin_routes import router as admin_router
 from .notifications_routes import router as notif_router
 from .reporting_routes import router as report_router
 from app.logic import ValidationError, LeaveProcessingError  # <-- import your custom exceptions
+from .email_outbox import outbox_worker
+from .email_utils import close_smtp_pool
+from .report_jobs import report_jobs
+from .schema_upgrade import upgrade_schema
+
+_import_seconds = time.perf_counter() - _import_started
 
 # Mount routers
 app.include_router(auth_router)
@@ -132,6 +137,12 @@ def health_check():
     """Health check endpoint for load balancers and monitoring"""
     return {"status": "healthy"}
 
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # Add a debug endpoint to see all registered routes - only in development
 if os.getenv("ENVIRONMENT", "development") != "production":
     @app.get("/debug/routes")
@@ -148,14 +159,31 @@ if os.getenv("ENVIRONMENT", "development") != "production":
 
 @app.on_event("startup")
 async def startup_event():
-    """Log all routes on startup for debugging"""
+    """Bring the schema up to date and start background workers (routes are listed at DEBUG level)"""
     environment = os.getenv("ENVIRONMENT", "development")
-    logger.info(f"Starting Leave Automation API in {environment} mode...")
-    
-    if environment != "production":
-        logger.info("Registered routes:")
+    logger.info(f"Starting Leave Automation API in {environment} mode: {len(app.routes)} routes, "
+                f"app.main imported in {_import_seconds:.3f}s (python -m benchmarks.importtime for a breakdown)")
+
+    if logger.isEnabledFor(logging.DEBUG):
         for route in app.routes:
-            logger.info(f"Route: {route.path}, Methods: {route.methods}")
+            logger.debug(f"Route: {route.path}, Methods: {getattr(route, 'methods', None)}")
+
+    # Bring an existing database up to date with additive model changes
+    try:
+        upgrade_schema()
+    except Exception as e:
+        logger.error(f"Schema upgrade failed: {e}")
+
+    if os.getenv("EMAIL_OUTBOX_WORKER", "true").lower() == "true":
+        outbox_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    await outbox_worker.stop()
+    close_smtp_pool()
+    report_jobs.shutdown()
+    shutdown_pools()
 
 
 
@@ -179,4 +207,17 @@ async def processing_exception_handler(request: Request, exc: LeaveProcessingErr
             "status": "error",
             "timestamp": datetime.now().isoformat()
         }
-    )
\ No newline at end of file
+    )
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={
+            "message": str(exc),
+            "status": "error",
+            "timestamp": datetime.now().isoformat()
+        }
+    )
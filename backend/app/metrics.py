@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# -------------------- Configuration --------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+UNMATCHED_ROUTE = "unmatched"  # 404s would otherwise add one series per probed URL
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self.header()
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+REQUEST_QUERIES = Histogram("db_queries_per_request", "SQL statements issued per HTTP request",
+                            ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_SECONDS = Histogram("db_query_seconds_per_request", "Time spent in SQL per HTTP request",
+                                  ("method", "route"))
+QUERIES = Counter("db_queries_total", "SQL statements executed")
+QUERY_SECONDS = Counter("db_query_seconds_total", "Time spent executing SQL statements")
+
+REGISTRY = [REQUESTS, LATENCY, IN_FLIGHT, REQUEST_QUERIES, REQUEST_QUERY_SECONDS, QUERIES, QUERY_SECONDS]
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------- Per-request SQL accounting --------------------
+class RequestQueryStats:
+    """SQL statements and time for one request; shared by the threads and tasks serving it"""
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    QUERIES.inc()
+    QUERY_SECONDS.inc(amount=elapsed)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def install_query_hooks(engine: Engine):
+    """Count and time every statement on `engine`, globally and against the current request"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -------------------- ASGI middleware --------------------
+class MetricsMiddleware:
+    """Records latency, status, in-flight count and SQL usage per route template (pure ASGI, streaming-safe)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec(method)
+            current_query_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            REQUESTS.inc(method, route, status)
+            LATENCY.observe(elapsed, method, route)
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_QUERY_SECONDS.observe(stats.seconds, method, route)
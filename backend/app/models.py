@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Date, DateTime,
-    ForeignKey, Float, Boolean
+    ForeignKey, Float, Boolean, Text, Index
 )
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -17,6 +17,7 @@ class User(Base):
     role = Column(String)
     team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)
     reports_to_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # ✅ Manager hierarchy
+    joined_on = Column(Date, nullable=True)  # Used to pro-rate accruals; NULL means joined before accruals began
 
     # Relationships
     team = relationship("Team", back_populates="members", foreign_keys=[team_id])
@@ -87,6 +88,9 @@ class Threshold(Base):
     month = Column(String)
     leave_count = Column(Integer, default=0)
 
+    # One counter row per user and month, so increments can be atomic upserts
+    __table_args__ = (Index("ux_thresholds_user_month", "user_id", "month", unique=True),)
+
     def __repr__(self):
         return f"<Threshold(user_id={self.user_id}, month={self.month}, count={self.leave_count})>"
 
@@ -109,6 +113,7 @@ class LeaveLog(Base):
 
 class LeaveBalance(Base):
     __tablename__ = "leave_balances"
+    __table_args__ = (Index("ix_leave_balances_user_type", "user_id", "leave_type"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -131,6 +136,74 @@ class Notification(Base):
     def __repr__(self):
         return f"<Notification(id={self.id}, user_id={self.user_id}, message={self.message})>"
 
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_body = Column(String, nullable=False)
+    status = Column(String, default="Pending", index=True)  # Pending, Sending, Sent, Dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id}, to={self.to_email}, status={self.status}, attempts={self.attempts})>"
+
+
+class ManagerDigestState(Base):
+    __tablename__ = "manager_digest_state"
+
+    id = Column(Integer, primary_key=True)
+    manager_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    last_sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ManagerDigestState(manager_id={self.manager_id}, last_sent_at={self.last_sent_at})>"
+
+
+class AccrualRun(Base):
+    __tablename__ = "accrual_runs"
+
+    id = Column(Integer, primary_key=True)
+    period = Column(String, unique=True, nullable=False)  # YYYY-MM
+    ran_at = Column(DateTime, default=datetime.utcnow)
+    ran_by = Column(String, nullable=True)
+    report = Column(Text)  # JSON summary of what the run changed
+
+    def __repr__(self):
+        return f"<AccrualRun(period={self.period}, ran_at={self.ran_at})>"
+
+
+class LeaveRollup(Base):
+    __tablename__ = "leave_rollup"
+
+    # Associates' leave by their current team; maintained by app.leave_rollup on every leave write
+    team_id = Column(Integer, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    leave_type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    days = Column(Float, nullable=False, default=0.0)  # working days (Mon-Fri); a half day counts 0.5
+
+    def __repr__(self):
+        return f"<LeaveRollup(team_id={self.team_id}, {self.year}-{self.month:02d}, {self.leave_type}, {self.status}, days={self.days})>"
+
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    scope = Column(String, primary_key=True)  # "global", "all-teams", "org", "team:<id>" or "manager:<id>"
+    version = Column(Integer, nullable=False, default=0)  # bumped in the same transaction as every tracked write
+
+    def __repr__(self):
+        return f"<CacheVersion(scope={self.scope}, version={self.version})>"
+
 from sqlalchemy import Column, Integer, Date
 from app.database import Base
 
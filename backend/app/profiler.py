@@ -0,0 +1,246 @@
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")  # "X-Profile: <token>" profiles one request; unset disables the header
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 30))  # sampling stops here even if the request runs on
+PROFILE_MIN_INTERVAL_SECONDS = float(os.getenv("PROFILE_MIN_INTERVAL_SECONDS", 60))  # between two profiled requests
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))  # oldest profiles are deleted beyond this
+PROFILE_MAX_ARMED_REQUESTS = 20
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Stacks whose innermost frame is in these modules are threads waiting for work, not doing it
+_IDLE_MODULES = {"threading.py", "selectors.py", "queue.py"}
+_UNSAFE_ID = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def profile_name(request_id: str) -> str:
+    """File name for a request's profile; request IDs can come from clients, so keep them path-safe"""
+    return f"{_UNSAFE_ID.sub('_', request_id)[:64].lstrip('.') or 'request'}.speedscope.json"
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack from a background thread and exports speedscope JSON"""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self._frames: List[Dict[str, Any]] = []
+        self._frame_index: Dict[Tuple[str, str, int], int] = {}
+        self._samples: List[List[int]] = []
+        self._weights: List[float] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def _frame(self, name: str, file: str = "", line: int = 0) -> int:
+        key = (name, file, line)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self._frames)
+            self._frames.append({"name": name, "file": file, "line": line} if file else {"name": name})
+        return index
+
+    def _sample(self, weight_ms: float):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or os.path.basename(frame.f_code.co_filename) in _IDLE_MODULES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(self._frame(code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.append(self._frame(f"thread {names.get(ident, ident)}"))
+            stack.reverse()
+            self._samples.append(stack)
+            self._weights.append(weight_ms)
+
+    def _run(self):
+        last = self._started
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - self._started > self.max_seconds:
+                logger.warning(f"Profiler stopped sampling after {self.max_seconds}s")
+                break
+            self._sample((now - last) * 1000)
+            last = now
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._elapsed = (time.perf_counter() - self._started) * 1000
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "app.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self._frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(self._elapsed, 3),
+                "samples": self._samples,
+                "weights": [round(weight, 3) for weight in self._weights],
+            }],
+        }
+
+
+class ProfilerControl:
+    """Decides which requests get profiled: a valid X-Profile token or an admin arming, then strict rate limits"""
+
+    def __init__(self, directory: str = PROFILE_DIR, token: Optional[str] = PROFILER_TOKEN,
+                 min_interval: float = PROFILE_MIN_INTERVAL_SECONDS, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.token = token
+        self.min_interval = min_interval
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._busy = False
+        self._last_started: Optional[float] = None
+        self._armed = 0
+        self._armed_prefix = ""
+        self._armed_until: Optional[datetime] = None
+
+    def arm(self, requests: int, path_prefix: str = "", minutes: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            self._armed = min(requests, PROFILE_MAX_ARMED_REQUESTS)
+            self._armed_prefix = path_prefix
+            self._armed_until = datetime.now() + timedelta(minutes=minutes)
+        return self.status()
+
+    def disarm(self):
+        with self._lock:
+            self._armed = 0
+
+    def status(self) -> Dict[str, Any]:
+        armed = self._armed if self._armed_until and datetime.now() < self._armed_until else 0
+        return {"armed_requests": armed, "path_prefix": self._armed_prefix,
+                "armed_until": self._armed_until if armed else None,
+                "header_enabled": bool(self.token), "min_interval_seconds": self.min_interval}
+
+    def _header_valid(self, headers) -> bool:
+        if not self.token:
+            return False
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.token.encode())
+        return False
+
+    def try_start(self, path: str, headers) -> bool:
+        """Claim the single profiling slot for this request, if it asked and the rate limit allows"""
+        by_header = self._header_valid(headers)
+        with self._lock:
+            by_arming = (self._armed > 0 and path.startswith(self._armed_prefix)
+                         and self._armed_until is not None and datetime.now() < self._armed_until)
+            if not (by_header or by_arming):
+                return False
+            now = time.monotonic()
+            if self._busy or (self._last_started is not None and now - self._last_started < self.min_interval):
+                logger.info(f"Profiling of {path} skipped by rate limit")
+                return False
+            if by_arming and not by_header:
+                self._armed -= 1
+            self._busy = True
+            self._last_started = now
+            return True
+
+    def finish(self, request_id: str, profiler: SamplingProfiler, label: str) -> Optional[str]:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, profile_name(request_id))
+            with open(path, "w") as f:
+                json.dump(profiler.speedscope(f"{label} ({request_id})"), f)
+            self._prune()
+            logger.info(f"Profile for request {request_id} written to {path}")
+            return path
+        except OSError as e:
+            logger.error(f"Could not write profile for request {request_id}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._busy = False
+
+    def _prune(self):
+        profiles = self.list_profiles()
+        for stale in profiles[self.max_files:]:
+            os.remove(os.path.join(self.directory, stale["file"]))
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Saved profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".speedscope.json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                profiles.append({"file": name, "request_id": name[:-len(".speedscope.json")],
+                                 "bytes": stat.st_size, "created": datetime.fromtimestamp(stat.st_mtime)})
+        return sorted(profiles, key=lambda p: p["created"], reverse=True)
+
+    def profile_path(self, request_id: str) -> Optional[str]:
+        path = os.path.join(self.directory, profile_name(request_id))
+        return path if os.path.isfile(path) else None
+
+
+profiler_control = ProfilerControl()
+
+
+class ProfilerMiddleware:
+    """Runs the sampling profiler around requests chosen by `profiler_control` (pure ASGI).
+
+    Sits inside RequestIDMiddleware, which leaves the request ID in scope["state"].
+    """
+
+    def __init__(self, app, control: ProfilerControl = profiler_control):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.control.try_start(scope["path"], scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = scope.get("state", {}).get("request_id") or f"{time.time():.6f}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, request_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            await run_in_threadpool(self.control.finish, request_id, profiler, f"{scope['method']} {scope['path']}")
@@ -0,0 +1,154 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+# off: no tracking; log: warn when a route goes over budget; raise: fail the request (tests)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").lower()
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", 0)) or None  # for routes that declare none
+QUERY_BUDGET_REPORT_SHAPES = 5
+QUERY_BUDGET_REPORT_SITES = 3
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_IGNORED_FILES = {os.path.join(APP_DIR, name) for name in ("query_budget.py", "metrics.py", "database.py")}
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """A request or tracked block issued more SQL statements than its declared budget"""
+
+    def __init__(self, label: str, budget: int, used: int, report: str):
+        self.label = label
+        self.budget = budget
+        self.used = used
+        self.report = report
+        super().__init__(f"{label} issued {used} queries (budget {budget})\n{report}")
+
+
+def query_budget(limit: int) -> Callable:
+    """Declare the most SQL statements one call of a route may issue"""
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__query_budget__ = limit
+        return endpoint
+    return decorator
+
+
+def normalize_sql(statement: str) -> str:
+    """Statement shape: literals and IN-list placeholders collapsed, so repeats of one query group together"""
+    shape = _LITERALS.sub("?", statement)
+    shape = _PLACEHOLDER_LISTS.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _call_site() -> str:
+    """The innermost app frame that led to the statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename not in _IGNORED_FILES:
+            return f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "outside app"
+
+
+class QueryRecorder:
+    """Statement shapes and their call sites for one request or tracked block"""
+
+    def __init__(self, label: str, budget: Optional[int] = None):
+        self.label = label
+        self.budget = budget
+        self.statements: List[Tuple[str, str]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str):
+        self.statements.append((statement, _call_site()))
+
+    def report(self) -> str:
+        """The most repeated statement shapes with where they were issued from"""
+        shapes = Counter()
+        sites: Dict[str, Counter] = defaultdict(Counter)
+        for statement, site in self.statements:
+            shape = normalize_sql(statement)
+            shapes[shape] += 1
+            sites[shape][site] += 1
+        lines = []
+        for shape, count in shapes.most_common(QUERY_BUDGET_REPORT_SHAPES):
+            lines.append(f"  {count}x {shape[:200]}")
+            for site, site_count in sites[shape].most_common(QUERY_BUDGET_REPORT_SITES):
+                lines.append(f"      {site_count}x from {site}")
+        return "\n".join(lines)
+
+    def enforce(self, mode: str = None):
+        mode = mode or QUERY_BUDGET_MODE
+        if self.budget is None or self.count <= self.budget or mode == "off":
+            return
+        error = QueryBudgetExceeded(self.label, self.budget, self.count, self.report())
+        if mode == "raise":
+            raise error
+        logger.warning(f"Query budget exceeded: {error}")
+
+
+current_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar("current_query_recorder", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = current_recorder.get()
+    if recorder is not None:
+        recorder.record(statement)
+
+
+def install_budget_hooks(engine: Engine):
+    """Feed every statement on `engine` to the active recorder"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def track_queries(label: str, budget: Optional[int] = None, mode: Optional[str] = None):
+    """Record the statements issued inside the block and enforce `budget` on exit (tests use mode="raise")"""
+    recorder = QueryRecorder(label, budget)
+    token = current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        current_recorder.reset(token)
+    recorder.enforce(mode)
+
+
+class QueryBudgetMiddleware:
+    """Applies each route's declared @query_budget to the whole request (pure ASGI)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or QUERY_BUDGET_MODE == "off":
+            await self.app(scope, receive, send)
+            return
+
+        recorder = QueryRecorder(f"{scope['method']} {scope['path']}")
+        token = current_recorder.set(recorder)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_recorder.reset(token)
+        route = scope.get("route")
+        if route is not None:
+            recorder.label = f"{scope['method']} {route.path}"
+            recorder.budget = getattr(getattr(route, "endpoint", None), "__query_budget__", QUERY_BUDGET_DEFAULT)
+        recorder.enforce()
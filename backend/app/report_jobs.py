@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date, datetime
+from functools import partial
+from typing import Any, BinaryIO, Dict, Optional
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from . import data_versions
+from .database import DATABASE_URL
+from .executors import PROCESS, ExecutorPool, cpu_pool
+from .models import LeaveRequest, User
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_cache"))
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 2))
+REPORT_JOB_QUEUE = int(os.getenv("REPORT_JOB_QUEUE", 8))
+REPORT_JOB_HISTORY = int(os.getenv("REPORT_JOB_HISTORY", 200))
+REPORT_FETCH_ROWS = 1000
+
+SPEC_FIELDS = ("start_date", "end_date", "team_id", "manager_id", "status")
+
+
+def build_leave_export_query(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                             team_id: Optional[int] = None, manager_id: Optional[int] = None,
+                             status: Optional[str] = None):
+    """Projected Core query for leave exports; the date range matches any overlapping leave"""
+    stmt = select(
+        User.username, LeaveRequest.leave_type, LeaveRequest.start_date,
+        LeaveRequest.end_date, LeaveRequest.status
+    ).join(User, LeaveRequest.user_id == User.id)
+
+    if start_date:
+        stmt = stmt.where(LeaveRequest.end_date >= start_date)
+    if end_date:
+        stmt = stmt.where(LeaveRequest.start_date <= end_date)
+    if team_id is not None:
+        stmt = stmt.where(User.team_id == team_id)
+    if manager_id is not None:
+        stmt = stmt.where(User.reports_to_id == manager_id)
+    if status:
+        stmt = stmt.where(LeaveRequest.status == status)
+    return stmt.order_by(LeaveRequest.id)
+
+
+def normalize_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical form of a report spec: known filters only, unset ones dropped, dates as ISO strings"""
+    normalized = {}
+    for field in SPEC_FIELDS:
+        value = spec.get(field)
+        if value is None or value == "":
+            continue
+        normalized[field] = value.isoformat() if isinstance(value, date) else value
+    return normalized
+
+
+def spec_hash(spec: Dict[str, Any]) -> str:
+    canonical = json.dumps(normalize_spec(spec), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def data_version(db: Session) -> str:
+    """
+    Version of the data a leave report reads.
+
+    The global data version is bumped in the same transaction as every write to leaves, leave logs, users
+    and teams, so edits that move users between teams or managers invalidate reports too.
+    """
+    return f"v{data_versions.data_version(db, data_versions.GLOBAL_SCOPE)}"
+
+
+def artifact_path(cache_dir: str, spec_key: str, version: str) -> str:
+    return os.path.join(cache_dir, f"leaves-{spec_key}-{version}.pdf")
+
+
+def version_number(version: str) -> int:
+    """The counter in a data_version() string ("v12" -> 12)"""
+    return int(version.lstrip("v"))
+
+
+def render_leave_report_pdf(database_url: str, spec: Dict[str, Any], output_path: str) -> int:
+    """
+    Render the leave report to `output_path` and return the number of rows written.
+
+    Runs in a worker process with its own engine. Rows are streamed with yield_per and each finished
+    page is compressed, so memory does not grow with the row count the way a full .all() load does.
+    """
+    # ReportLab is only needed here, in report workers, so the API does not pay for it at startup
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    filters = {
+        field: date.fromisoformat(value) if field in ("start_date", "end_date") else value
+        for field, value in spec.items()
+    }
+    engine = create_engine(
+        database_url,
+        connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    )
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    rows = 0
+    try:
+        with Session(engine) as db:
+            pdf = canvas.Canvas(tmp_path, pagesize=letter, pageCompression=1)
+            width, height = letter
+
+            pdf.setFont("Helvetica-Bold", 14)
+            pdf.drawString(30, height - 40, "Leave Report")
+            pdf.setFont("Helvetica", 10)
+
+            y = height - 60
+            pdf.drawString(30, y, "Name | Leave Type | Start | End | Status")
+            y -= 20
+
+            result = db.execute(build_leave_export_query(**filters).execution_options(yield_per=REPORT_FETCH_ROWS))
+            for partition in result.partitions():
+                for username, leave_type, start_date, end_date, status in partition:
+                    pdf.drawString(30, y, f"{username} | {leave_type} | {start_date} | {end_date} | {status}")
+                    rows += 1
+                    y -= 15
+                    if y < 50:
+                        pdf.showPage()
+                        pdf.setFont("Helvetica", 10)
+                        y = height - 40
+            pdf.save()
+        # Publish atomically so readers never see a half-written artifact
+        os.replace(tmp_path, output_path)
+        return rows
+    finally:
+        engine.dispose()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ReportJobManager:
+    """Runs report jobs in a process pool and caches artifacts on disk by spec hash and data version"""
+
+    def __init__(self, cache_dir: str = REPORT_CACHE_DIR, max_workers: int = REPORT_JOB_WORKERS,
+                 database_url: str = DATABASE_URL, history: int = REPORT_JOB_HISTORY,
+                 pool: Optional[ExecutorPool] = None):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.database_url = database_url
+        self.history = history
+        self.pool = pool or ExecutorPool("report-jobs", PROCESS, max_workers, REPORT_JOB_QUEUE)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._finished: Dict[str, threading.Event] = {}  # set once a running job's outcome is recorded
+        self._futures: Dict[str, Future] = {}
+        self._latest_version = 0  # newest data version any submit has seen
+        self._lock = threading.Lock()
+
+    def submit(self, db: Session, spec: Dict[str, Any], requested_by: Optional[str] = None) -> Dict[str, Any]:
+        """Start (or reuse) a report job for `spec` and return its public status; PoolSaturated if the pool is full"""
+        spec = normalize_spec(spec)
+        spec_key = spec_hash(spec)
+        version = data_version(db)
+        path = artifact_path(self.cache_dir, spec_key, version)
+
+        with self._lock:
+            self._latest_version = max(self._latest_version, version_number(version))
+            # An identical report already being built is shared rather than built twice
+            for job in self._jobs.values():
+                if job["spec_hash"] == spec_key and job["data_version"] == version and job["status"] == "Running":
+                    return self._public(job)
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": "Running",
+                "spec": spec,
+                "spec_hash": spec_key,
+                "data_version": version,
+                "path": path,
+                "cached": False,
+                "rows": None,
+                "error": None,
+                "requested_by": requested_by,
+                "created_at": datetime.utcnow(),
+                "finished_at": None,
+            }
+            future = None
+            if os.path.exists(path):
+                job.update(status="Done", cached=True, finished_at=job["created_at"])
+            else:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                future = self.pool.submit(render_leave_report_pdf, self.database_url, spec, path)
+                self._finished[job["job_id"]] = threading.Event()
+                self._futures[job["job_id"]] = future
+
+            self._jobs[job["job_id"]] = job
+            while len(self._jobs) > self.history:
+                old_id, _ = self._jobs.popitem(last=False)
+                self._finished.pop(old_id, None)
+                self._futures.pop(old_id, None)
+            public = self._public(job)
+
+        # Outside the lock: the callback runs inline if the job has already finished
+        if future is not None:
+            future.add_done_callback(partial(self._finish, job["job_id"]))
+        return public
+
+    def _finish(self, job_id: str, future: Future) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            finished = self._finished.pop(job_id, None)
+            self._futures.pop(job_id, None)
+        try:
+            if job is None:
+                return
+            try:
+                rows = future.result()
+            except Exception as e:
+                logger.error(f"Report job {job_id} failed: {e}")
+                with self._lock:
+                    job.update(status="Failed", error=str(e)[:500], finished_at=datetime.utcnow())
+                return
+            logger.info(f"Report job {job_id} finished: {rows} rows")
+            with self._lock:
+                job.update(status="Done", rows=rows, finished_at=datetime.utcnow())
+                # A job that finishes after newer data was seen must not remove the newer artifacts
+                if version_number(job["data_version"]) >= self._latest_version:
+                    self._prune_stale(job["spec_hash"], version_number(job["data_version"]))
+        finally:
+            if finished is not None:
+                finished.set()
+
+    def _prune_stale(self, spec_key: str, version: int) -> None:
+        """Remove artifacts for the same spec built from data older than `version`; called with the lock held"""
+        pattern = re.compile(rf"leaves-{spec_key}-v(\d+)\.pdf")
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            match = pattern.fullmatch(name)
+            if match and int(match.group(1)) < version:
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale report {path}: {e}")
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes (or `timeout` passes) and return its status"""
+        with self._lock:
+            finished = self._finished.get(job_id)
+        if finished is not None:
+            finished.wait(timeout)
+        return self.get(job_id)
+
+    async def wait_async(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """wait() without holding a thread; a caller that gives up does not cancel the shared job"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                # _finish was registered first, so the job's outcome is recorded before this wakes
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except Exception:
+                pass  # timeouts and failures show up in the job's status
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def artifact(self, job_id: str) -> Optional[str]:
+        """Path of a finished job's PDF, or None if it is not ready"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] != "Done" or not os.path.exists(job["path"]):
+                return None
+            return job["path"]
+
+    def open_artifact(self, job_id: str) -> Optional[BinaryIO]:
+        """A finished job's PDF opened for reading, or None if it is not ready; stays readable if pruned meanwhile"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] != "Done":
+                return None
+            try:
+                return open(job["path"], "rb")
+            except FileNotFoundError:
+                return None
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "spec": job["spec"],
+            "data_version": job["data_version"],
+            "cached": job["cached"],
+            "rows": job["rows"],
+            "error": job["error"],
+            "created_at": job["created_at"].isoformat(),
+            "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        }
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
+
+
+report_jobs = ReportJobManager(max_workers=cpu_pool.max_workers, pool=cpu_pool)
@@ -1,78 +1,169 @@
-from fastapi import APIRouter, Depends, Response, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from io import StringIO, BytesIO
+from starlette.background import BackgroundTask
+from io import StringIO
 import csv
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from datetime import datetime
+import os
+import tempfile
+from datetime import datetime, date
+from functools import partial
+from typing import BinaryIO, Literal, Optional
 
 from .database import get_db
-from .models import LeaveRequest, User
+from .models import User
 from .auth import get_current_user
+from .executors import report_pool
+from .report_jobs import build_leave_export_query, report_jobs
+from .analytics_export import EXPORT_FORMATS, build_leave_facts_query, require_pyarrow, write_leave_facts
 
 router = APIRouter()
 
+CSV_HEADER = ["Associate", "Leave Type", "Start Date", "End Date", "Status"]
+CSV_CHUNK_ROWS = 1000
+PDF_SYNC_TIMEOUT_SECONDS = 300
+PDF_CHUNK_BYTES = 64 * 1024
 
-# --------------------- CSV Export ---------------------
-@router.get("/reports/leaves/csv")
-def export_leaves_csv(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Export leave records as CSV (L5 Admin only)."""
-    if current_user.role != "l5":
+
+class ReportSpec(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    team_id: Optional[int] = None
+    manager_id: Optional[int] = None
+    status: Optional[str] = None
+
+
+def check_admin(user: User):
+    if user.role != "l5":
         raise HTTPException(status_code=403, detail="Only L5 Admins can access this")
 
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Associate", "Leave Type", "Start Date", "End Date", "Status"])
 
-    # JOIN instead of repeated .get()
-    leaves = db.query(LeaveRequest).join(User, LeaveRequest.user_id == User.id).all()
-    for leave in leaves:
-        writer.writerow([leave.user.username, leave.leave_type, leave.start_date, leave.end_date, leave.status])
+def iter_leaves_csv(db: Session, stmt, chunk_rows: int = CSV_CHUNK_ROWS):
+    """Yield the CSV export in chunks of `chunk_rows` rows, holding one chunk in memory at a time"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    try:
+        result = db.execute(stmt.execution_options(yield_per=chunk_rows))
+        for rows in result.partitions():
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()  # header only: no matching leaves
+    finally:
+        # The request's session is handed over to the stream, which outlives the endpoint
+        db.close()
+
 
-    output.seek(0)
+# --------------------- CSV Export ---------------------
+@router.get("/reports/leaves/csv")
+async def export_leaves_csv(
+    start_date: Optional[date] = Query(None, description="Include leaves ending on or after this date"),
+    end_date: Optional[date] = Query(None, description="Include leaves starting on or before this date"),
+    team_id: Optional[int] = Query(None, description="Only associates in this team"),
+    manager_id: Optional[int] = Query(None, description="Only associates reporting to this manager"),
+    status: Optional[str] = Query(None, description="Leave status, e.g. Approved or Pending"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream leave records as CSV (L5 Admin only), assembled on the report pool."""
+    check_admin(current_user)
+
+    stmt = build_leave_export_query(start_date, end_date, team_id, manager_id, status)
+    chunks = await report_pool.stream(iter_leaves_csv(db, stmt))
     filename = f"leave_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    return Response(
-        content=output.read(),
+    return StreamingResponse(
+        chunks,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 
+# --------------------- Analytics Export ---------------------
+@router.get("/reports/leaves/analytics")
+async def export_leaves_analytics(
+    format: Literal["parquet", "arrow"] = Query("parquet", description="parquet, or arrow for an Arrow IPC file"),
+    start_date: Optional[date] = Query(None, description="Include leaves ending on or after this date"),
+    end_date: Optional[date] = Query(None, description="Include leaves starting on or before this date"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Export leave facts joined with user, team and manager as Parquet or Arrow (L5 Admin only)."""
+    check_admin(current_user)
+    try:
+        require_pyarrow()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    extension, media_type = EXPORT_FORMATS[format]
+    with tempfile.NamedTemporaryFile(suffix=f".{extension}", delete=False) as tmp:
+        path = tmp.name
+    try:
+        await report_pool.run(write_leave_facts, db, path, format, build_leave_facts_query(start_date, end_date))
+    except Exception:
+        os.remove(path)
+        raise
+
+    filename = f"leave_facts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return FileResponse(path, media_type=media_type, filename=filename, background=BackgroundTask(os.remove, path))
+
+
 # --------------------- PDF Export ---------------------
 @router.get("/reports/leaves/pdf")
-def export_leaves_pdf(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Export leave records as PDF (L5 Admin only)."""
-    if current_user.role != "l5":
-        raise HTTPException(status_code=403, detail="Only L5 Admins can access this")
+async def export_leaves_pdf(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Export all leave records as PDF (L5 Admin only), served from the report cache when the data is unchanged."""
+    check_admin(current_user)
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    pdf.setFont("Helvetica-Bold", 14)
-    pdf.drawString(30, height - 40, "Leave Report")
-    pdf.setFont("Helvetica", 10)
-
-    y = height - 60
-    pdf.drawString(30, y, "Name | Leave Type | Start | End | Status")
-    y -= 20
-
-    # JOIN instead of repeated .get()
-    leaves = db.query(LeaveRequest).join(User, LeaveRequest.user_id == User.id).all()
-    for leave in leaves:
-        line = f"{leave.user.username} | {leave.leave_type} | {leave.start_date} | {leave.end_date} | {leave.status}"
-        pdf.drawString(30, y, line)
-        y -= 15
-        if y < 50:
-            pdf.showPage()
-            pdf.setFont("Helvetica", 10)
-            y = height - 40
-
-    pdf.save()
-    buffer.seek(0)
-    filename = f"leave_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    return Response(
-        content=buffer.getvalue(),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    job = await report_pool.run(report_jobs.submit, db, {}, requested_by=current_user.username)
+    job = await report_jobs.wait_async(job["job_id"], timeout=PDF_SYNC_TIMEOUT_SECONDS)
+    report = report_jobs.open_artifact(job["job_id"])
+    if not report:
+        if job["status"] == "Running":
+            raise HTTPException(status_code=504, detail=f"Report is still being generated, poll /reports/jobs/{job['job_id']}")
+        raise HTTPException(status_code=500, detail="Report generation failed")
+
+    return pdf_response(report, f"leave_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+
+
+def pdf_response(report: BinaryIO, filename: str) -> StreamingResponse:
+    """Stream an already-opened report file, so a newer report pruning it meanwhile cannot break the download"""
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(os.fstat(report.fileno()).st_size),
+    }
+    return StreamingResponse(iter(partial(report.read, PDF_CHUNK_BYTES), b""), media_type="application/pdf",
+                             headers=headers, background=BackgroundTask(report.close))
+
+
+# --------------------- Report Jobs ---------------------
+@router.post("/reports/jobs", status_code=202)
+def submit_report_job(spec: ReportSpec, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Queue a filtered PDF leave report; identical requests on unchanged data reuse the cached file."""
+    check_admin(current_user)
+    return report_jobs.submit(db, spec.dict(), requested_by=current_user.username)
+
+
+@router.get("/reports/jobs/{job_id}")
+def get_report_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Poll a report job's status."""
+    check_admin(current_user)
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@router.get("/reports/jobs/{job_id}/download")
+def download_report_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Download a finished report."""
+    check_admin(current_user)
+    job = report_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    report = report_jobs.open_artifact(job_id)
+    if not report:
+        raise HTTPException(status_code=409, detail=f"Report is not ready (status: {job['status']})")
+    return pdf_response(report, f"leave_report_{job_id[:8]}.pdf")
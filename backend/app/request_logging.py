@@ -0,0 +1,172 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # records beyond this are dropped, never waited on
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+# LogRecord attributes that are not `extra=` fields
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the request being served; runs in the thread that logs, before the record is queued"""
+
+    def filter(self, record):
+        record.request_id = current_request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message, request_id and any `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Drops a record instead of blocking the caller when the queue is full"""
+
+    def prepare(self, record):
+        # QueueHandler.prepare folds the traceback into the message; render it into exc_text instead, while the
+        # frames are still alive, so the listener's formatter can still emit it as its own field
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.getMessage(), None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: int = logging.INFO, log_format: str = LOG_FORMAT):
+    """Route every log record through a queue; a listener thread formats and writes them to stderr"""
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+# -------------------- ASGI middleware --------------------
+class RequestIDMiddleware:
+    """
+    Assigns each request an ID (the client's X-Request-ID, or a new UUID) and reports it with
+    X-Process-Time on the response. Pure ASGI, so streaming responses pass through chunk by chunk.
+
+    The ID is left in scope["state"] (request.state.request_id) and in `current_request_id` for log records.
+    X-Process-Time is the time until the response headers were sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = current_request_id.set(request_id)
+        started = time.perf_counter()
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                headers.append((b"x-process-time", str(time.perf_counter() - started).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            process_time = time.perf_counter() - started
+            logger.error(f"Request {request_id} failed after {process_time:.4f}s: {str(e)}",
+                         extra={"method": scope["method"], "path": scope["path"]})
+            if status is not None:
+                raise
+            body = json.dumps({"detail": "Internal server error", "request_id": request_id}).encode()
+            await send_wrapper({"type": "http.response.start", "status": 500, "headers": [
+                (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+        else:
+            process_time = time.perf_counter() - started
+            logger.info(f"Request {request_id} completed in {process_time:.4f}s - Status: {status}",
+                        extra={"method": scope["method"], "path": scope["path"], "status": status,
+                               "duration_ms": round(process_time * 1000, 3)})
+        finally:
+            current_request_id.reset(token)
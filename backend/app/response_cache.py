@@ -0,0 +1,264 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .data_versions import (  # noqa: F401  (re-exported for the routes and tests)
+    ALL_TEAMS_SCOPE, GLOBAL_SCOPE, data_version, data_versions, install_version_hooks, manager_scope, team_scope,
+)
+from .metrics import Counter, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()  # memory | mmap (shared by workers)
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_GZIP_LEVEL = int(os.getenv("RESPONSE_CACHE_GZIP_LEVEL", 6))
+COMPRESS_MIN_BYTES = 1000  # same cut-off as GZipMiddleware; smaller bodies are stored and sent as-is
+
+RESPONSE_CACHE_REQUESTS = Counter("response_cache_requests_total", "Cached-route lookups by result", ("result",))
+REGISTRY.append(RESPONSE_CACHE_REQUESTS)
+
+
+# -------------------- Encodings --------------------
+def _brotli():
+    try:
+        import brotli
+        return brotli.compress
+    except ImportError:
+        return None
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard.ZstdCompressor(level=10).compress
+    except ImportError:
+        return None
+
+
+_codecs: Optional[Dict[str, Callable[[bytes], bytes]]] = None
+
+
+def codecs() -> Dict[str, Callable[[bytes], bytes]]:
+    """Content encodings stored with each entry, best first; brotli and zstd only when installed"""
+    global _codecs
+    if _codecs is None:
+        available = {"br": _brotli(), "zstd": _zstd(),
+                     "gzip": lambda body: gzip.compress(body, RESPONSE_CACHE_GZIP_LEVEL, mtime=0)}
+        _codecs = {name: compress for name, compress in available.items() if compress is not None}
+    return _codecs
+
+
+def accepted_encodings(header: Optional[str]) -> List[str]:
+    """Encodings an Accept-Encoding header allows (q > 0)"""
+    accepted = []
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.append(name.strip().lower())
+    return accepted
+
+
+def encode_json(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class CachedResponse:
+    """Final response body plus its pre-compressed variants"""
+    __slots__ = ("body", "variants", "media_type", "etag")
+
+    def __init__(self, body: bytes, variants: Dict[str, bytes], media_type: str, etag: str):
+        self.body = body
+        self.variants = variants
+        self.media_type = media_type
+        self.etag = etag
+
+    @classmethod
+    def build(cls, body: bytes, media_type: str = "application/json") -> "CachedResponse":
+        variants = {}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            for name, compress in codecs().items():
+                variants[name] = compress(body)
+        return cls(body, variants, media_type, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(variant) for variant in self.variants.values())
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[Optional[str], bytes]:
+        accepted = accepted_encodings(accept_encoding)
+        for name, body in self.variants.items():
+            if name in accepted:
+                return name, body
+        return None, self.body
+
+    def to_bytes(self) -> bytes:
+        header = encode_json({"media_type": self.media_type, "etag": self.etag, "body": len(self.body),
+                              "variants": [[name, len(body)] for name, body in self.variants.items()]})
+        return b"".join([len(header).to_bytes(4, "little"), header, self.body, *self.variants.values()])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        header_length = int.from_bytes(data[:4], "little")
+        header = orjson.loads(data[4:4 + header_length])
+        position = 4 + header_length
+        body = data[position:position + header["body"]]
+        position += header["body"]
+        variants = {}
+        for name, length in header["variants"]:
+            variants[name] = data[position:position + length]
+            position += length
+        return cls(body, variants, header["media_type"], header["etag"])
+
+    def to_response(self, request: Request, cache_status: str, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = {"ETag": self.etag, "Vary": "Accept-Encoding", "X-Cache": cache_status}
+        if extra_headers:
+            headers.update(extra_headers)
+            if "Vary" in extra_headers:
+                headers["Vary"] = f"{extra_headers['Vary']}, Accept-Encoding"
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+        encoding, body = self.select(request.headers.get("accept-encoding"))
+        if encoding:
+            # GZipMiddleware leaves responses that already carry a Content-Encoding alone
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+# -------------------- Backends --------------------
+class MemoryBackend:
+    """Per-process LRU of CachedResponse entries, bounded by total stored bytes"""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class MmapBackend:
+    """Entries serialized into the host-wide memory-mapped store, so every worker serves what any worker built"""
+
+    def __init__(self, store=None):
+        from .shared_cache import MmapStore
+        self.store = store or MmapStore()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        data = self.store.get(key)
+        return CachedResponse.from_bytes(data) if data is not None else None
+
+    def set(self, key: str, entry: CachedResponse):
+        self.store.set(key, entry.to_bytes())
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+def make_backend(name: str = RESPONSE_CACHE_BACKEND):
+    if name == "mmap":
+        try:
+            return MmapBackend()
+        except (OSError, RuntimeError, ValueError) as e:
+            logger.warning(f"Shared response cache unavailable ({e}); using a per-process cache")
+    return MemoryBackend()
+
+
+# -------------------- Cache --------------------
+class ResponseCache:
+    """
+    Encoded, pre-compressed bodies for payloads that only change when the data does.
+
+    Entries are keyed by route and query string, the principal scope the payload was built for
+    (an L5, a team, a user), the versions of the data scopes it reads and today's date (the payloads
+    look at "today"). Empty payloads are not stored by default: the logic functions also return them on errors.
+    A hit replays the stored body byte for byte, so any timestamp inside it is the time the entry was built.
+    """
+
+    def __init__(self, backend=None, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.backend = backend or make_backend()
+        self.enabled = enabled
+
+    @staticmethod
+    def key(request: Request, scope: str, versions: Dict[str, int], cache_key: Optional[str] = None) -> str:
+        if cache_key is None:
+            query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+            cache_key = f"{request.url.path}?{query}"
+        stamps = ",".join(f"{name}={version}" for name, version in sorted(versions.items()))
+        return f"{cache_key}|{scope}|{stamps}|{date.today().isoformat()}"
+
+    def respond(self, request: Request, db: Session, scope: str, build: Callable[[], Any],
+                encode: Callable[[Any], bytes] = encode_json, media_type: str = "application/json",
+                cache_key: Optional[str] = None, versions=(GLOBAL_SCOPE,), headers: Optional[Dict[str, str]] = None,
+                cacheable: Callable[[Any], bool] = bool) -> Response:
+        """
+        Serve the cached body for this request, building, encoding and compressing it on a miss.
+
+        `versions` are the data scopes the payload reads (default: any tracked write invalidates it).
+        `cache_key` lets several routes that return the same payload share entries (default: path and query).
+        `cacheable` decides whether a freshly built payload is stored (default: non-empty).
+        """
+        if not self.enabled:
+            return Response(encode(build()), media_type=media_type, headers=headers)
+        key = self.key(request, scope, data_versions(db, versions), cache_key)
+        entry = self.backend.get(key)
+        if entry is not None:
+            RESPONSE_CACHE_REQUESTS.inc("hit")
+            return entry.to_response(request, "HIT", headers)
+        RESPONSE_CACHE_REQUESTS.inc("miss")
+        payload = build()
+        entry = CachedResponse.build(encode(payload), media_type)
+        if cacheable(payload):
+            self.backend.set(key, entry)
+        return entry.to_response(request, "MISS", headers)
+
+
+response_cache = ResponseCache()
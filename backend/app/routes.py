@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, date, timedelta
+from decimal import Decimal
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field, validator
 import logging
+import os
+import orjson
 from app.database import get_db
 from app.auth import get_current_user
-from app.models import Notification, User, LeaveRequest
+from app.executors import PoolSaturated, report_pool
+from app.models import Notification, OptionalLeaveDate, User, LeaveRequest
+from app.query_budget import query_budget
+from app.response_cache import ALL_TEAMS_SCOPE, GLOBAL_SCOPE, manager_scope, response_cache, team_scope
+from app.wire_format import COLUMNAR_MEDIA_TYPE, to_columnar, wants_columnar
 
 # Import the updated logic functions (FIXED - removed duplicate import)
 from app.logic import (
@@ -32,6 +39,7 @@ from app.logic import (
     get_leave_analytics,
     validate_leave_request_modification,
     get_pending_approvals,
+    split_urgent_approvals,
     approve_reject_leave,
     get_leave_balance_summary,
     
@@ -47,6 +55,9 @@ from app.logic import (
 router = APIRouter(prefix="/api/v1/leave", tags=["Leave Management"])
 logger = logging.getLogger(__name__)
 
+# Opt-in: read endpoints skip re-validating their already-shaped payloads and encode them with orjson
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
 # ==================== PYDANTIC MODELS ====================
 
 class LeaveApplicationRequest(BaseModel):
@@ -156,10 +167,70 @@ def handle_api_error(error: Exception, default_message: str = "An error occurred
         return HTTPException(status_code=422, detail=str(error))
     elif isinstance(error, HTTPException):
         return error
+    elif isinstance(error, PoolSaturated):
+        logger.warning(f"Rejected: {error}")
+        return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
     else:
         logger.error(f"Unexpected error: {error}")
         return HTTPException(status_code=500, detail=default_message)
 
+def _orjson_default(value: Any) -> Any:
+    """Encode the few types orjson lacks the same way jsonable_encoder does"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def encode_fast_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(JSONResponse):
+    """orjson with native date/datetime encoding and non-string dict keys"""
+    def render(self, content: Any) -> bytes:
+        return encode_fast_json(content)
+
+def respond(message: str, status: str = "success", data: Any = None, columnar: bool = False):
+    """A StandardResponse; with FAST_JSON_RESPONSES (or columnar data) the same shape goes straight to orjson"""
+    if not FAST_JSON_RESPONSES and not columnar:
+        return StandardResponse(message=message, status=status, data=data)
+    content = {"message": message, "status": status, "data": data, "timestamp": datetime.now().isoformat()}
+    if columnar:
+        return FastJSONResponse(content, media_type=COLUMNAR_MEDIA_TYPE, headers={"Vary": "Accept"})
+    return FastJSONResponse(content)
+
+def fast_json(payload: Any):
+    """Plain read payloads, encoded by orjson when FAST_JSON_RESPONSES is on"""
+    return FastJSONResponse(payload) if FAST_JSON_RESPONSES else payload
+
+def cached_respond(request: Request, db: Session, scope: str, message: str, build_data):
+    """respond() through the response cache: a hit sends the stored, pre-compressed body, whose
+    "timestamp" is when the entry was built rather than when it is served"""
+    def build():
+        return {"message": message, "status": "success", "data": build_data(),
+                "timestamp": datetime.now().isoformat()}
+    return response_cache.respond(request, db, scope, build, encode=encode_fast_json)
+
+def cached_day_series(request: Request, db: Session, scope: str, build, columnar: bool):
+    """A day-series payload through the response cache, shared by every viewer of the same team or manager"""
+    if columnar:
+        return response_cache.respond(
+            request, db, scope, build, encode=lambda days: encode_fast_json(to_columnar(days)),
+            media_type=COLUMNAR_MEDIA_TYPE, headers={"Vary": "Accept"},
+            cache_key="next30days|columnar", versions=(scope, ALL_TEAMS_SCOPE))
+    return response_cache.respond(request, db, scope, build, encode=encode_fast_json,
+                                  cache_key="next30days|rows", versions=(scope, ALL_TEAMS_SCOPE))
+
+def day_series(days: List[Dict[str, Any]], columnar: bool):
+    """A bare day-series endpoint payload, as rows or as the columnar wire format"""
+    if columnar:
+        return FastJSONResponse(to_columnar(days), media_type=COLUMNAR_MEDIA_TYPE, headers={"Vary": "Accept"})
+    return fast_json(days)
+
 def validate_team_access(current_user: User) -> int:
     """Validate user has team access and return team_id"""
     team_id = current_user.team_id
@@ -244,6 +315,7 @@ async def cancel_leave(
         raise handle_api_error(e, "Failed to cancel leave")
 
 @router.get("/history", response_model=StandardResponse)
+@query_budget(5)
 async def get_leave_history(
     year: Optional[int] = Query(None, description="Year (defaults to current year)", ge=2020, le=2030),
     current_user: User = Depends(get_current_user),
@@ -256,7 +328,7 @@ async def get_leave_history(
         
         history = get_user_leave_history(db, current_user.id, year)
         
-        return StandardResponse(
+        return respond(
             message="Leave history retrieved successfully",
             status="success",
             data={
@@ -269,6 +341,7 @@ async def get_leave_history(
         raise handle_api_error(e, "Failed to get leave history")
 
 @router.get("/balance", response_model=StandardResponse)
+@query_budget(6)
 async def get_balance_summary(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -279,7 +352,7 @@ async def get_balance_summary(
         if "error" in balance_summary:
             raise HTTPException(status_code=400, detail=balance_summary["error"])
         
-        return StandardResponse(
+        return respond(
             message="Balance summary retrieved successfully",
             status="success",
             data=balance_summary
@@ -310,7 +383,7 @@ async def validate_modification(
             db, leave_id, current_user.id, new_start, new_end
         )
         
-        return StandardResponse(
+        return respond(
             message="Validation completed",
             status="success",
             data=validation_result
@@ -321,6 +394,7 @@ async def validate_modification(
 # ==================== TEAM & SHRINKAGE ROUTES ====================
 
 @router.get("/dashboard/shrinkage", response_model=StandardResponse)
+@query_budget(8)
 async def get_team_dashboard_shrinkage(
     date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format (defaults to today)"),
     current_user: User = Depends(get_current_user),
@@ -337,7 +411,7 @@ async def get_team_dashboard_shrinkage(
             team_id = validate_team_access(current_user)
             shrinkage_data = get_dashboard_shrinkage(db, team_id, target_date)
 
-        return StandardResponse(
+        return respond(
             message="Shrinkage data retrieved successfully",
             status="success",
             data={
@@ -349,6 +423,7 @@ async def get_team_dashboard_shrinkage(
         raise handle_api_error(e, "Failed to get shrinkage data")
 
 @router.get("/dashboard/on-leave-today", response_model=StandardResponse)
+@query_budget(5)
 async def get_associates_on_leave_today(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -356,13 +431,13 @@ async def get_associates_on_leave_today(
     """Return associates on leave today for the manager."""
     today = datetime.now().date()
     if current_user.role != "manager":
-        return StandardResponse(message="Not authorized", status="error", data=[])
+        return respond(message="Not authorized", status="error", data=[])
     
     # Get associates reporting to this manager
     associates = db.query(User).filter_by(reports_to_id=current_user.id, role='associate').all()
     associate_ids = [a.id for a in associates]
     
-    leaves = db.query(LeaveRequest).filter(
+    leaves = db.query(LeaveRequest).options(joinedload(LeaveRequest.user)).filter(
         LeaveRequest.user_id.in_(associate_ids),
         LeaveRequest.status == "Approved",
         LeaveRequest.start_date <= today,
@@ -377,9 +452,10 @@ async def get_associates_on_leave_today(
         }
         for leave in leaves
     ]
-    return StandardResponse(message="Associates on leave today", status="success", data=data)
+    return respond(message="Associates on leave today", status="success", data=data)
 
 @router.get("/shrinkage/monthly", response_model=StandardResponse)
+@query_budget(6)
 async def get_team_monthly_shrinkage(
     year: int = Query(..., description="Year", ge=2020, le=2030),
     month: int = Query(..., description="Month (1-12)", ge=1, le=12),
@@ -391,7 +467,7 @@ async def get_team_monthly_shrinkage(
         team_id = validate_team_access(current_user)
         shrinkage = get_monthly_shrinkage(db, team_id, year, month)
         
-        return StandardResponse(
+        return respond(
             message="Monthly shrinkage retrieved successfully",
             status="success",
             data={
@@ -406,36 +482,48 @@ async def get_team_monthly_shrinkage(
         raise handle_api_error(e, "Failed to get monthly shrinkage")
 
 @router.get("/shrinkage/next30days")
-async def get_next_30_days_shrinkage(
+@query_budget(8)
+def get_next_30_days_shrinkage(
+    request: Request,
     user_id: int,
+    format: Optional[str] = Query(None, description="'columnar' for parallel arrays plus a shared leave table"),
+    accept: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """Get next 30 days shrinkage data for a specific user"""
+    columnar = wants_columnar(format, accept)
     user = db.get(User, user_id)
     if user and user.role == "manager":
-        return get_manager_next_30_day_shrinkage(db, user_id)
+        return cached_day_series(request, db, manager_scope(user_id),
+                                 lambda: get_manager_next_30_day_shrinkage(db, user_id), columnar)
+    elif user and user.team_id:
+        # Team-level forecast: every associate of the team shares one entry
+        return cached_day_series(request, db, team_scope(user.team_id),
+                                 lambda: get_next_30_day_shrinkage(db, user_id), columnar)
     else:
-        return get_next_30_day_shrinkage(db, user_id)
+        return day_series(get_next_30_day_shrinkage(db, user_id), columnar)
 
 @router.get("/forecast/l5-30days")
-async def l5_next_30_days(
+def l5_next_30_days(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get L5 availability forecast (L5 role only)"""
     if current_user.role != "l5":
         raise HTTPException(status_code=403, detail="Only L5s allowed")
-    # You can call the same logic as in admin_routes.py
-    try:
-        from app.admin_routes import get_l5_availability
-        return get_l5_availability(db, current_user)
-    except ImportError:
-        raise HTTPException(status_code=501, detail="L5 availability not implemented")
+    # Same payload (and cache entry) as the admin org grid
+    from app.admin_routes import l5_org_grid_response
+    return l5_org_grid_response(request, db, current_user)
 
 # UPDATED: Fixed 30-day forecast route to match enhanced logic
 @router.get("/forecast/30days", response_model=StandardResponse)
-async def get_30_day_forecast(
+@query_budget(8)
+def get_30_day_forecast(
+    request: Request,
     user_id: Optional[int] = Query(None, description="Associate user ID (for managers)"),
+    format: Optional[str] = Query(None, description="'columnar' for parallel arrays plus a shared leave table"),
+    accept: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -466,58 +554,29 @@ async def get_30_day_forecast(
             # Manager viewing their own team data
             target_user_id = current_user.id
         
-        # Get the forecast data using the enhanced functions
+        columnar = wants_columnar(format, accept)
         if current_user.role == "manager":
-            forecast_data = get_manager_next_30_day_shrinkage(db, target_user_id)
+            versions = (manager_scope(target_user_id), ALL_TEAMS_SCOPE)
+        elif current_user.team_id:
+            versions = (team_scope(current_user.team_id), ALL_TEAMS_SCOPE)
         else:
-            forecast_data = get_next_30_day_shrinkage(db, target_user_id)
-
-        logger.info(f"Retrieved {len(forecast_data)} days of forecast data")
-
-        # FIXED: Create default data that includes ALL 30 days (including weekends)
-        if not forecast_data:
-            logger.warning("No forecast data returned, creating default data")
-            today = datetime.now().date()
-            forecast_data = []
-            for i in range(30):
-                target_date = today + timedelta(days=i)
-                forecast_data.append({
-                    "date": target_date.isoformat(),
-                    "day_name": target_date.strftime("%A"),
-                    "shrinkage": 0,
-                    "availability": 100,
-                    "status": "Safe",
-                    "on_leave": [],
-                    "available_count": 0,
-                    "total_team_members": 0,
-                    "leave_count": 0,
-                    "is_weekend": target_date.weekday() >= 5,
-                    "is_optional_day": False
-                })
-
-        # UPDATED: Calculate summary statistics correctly
-        # Count working days (not weekends) for statistics
-        working_days = [day for day in forecast_data if not day.get("is_weekend", False)]
-        all_days = forecast_data  # Include all days for total count
-        
-        avg_shrinkage = sum(day.get("shrinkage", 0) for day in working_days) / len(working_days) if working_days else 0
-        high_risk_days = len([day for day in working_days if day.get("shrinkage", 0) > 10])
-
-        return StandardResponse(
-            message="30-day forecast retrieved successfully",
-            status="success",
-            data={
-                "forecast": forecast_data,  # This now includes ALL 30 days
-                "summary": {
-                    "total_working_days": len(working_days),
-                    "total_days": len(all_days),  # Total days including weekends
-                    "average_shrinkage": round(avg_shrinkage, 2),
-                    "high_risk_days": high_risk_days,
-                    "forecast_period": "Next 30 days",
-                    "user_role": current_user.role,
-                    "target_user_id": target_user_id
-                }
-            }
+            versions = (GLOBAL_SCOPE,)
+        built = {}
+
+        def build():
+            forecast_data = (get_manager_next_30_day_shrinkage(db, target_user_id) if current_user.role == "manager"
+                             else get_next_30_day_shrinkage(db, target_user_id))
+            built["forecast_days"] = len(forecast_data)
+            return build_30_day_forecast(forecast_data, current_user.role, target_user_id, columnar)
+
+        return response_cache.respond(
+            request, db, f"user:{current_user.id}", build, encode=encode_fast_json,
+            media_type=COLUMNAR_MEDIA_TYPE if columnar else "application/json",
+            headers={"Vary": "Accept"} if columnar else None,
+            cache_key=f"{request.url.path}?user_id={user_id}|{'columnar' if columnar else 'rows'}",
+            versions=versions,
+            # The logic functions return [] on errors too; only real forecasts are kept
+            cacheable=lambda payload: built.get("forecast_days", 0) > 0,
         )
     except HTTPException:
         raise
@@ -525,9 +584,61 @@ async def get_30_day_forecast(
         logger.error(f"Error in get_30_day_forecast: {e}")
         raise handle_api_error(e, "Failed to get forecast data")
 
+def build_30_day_forecast(forecast_data: List[Dict[str, Any]], role: str, target_user_id: int, columnar: bool):
+    """The /forecast/30days payload: every day plus working-day summary statistics"""
+    logger.info(f"Retrieved {len(forecast_data)} days of forecast data")
+
+    # FIXED: Create default data that includes ALL 30 days (including weekends)
+    if not forecast_data:
+        logger.warning("No forecast data returned, creating default data")
+        today = datetime.now().date()
+        forecast_data = []
+        for i in range(30):
+            target_date = today + timedelta(days=i)
+            forecast_data.append({
+                "date": target_date.isoformat(),
+                "day_name": target_date.strftime("%A"),
+                "shrinkage": 0,
+                "availability": 100,
+                "status": "Safe",
+                "on_leave": [],
+                "available_count": 0,
+                "total_team_members": 0,
+                "leave_count": 0,
+                "is_weekend": target_date.weekday() >= 5,
+                "is_optional_day": False
+            })
+
+    # UPDATED: Calculate summary statistics correctly
+    # Count working days (not weekends) for statistics
+    working_days = [day for day in forecast_data if not day.get("is_weekend", False)]
+    all_days = forecast_data  # Include all days for total count
+    
+    avg_shrinkage = sum(day.get("shrinkage", 0) for day in working_days) / len(working_days) if working_days else 0
+    high_risk_days = len([day for day in working_days if day.get("shrinkage", 0) > 10])
+
+    return {
+        "message": "30-day forecast retrieved successfully",
+        "status": "success",
+        "timestamp": datetime.now().isoformat(),
+        "data": {
+            "forecast": to_columnar(forecast_data) if columnar else forecast_data,  # This now includes ALL 30 days
+            "summary": {
+                "total_working_days": len(working_days),
+                "total_days": len(all_days),  # Total days including weekends
+                "average_shrinkage": round(avg_shrinkage, 2),
+                "high_risk_days": high_risk_days,
+                "forecast_period": "Next 30 days",
+                "user_role": role,
+                "target_user_id": target_user_id
+            }
+        }
+    }
+
 # ==================== MANAGER-ONLY ROUTES ====================
 
 @router.get("/shrinkage/weekly-carry-forward", response_model=StandardResponse)
+@query_budget(6)
 async def get_weekly_shrinkage_with_carry_forward(
     year: Optional[int] = Query(None, description="Year (defaults to current year)", ge=2020, le=2030),
     month: Optional[int] = Query(None, description="Month (defaults to current month)", ge=1, le=12),
@@ -537,9 +648,9 @@ async def get_weekly_shrinkage_with_carry_forward(
     """Get weekly shrinkage with carry forward calculation (Manager only)"""
     try:
         manager_id = validate_manager_access(current_user)
-        result = calculate_weekly_shrinkage_with_carry_forward(db, manager_id, year, month)
+        result = await report_pool.run(calculate_weekly_shrinkage_with_carry_forward, db, manager_id, year, month)
         
-        return StandardResponse(
+        return respond(
             message="Weekly shrinkage with carry forward retrieved successfully",
             status="success",
             data=result
@@ -548,6 +659,7 @@ async def get_weekly_shrinkage_with_carry_forward(
         raise handle_api_error(e, "Failed to get weekly shrinkage data")
 
 @router.get("/team/availability-summary", response_model=StandardResponse)
+@query_budget(6)
 async def team_availability_summary(
     days: int = 30,
     current_user: User = Depends(get_current_user),
@@ -559,7 +671,7 @@ async def team_availability_summary(
         summary = get_team_availability_summary(db, team_id, days)
         if "error" in summary:
             raise HTTPException(status_code=400, detail=summary["error"])
-        return StandardResponse(
+        return respond(
             message="Team availability summary retrieved successfully",
             status="success",
             data=summary
@@ -568,6 +680,7 @@ async def team_availability_summary(
         raise handle_api_error(e, "Failed to get team availability summary")
 
 @router.get("/pending-approvals", response_model=StandardResponse)
+@query_budget(5)
 async def get_pending_leave_approvals(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -578,11 +691,9 @@ async def get_pending_leave_approvals(
         pending_approvals = get_pending_approvals(db, manager_id)
         
         # Group by priority/urgency
-        urgent_leaves = [leave for leave in pending_approvals 
-                        if datetime.strptime(leave["start_date"], "%Y-%m-%d").date() <= 
-                        (datetime.now().date() + timedelta(days=7))]
+        urgent_leaves = split_urgent_approvals(pending_approvals)
         
-        return StandardResponse(
+        return respond(
             message="Pending approvals retrieved successfully",
             status="success",
             data={
@@ -633,7 +744,7 @@ async def approve_or_reject_leave(
 @router.get("/health", response_model=StandardResponse)
 async def health_check():
     """Health check endpoint for service monitoring"""
-    return StandardResponse(
+    return respond(
         message="Leave management service is healthy",
         status="success",
         data={
@@ -645,6 +756,7 @@ async def health_check():
     )
 
 @router.get("/team/members", response_model=StandardResponse)
+@query_budget(4)
 async def get_team_members(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -676,7 +788,7 @@ async def get_team_members(
             for member in team_members
         ]
         
-        return StandardResponse(
+        return respond(
             message="Team members retrieved successfully",
             status="success",
             data={
@@ -689,6 +801,7 @@ async def get_team_members(
         raise handle_api_error(e, "Failed to get team members")
 
 @router.get("/stats/dashboard", response_model=StandardResponse)
+@query_budget(12)
 async def get_dashboard_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -719,7 +832,7 @@ async def get_dashboard_stats(
             shrinkage_data = get_dashboard_shrinkage(db, current_user.team_id)
             team_shrinkage = shrinkage_data
         
-        return StandardResponse(
+        return respond(
             message="Dashboard stats retrieved successfully",
             status="success",
             data={
@@ -737,6 +850,7 @@ async def get_dashboard_stats(
         raise handle_api_error(e, "Failed to get dashboard stats")
 
 @router.get("/notifications")
+@query_budget(4)
 async def get_notifications(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -746,7 +860,7 @@ async def get_notifications(
         Notification.user_id == current_user.id
     ).order_by(Notification.created_at.desc()).all()
     
-    return {
+    return fast_json({
         "status": "success",
         "data": {
             "notifications": [
@@ -758,10 +872,31 @@ async def get_notifications(
                 } for n in notifications
             ]
         }
-    }
+    })
+
+@router.get("/optional-days")
+@query_budget(3)
+def list_optional_days(
+    request: Request,
+    year: Optional[int] = Query(None, description="Year (defaults to current year)", ge=2020, le=2030),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Company optional leave days for a year"""
+    year = year or date.today().year
+
+    def build():
+        rows = db.query(OptionalLeaveDate.date).filter(
+            OptionalLeaveDate.date >= date(year, 1, 1), OptionalLeaveDate.date <= date(year, 12, 31)
+        ).order_by(OptionalLeaveDate.date)
+        return {"year": year, "dates": [day for (day,) in rows]}
+
+    return response_cache.respond(request, db, "all", build, encode=encode_fast_json)
 
 @router.get("/analytics", response_model=StandardResponse)
+@query_budget(40)
 async def get_team_analytics(
+    request: Request,
     user_id: Optional[int] = Query(None, description="Associate user ID (optional)"),
     month: Optional[str] = Query(None, description="Month name or 'All' (optional)"),
     year: Optional[int] = Query(None, description="Year (defaults to current year)", ge=2020, le=2030),
@@ -773,22 +908,26 @@ async def get_team_analytics(
         if current_user.role not in ["manager", "team_lead"]:
             raise HTTPException(status_code=403, detail="Insufficient permissions to access analytics")
         
+        # Year-long aggregation runs on the report pool, away from the threads other routes share
         if user_id:
-            summary = get_user_monthly_leave_summary(db, user_id, month, year)
-            return StandardResponse(
+            return await report_pool.run(
+                cached_respond, request, db, f"user:{current_user.id}",
                 message="Leave pattern summary retrieved successfully",
-                status="success",
-                data=summary
+                build_data=lambda: get_user_monthly_leave_summary(db, user_id, month, year)
             )
         else:
             team_id = validate_team_access(current_user)
-            analytics_data = get_leave_analytics(db, team_id, year)
-            if "error" in analytics_data:
-                raise HTTPException(status_code=400, detail=analytics_data["error"])
-            return StandardResponse(
+
+            def team_analytics():
+                analytics_data = get_leave_analytics(db, team_id, year)
+                if "error" in analytics_data:
+                    raise HTTPException(status_code=400, detail=analytics_data["error"])
+                return analytics_data
+
+            return await report_pool.run(
+                cached_respond, request, db, f"team:{team_id}",
                 message="Analytics retrieved successfully",
-                status="success",
-                data=analytics_data
+                build_data=team_analytics
             )
     except Exception as e:
         raise handle_api_error(e, "Failed to get analytics")
\ No newline at end of file
@@ -0,0 +1,62 @@
+import logging
+from typing import List
+
+from sqlalchemy import inspect, text
+
+from .database import Base, engine
+from . import models  # noqa: F401  (registers every table on Base.metadata)
+from .leave_rollup import rebuild_leave_rollup
+
+logger = logging.getLogger(__name__)
+
+# Additive changes create_all cannot make to tables that already exist: (table, column, column DDL)
+COLUMN_UPGRADES = [
+    ("users", "joined_on", "DATE"),
+]
+
+# (index name, table, columns, unique)
+INDEX_UPGRADES = [
+    ("ix_leave_balances_user_type", "leave_balances", ("user_id", "leave_type"), False),
+    ("ux_thresholds_user_month", "thresholds", ("user_id", "month"), True),
+]
+
+# Statements that must run before a unique index can be created on existing data
+INDEX_PREPARATION = {
+    # Fold duplicate monthly counters into the oldest row before enforcing one row per user and month
+    "ux_thresholds_user_month": [
+        "UPDATE thresholds SET leave_count = (SELECT SUM(COALESCE(t.leave_count, 0)) FROM thresholds t "
+        "WHERE t.user_id = thresholds.user_id AND t.month = thresholds.month) "
+        "WHERE id IN (SELECT MIN(id) FROM thresholds GROUP BY user_id, month HAVING COUNT(*) > 1)",
+        "DELETE FROM thresholds WHERE id NOT IN (SELECT MIN(id) FROM thresholds GROUP BY user_id, month)",
+    ],
+}
+
+
+def upgrade_schema(bind=engine) -> List[str]:
+    """Create missing tables, then add missing columns and indexes; safe to run repeatedly"""
+    existing = inspect(bind)
+    # Derived from leave_requests, so a rollup table added to an existing database is filled in
+    needs_rollup = existing.has_table(models.LeaveRequest.__tablename__) and not existing.has_table(
+        models.LeaveRollup.__tablename__)
+    Base.metadata.create_all(bind=bind)
+    applied = []
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        if needs_rollup:
+            rebuild_leave_rollup(conn)
+            applied.append(models.LeaveRollup.__tablename__)
+        for table, column, ddl in COLUMN_UPGRADES:
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                applied.append(f"{table}.{column}")
+        for name, table, columns, unique in INDEX_UPGRADES:
+            if name not in {index["name"] for index in inspector.get_indexes(table)}:
+                for statement in INDEX_PREPARATION.get(name, []):
+                    conn.execute(text(statement))
+                conn.execute(text(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+                ))
+                applied.append(name)
+    for change in applied:
+        logger.info(f"Schema upgraded: added {change}")
+    return applied
@@ -1,12 +1,14 @@
 from sqlalchemy.orm import Session
 from app.models import User, Team, LeaveBalance, OptionalLeaveDate
 from app.database import SessionLocal, engine, Base
+from app.bulk_import import import_org
+from app.schema_upgrade import upgrade_schema
 from datetime import date
 
 print("👉 Seeding data into DB at:", engine.url)
 
-# Ensure all tables exist
-Base.metadata.create_all(bind=engine)
+# Ensure all tables (and any columns added since the database was created) exist
+upgrade_schema(engine)
 
 # Manager-associate mapping from your image
 manager_map = {
@@ -46,14 +48,37 @@ optional_leave_dates = [
     date(2025, 11, 1),  # Example: Kannada Rajyotsava
 ]
 
+l5_users = [
+    {"username": "l5_1", "password": "l5_1123"},
+    {"username": "l5_2", "password": "l5_2123"},
+]
+
+def build_seed_payload():
+    """The whole org above as a bulk import payload"""
+    users = [{"username": l5["username"], "password": l5["password"], "role": "l5", "balances": {}} for l5 in l5_users]
+    teams = []
+    for idx, (manager_username, associates) in enumerate(manager_map.items()):
+        users.append({
+            "username": manager_username, "password": manager_username + "123", "role": "manager",
+            "manager": l5_users[idx % len(l5_users)]["username"], "balances": {}
+        })
+        teams.append({"name": f"{manager_username}_team", "manager": manager_username})
+        for assoc in associates:
+            users.append({
+                "username": assoc, "password": assoc + "123", "role": "associate",
+                "team": f"{manager_username}_team", "manager": manager_username
+            })
+    return {"teams": teams, "users": users}
+
 def seed_data():
     db = SessionLocal()
 
+    # --- Empty database: create the whole org in one batched transaction ---
+    if db.query(User).first() is None:
+        summary = import_org(db, build_seed_payload())
+        print(f"✅ Bulk-created {summary['users_created']} users and {summary['teams_created']} teams")
+
     # --- Create L5 users ---
-    l5_users = [
-        {"username": "l5_1", "password": "l5_1123"},
-        {"username": "l5_2", "password": "l5_2123"},
-    ]
     l5_ids = []
     for l5 in l5_users:
         user = db.query(User).filter_by(username=l5["username"]).first()
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks, so callers fall back to per-process caching
+    fcntl = None
+
+from .database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+def database_tag(database_url: str = DATABASE_URL) -> str:
+    """Short hash identifying a database, so deployments on one host do not read each other's entries"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        url = url.set(database=os.path.abspath(url.database))  # relative SQLite paths resolve against the cwd
+    return hashlib.blake2b(url.render_as_string(hide_password=False).encode(), digest_size=6).hexdigest()
+
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(_SHM_DIR, f"leave-response-cache-{database_tag()}"))
+SHARED_CACHE_BYTES = int(os.getenv("SHARED_CACHE_BYTES", 64 * 1024 * 1024))
+SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", 8192))
+
+MAGIC = b"LVCACHE1"
+# magic, slot count, data size, next write offset
+HEADER = struct.Struct("<8sIQQ")
+# key digest, record offset, record length, record crc32
+SLOT = struct.Struct("<16sQII")
+RECORD_KEY = struct.Struct("<H")
+
+
+def key_digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class MmapStore:
+    """
+    Key -> bytes store in one memory-mapped file that every worker process on the host maps.
+
+    The file is a direct-mapped slot table followed by a ring of records. Writers append under an
+    exclusive file lock; readers take no lock at all and validate what they read instead: a record
+    must match its slot's crc32 and carry the full key, so a slot whose record was overwritten by the
+    ring, or is being written concurrently, reads as a miss. Colliding keys simply replace each other.
+    """
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, size: int = SHARED_CACHE_BYTES, slots: int = SHARED_CACHE_SLOTS):
+        if fcntl is None:
+            raise RuntimeError("The shared cache needs fcntl file locks (POSIX only)")
+        self.path = path
+        self.slots = slots
+        self._table_offset = HEADER.size
+        self._data_offset = self._table_offset + slots * SLOT.size
+        self._data_size = size - self._data_offset
+        if self._data_size <= 0:
+            raise ValueError(f"SHARED_CACHE_BYTES must exceed the slot table ({self._data_offset} bytes)")
+        self._thread_lock = threading.Lock()  # flock is per open file, so threads need their own lock
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, size)
+            magic, table_slots, data_size, _ = HEADER.unpack_from(self._mm, 0)
+            if (magic, table_slots, data_size) != (MAGIC, slots, self._data_size):
+                self._reset()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reset(self):
+        self._mm[:self._data_offset] = bytes(self._data_offset)
+        HEADER.pack_into(self._mm, 0, MAGIC, self.slots, self._data_size, 0)
+
+    def _slot_offset(self, digest: bytes) -> int:
+        return self._table_offset + (int.from_bytes(digest[:8], "little") % self.slots) * SLOT.size
+
+    def get(self, key: str) -> Optional[bytes]:
+        digest = key_digest(key)
+        slot_digest, offset, length, crc = SLOT.unpack_from(self._mm, self._slot_offset(digest))
+        if slot_digest != digest or length == 0 or offset + length > self._data_size:
+            return None
+        start = self._data_offset + offset
+        record = self._mm[start:start + length]
+        if zlib.crc32(record) != crc:
+            return None
+        (key_length,) = RECORD_KEY.unpack_from(record, 0)
+        stored_key = record[RECORD_KEY.size:RECORD_KEY.size + key_length]
+        if stored_key != key.encode():
+            return None
+        return record[RECORD_KEY.size + key_length:]
+
+    def set(self, key: str, value: bytes) -> bool:
+        encoded_key = key.encode()
+        record = RECORD_KEY.pack(len(encoded_key)) + encoded_key + value
+        if len(record) > self._data_size:
+            return False
+        digest = key_digest(key)
+        with self._locked():
+            magic, slots, data_size, write_offset = HEADER.unpack_from(self._mm, 0)
+            if write_offset + len(record) > self._data_size:
+                write_offset = 0  # wrap; records overwritten here now fail their slot's crc check
+            start = self._data_offset + write_offset
+            self._mm[start:start + len(record)] = record
+            SLOT.pack_into(self._mm, self._slot_offset(digest), digest, write_offset, len(record), zlib.crc32(record))
+            HEADER.pack_into(self._mm, 0, magic, slots, data_size, write_offset + len(record))
+        return True
+
+    def clear(self):
+        with self._locked():
+            self._reset()
+
+    def stats(self):
+        _, slots, data_size, write_offset = HEADER.unpack_from(self._mm, 0)
+        used = sum(1 for i in range(slots)
+                   if SLOT.unpack_from(self._mm, self._table_offset + i * SLOT.size)[2])
+        return {"path": self.path, "slots": slots, "slots_used": used, "data_bytes": data_size,
+                "write_offset": write_offset}
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
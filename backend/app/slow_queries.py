@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))  # 0 disables the recorder
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", 200))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE")  # JSON lines, rotated; unset keeps the buffer only
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", 5))
+PLAN_CACHE_SIZE = 256  # plans are cached per statement text, so a repeated slow query is explained once
+
+OUTSIDE_REQUEST = "outside request"
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Bound values replaced by their type (and length for strings), so the log never holds user data"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(value) for value in parameters]
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__}:{len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+def full_scans(plan: List[str]) -> List[str]:
+    """Tables SQLite reads end to end ("SCAN t" without an index) in an EXPLAIN QUERY PLAN"""
+    tables = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and "USING" not in words:
+            tables.append(words[2] if words[1] == "TABLE" else words[1])
+    return tables
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of slow statements, optionally mirrored to a rotating JSON-lines file"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, size: int = SLOW_QUERY_BUFFER_SIZE,
+                 path: Optional[str] = SLOW_QUERY_LOG_FILE):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._plans: Dict[str, List[str]] = {}
+        self.recorded = 0
+        self._file_logger = None
+        if path:
+            self._file_logger = logging.getLogger(f"{__name__}.file")
+            self._file_logger.propagate = False
+            self._file_logger.setLevel(logging.INFO)
+            if not self._file_logger.handlers:
+                handler = RotatingFileHandler(path, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                              backupCount=SLOW_QUERY_LOG_BACKUPS)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._file_logger.addHandler(handler)
+
+    def add(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+        if self._file_logger is not None:
+            self._file_logger.info(json.dumps(entry, default=str))
+
+    def entries(self, limit: Optional[int] = None, full_scans_only: bool = False) -> List[Dict[str, Any]]:
+        """Newest first"""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        if full_scans_only:
+            entries = [entry for entry in entries if entry["full_scans"]]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+    def cached_plan(self, statement: str) -> Optional[List[str]]:
+        return self._plans.get(statement)
+
+    def cache_plan(self, statement: str, plan: List[str]):
+        with self._lock:
+            if len(self._plans) >= PLAN_CACHE_SIZE:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[statement] = plan
+
+
+slow_query_log = SlowQueryLog()
+
+# The ASGI scope of the request being served; its "route" is filled in by the router before any SQL runs
+current_scope: ContextVar[Optional[dict]] = ContextVar("slow_query_scope", default=None)
+
+
+def _originating_route() -> str:
+    scope = current_scope.get()
+    if scope is None:
+        return OUTSIDE_REQUEST
+    route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {route}".strip()
+
+
+def _explain(conn, statement: str, parameters: Any) -> List[str]:
+    """EXPLAIN QUERY PLAN on the raw DBAPI connection (bypasses engine events, so it is not itself recorded)"""
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _query_plan(conn, statement: str, parameters: Any, executemany: bool) -> List[str]:
+    if not SLOW_QUERY_EXPLAIN or executemany or conn.dialect.name != "sqlite":
+        return []
+    if statement.lstrip().split(None, 1)[0].upper() not in ("SELECT", "WITH"):
+        return []
+    plan = slow_query_log.cached_plan(statement)
+    if plan is None:
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as e:
+            logger.warning(f"EXPLAIN QUERY PLAN failed for slow query: {e}")
+            plan = []
+        slow_query_log.cache_plan(statement, plan)
+    return plan
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+    if elapsed_ms < slow_query_log.threshold_ms:
+        return
+    plan = _query_plan(conn, statement, parameters, executemany)
+    entry = {
+        "at": datetime.now().isoformat(timespec="milliseconds"),
+        "duration_ms": round(elapsed_ms, 3),
+        "route": _originating_route(),
+        "sql": statement,
+        "parameters": redact_parameters(parameters),
+        "executemany": executemany,
+        "plan": plan,
+        "full_scans": full_scans(plan),
+    }
+    slow_query_log.add(entry)
+    logger.warning(f"Slow query ({entry['duration_ms']}ms) from {entry['route']}: {statement[:200]}")
+
+
+def install_slow_query_hooks(engine: Engine):
+    """Record statements on `engine` that take longer than the log's threshold"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SlowQueryMiddleware:
+    """Makes the current request's route available to the statement hooks (pure ASGI)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
@@ -0,0 +1,141 @@
+import logging
+import smtplib
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def is_connection_error(error: Exception) -> bool:
+    """True for transport failures where a fresh session may succeed"""
+    # SMTPException subclasses OSError, but only a disconnect means the session is gone
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnectionPool:
+    """Keeps a few authenticated SMTP sessions open and reuses them across messages"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        max_size: int = 3,
+        idle_timeout: float = 60.0,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._idle = deque()  # (smtp, last_used) pairs, most recently used on the right
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> smtplib.SMTP:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if now - last_used <= self.idle_timeout:
+                return server
+            # Relays drop idle sessions; close ours before they do
+            self._discard(server)
+        return self._connect()
+
+    def _checkin(self, server: smtplib.SMTP) -> None:
+        with self._lock:
+            if not self._closed:
+                self._idle.append((server, time.monotonic()))
+                return
+        self._discard(server)
+
+    def sendmail(self, from_addr: str, to_addrs, msg: str) -> None:
+        """Send one message, reconnecting once if the pooled session went stale"""
+        if self._closed:
+            raise RuntimeError("SMTP pool is closed")
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            try:
+                server.sendmail(from_addr, to_addrs, msg)
+            except Exception as e:
+                self._discard(server)
+                if not is_connection_error(e):
+                    raise
+                logger.info(f"SMTP session to {self.host}:{self.port} lost ({e}), reconnecting")
+                with self._lock:
+                    self.reconnects += 1
+                server = self._connect()
+                try:
+                    server.sendmail(from_addr, to_addrs, msg)
+                except Exception:
+                    self._discard(server)
+                    raise
+            self._checkin(server)
+            with self._lock:
+                self.messages_sent += 1
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for server, _ in idle:
+            self._discard(server)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "host": self.host,
+                "port": self.port,
+                "max_size": self.max_size,
+                "idle_connections": len(self._idle),
+                "connections_opened": self.connections_opened,
+                "messages_sent": self.messages_sent,
+                "reconnects": self.reconnects,
+            }
+
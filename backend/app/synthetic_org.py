@@ -0,0 +1,275 @@
+"""
+Deterministic synthetic orgs for load and benchmark testing.
+
+    python -m app.synthetic_org --db /tmp/bench.db --associates 10000 --leaves-per-user 100 --seed 7 --reset
+
+Builds L5s, managers (one team each) and associates with balances, optional leave days,
+monthly threshold counters and a realistic spread of AL/CL/Sick/Optional leaves,
+including half days and a pending backlog. The same seed always produces the same rows.
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from passlib.hash import bcrypt
+from sqlalchemy import bindparam, create_engine, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Base
+from .leave_rollup import rebuild_leave_rollup
+from .models import LeaveBalance, LeaveRequest, OptionalLeaveDate, Team, Threshold, User
+from .schema_upgrade import upgrade_schema
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Configuration --------------------
+INSERT_CHUNK_ROWS = 50_000
+DEFAULT_PASSWORD = "password123"
+# Synthetic data is rebuildable, so durability is traded for write speed while generating
+FAST_LOAD_PRAGMAS = {"journal_mode": "MEMORY", "synchronous": "OFF", "cache_size": -200000, "temp_store": "MEMORY"}
+
+# leave type: (weight, durations in days with their weights)
+LEAVE_MIX = {
+    "AL": (0.45, [(1, 5), (2, 3), (3, 2), (5, 1)]),
+    "CL": (0.20, [(1, 4), (2, 1)]),
+    "Sick": (0.27, [(1, 6), (2, 2), (3, 1)]),
+    "Optional": (0.08, [(1, 1)]),
+}
+HALF_DAY_RATIO = 0.12           # of single-day AL/CL/Sick leaves
+PAST_STATUS_MIX = [("Approved", 0.86), ("Rejected", 0.04), ("Deleted", 0.05), ("Pending", 0.05)]
+OPTIONAL_DAYS_PER_YEAR = 6
+BALANCES = {"AL": 10.0, "CL": 10.0, "Sick": 10.0}
+
+
+def _weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return lambda: rng.choices(values, weights)[0]
+
+
+def _weekdays(start: date, end: date) -> List[date]:
+    days = []
+    current = start
+    while current <= end:
+        if current.weekday() < 5:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def _chunked(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_org(l5s: int, managers: int, associates: int, password_hash: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Users and teams with explicit ids: managers report to L5s round-robin, associates fill teams evenly"""
+    users, teams = [], []
+    next_id = 1
+    l5_ids = []
+    for i in range(l5s):
+        users.append({"id": next_id, "username": f"l5_{i + 1}", "hashed_password": password_hash, "role": "l5",
+                      "team_id": None, "reports_to_id": None, "joined_on": None})
+        l5_ids.append(next_id)
+        next_id += 1
+    manager_ids = []
+    for i in range(managers):
+        team_id = i + 1
+        teams.append({"id": team_id, "name": f"Team {team_id}", "manager_id": next_id, "shrinkage_limit": 10.0})
+        users.append({"id": next_id, "username": f"mgr_{i + 1}", "hashed_password": password_hash, "role": "manager",
+                      "team_id": team_id, "reports_to_id": l5_ids[i % l5s] if l5_ids else None, "joined_on": None})
+        manager_ids.append(next_id)
+        next_id += 1
+    for i in range(associates):
+        slot = i % managers
+        users.append({"id": next_id, "username": f"user_{i + 1}", "hashed_password": password_hash,
+                      "role": "associate", "team_id": slot + 1, "reports_to_id": manager_ids[slot], "joined_on": None})
+        next_id += 1
+    return {"users": users, "teams": teams}
+
+
+def generate_leaves(rng: random.Random, associate_ids: List[int], leaves_per_user: int, start: date, end: date,
+                    today: date, optional_days: List[date], pending_ratio: float,
+                    thresholds: Counter) -> Iterator[Dict[str, Any]]:
+    """
+    Leaves per associate drawn from the weekdays in [start, end]; apart from optional days they never overlap.
+
+    Past leaves are mostly approved; future ones are approved or, with pending_ratio, waiting for a manager.
+    Approved leaves are tallied into `thresholds` by (user_id, "YYYY-MM").
+    """
+    weekdays = _weekdays(start, end)
+    leave_types = list(LEAVE_MIX)
+    type_weights = [LEAVE_MIX[t][0] for t in leave_types]
+    durations = {t: _weighted(rng, LEAVE_MIX[t][1]) for t in leave_types}
+    past_status = _weighted(rng, PAST_STATUS_MIX)
+    per_user = min(leaves_per_user, len(weekdays))
+    applied_at = datetime.combine(start, datetime.min.time())
+
+    for user_id in associate_ids:
+        slots = sorted(rng.sample(range(len(weekdays)), per_user))
+        for position, slot in enumerate(slots):
+            leave_type = rng.choices(leave_types, type_weights)[0]
+            if leave_type == "Optional" and optional_days:
+                start_date = end_date = rng.choice(optional_days)
+            else:
+                start_date = weekdays[slot]
+                # Stop before the next leave's first day so a user's leaves never overlap
+                limit = weekdays[slots[position + 1]] - timedelta(days=1) if position + 1 < per_user else end
+                end_date = min(start_date + timedelta(days=durations[leave_type]() - 1), limit)
+            is_half_day = start_date == end_date and leave_type != "Optional" and rng.random() < HALF_DAY_RATIO
+            if start_date < today:
+                status = past_status()
+            else:
+                status = "Pending" if rng.random() < pending_ratio else "Approved"
+            if status == "Approved":
+                thresholds[(user_id, start_date.strftime("%Y-%m"))] += 1
+            yield {
+                "user_id": user_id,
+                "start_date": start_date,
+                "end_date": end_date,
+                "leave_type": leave_type,
+                "status": status,
+                "applied_on": applied_at + timedelta(days=max((start_date - start).days - rng.randint(1, 30), 0)),
+                "comments": None,
+                "backup_person": None,
+                "is_half_day": is_half_day,
+            }
+
+
+@contextmanager
+def _fast_load(conn: Connection) -> Iterator[None]:
+    """Apply FAST_LOAD_PRAGMAS to this SQLite connection only, restoring its settings before it goes back to the pool"""
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    saved = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in FAST_LOAD_PRAGMAS}
+    for name, value in FAST_LOAD_PRAGMAS.items():
+        conn.exec_driver_sql(f"PRAGMA {name}={value}")
+    conn.commit()  # end the autobegun transaction so the load can begin its own
+    try:
+        yield
+    finally:
+        try:
+            for name, value in saved.items():
+                conn.exec_driver_sql(f"PRAGMA {name}={value}")
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not restore SQLite settings after the load, discarding the connection: {e}")
+            conn.invalidate()
+
+
+def generate_org(engine: Engine, l5s: int = 2, managers: int = 50, associates: int = 1000,
+                 leaves_per_user: int = 20, start: Optional[date] = None, end: Optional[date] = None,
+                 today: Optional[date] = None, pending_ratio: float = 0.3, seed: int = 42,
+                 password: str = DEFAULT_PASSWORD, reset: bool = False) -> Dict[str, Any]:
+    """Write a synthetic org into an empty database (or a dropped one with reset); returns row counts and timing"""
+    if managers < 1:
+        raise ValueError("At least one manager is needed to own a team")
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = start or date(today.year - 1, 1, 1)
+    end = end or date(today.year, 12, 31)
+
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        if conn.execute(select(func.count(User.id))).scalar():
+            raise ValueError("Database already has users; pass reset=True (--reset) to replace them")
+
+    # bcrypt is far too slow to run per user; everyone shares one hash of the same password
+    org = build_org(l5s, managers, associates, bcrypt.hash(password))
+    associate_ids = [u["id"] for u in org["users"] if u["role"] == "associate"]
+    optional_days = []
+    for year in range(start.year, end.year + 1):
+        year_days = _weekdays(max(start, date(year, 1, 1)), min(end, date(year, 12, 31)))
+        optional_days += sorted(rng.sample(year_days, min(OPTIONAL_DAYS_PER_YEAR, len(year_days))))
+    thresholds = Counter()
+    counts = {}
+
+    with engine.connect() as conn, _fast_load(conn), conn.begin():
+        conn.execute(insert(Team), [{**team, "manager_id": None} for team in org["teams"]])
+        conn.execute(insert(User), org["users"])
+        # Teams and their managers reference each other, so managers are linked once both exist
+        conn.execute(
+            update(Team).where(Team.id == bindparam("team_id")).values(manager_id=bindparam("manager")),
+            [{"team_id": team["id"], "manager": team["manager_id"]} for team in org["teams"]]
+        )
+        conn.execute(insert(LeaveBalance), [
+            {"user_id": user_id, "leave_type": leave_type, "balance": balance}
+            for user_id in associate_ids for leave_type, balance in BALANCES.items()
+        ])
+        conn.execute(insert(OptionalLeaveDate), [{"date": day} for day in optional_days])
+
+        counts["leave_requests"] = 0
+        leaves = generate_leaves(rng, associate_ids, leaves_per_user, start, end, today,
+                                 optional_days, pending_ratio, thresholds)
+        for chunk in _chunked(leaves, INSERT_CHUNK_ROWS):
+            conn.execute(insert(LeaveRequest), chunk)
+            counts["leave_requests"] += len(chunk)
+
+        if thresholds:
+            conn.execute(insert(Threshold), [
+                {"user_id": user_id, "month": month, "leave_count": count}
+                for (user_id, month), count in sorted(thresholds.items())
+            ])
+
+        # Core inserts skip the ORM hooks that maintain the rollup
+        counts["leave_rollup"] = rebuild_leave_rollup(conn)
+
+    counts.update({
+        "users": len(org["users"]), "teams": len(org["teams"]), "associates": len(associate_ids),
+        "leave_balances": len(associate_ids) * len(BALANCES), "optional_leave_dates": len(optional_days),
+        "thresholds": len(thresholds),
+    })
+    return {"seed": seed, "start": start.isoformat(), "end": end.isoformat(), "today": today.isoformat(),
+            "rows": counts, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic org for load and benchmark tests")
+    parser.add_argument("--db", default="app/synthetic.db", help="SQLite file path or a full database URL")
+    parser.add_argument("--l5s", type=int, default=2)
+    parser.add_argument("--managers", type=int, default=50, help="One team per manager")
+    parser.add_argument("--associates", type=int, default=1000)
+    parser.add_argument("--leaves-per-user", type=int, default=20)
+    parser.add_argument("--start", type=date.fromisoformat, help="First leave date (default: Jan 1 last year)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last leave date (default: Dec 31 this year)")
+    parser.add_argument("--today", type=date.fromisoformat,
+                        help="Split between past and future leaves; fix it for byte-identical reruns")
+    parser.add_argument("--pending-ratio", type=float, default=0.3, help="Share of future leaves left Pending")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password shared by every generated user")
+    parser.add_argument("--reset", action="store_true", help="Drop all tables first")
+    args = parser.parse_args()
+
+    url = args.db if "://" in args.db else f"sqlite:///{args.db}"
+    engine = create_engine(url)
+    try:
+        summary = generate_org(
+            engine, l5s=args.l5s, managers=args.managers, associates=args.associates,
+            leaves_per_user=args.leaves_per_user, start=args.start, end=args.end, today=args.today,
+            pending_ratio=args.pending_ratio, seed=args.seed, password=args.password, reset=args.reset
+        )
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    finally:
+        engine.dispose()
+    print(json.dumps({"database": url, **summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Optional
+
+# Clients opt in with ?format=columnar or this Accept type
+COLUMNAR_FORMAT = "columnar"
+COLUMNAR_MEDIA_TYPE = "application/vnd.leave.columnar+json"
+COLUMNAR_VERSION = 1
+
+
+def wants_columnar(format: Optional[str], accept: Optional[str]) -> bool:
+    """True when the query parameter or the Accept header asks for the columnar representation"""
+    if format:
+        return format.lower() == COLUMNAR_FORMAT
+    return bool(accept) and COLUMNAR_MEDIA_TYPE in accept
+
+
+def _column_names(rows: List[Dict[str, Any]]) -> List[str]:
+    names = {}
+    for row in rows:
+        names.update(dict.fromkeys(row))
+    return list(names)
+
+
+def to_columnar(days: List[Dict[str, Any]], nested_key: str = "on_leave") -> Dict[str, Any]:
+    """
+    Day-series rows as parallel arrays, one per field.
+
+    The per-day `nested_key` lists are replaced by indexes into a de-duplicated `leaves` table
+    (itself columnar), so a leave spanning ten days is sent once instead of ten times.
+    """
+    leave_rows: List[Dict[str, Any]] = []
+    leave_index: Dict[tuple, int] = {}
+
+    def ref(leave: Dict[str, Any]) -> int:
+        key = tuple(leave.items())
+        index = leave_index.get(key)
+        if index is None:
+            index = leave_index[key] = len(leave_rows)
+            leave_rows.append(leave)
+        return index
+
+    columns = {}
+    for name in _column_names(days):
+        if name == nested_key:
+            columns[name] = [[ref(leave) for leave in day.get(name) or ()] for day in days]
+        else:
+            columns[name] = [day.get(name) for day in days]
+    return {
+        "format": COLUMNAR_FORMAT,
+        "version": COLUMNAR_VERSION,
+        "length": len(days),
+        "columns": columns,
+        "leaves": {name: [leave.get(name) for leave in leave_rows] for name in _column_names(leave_rows)},
+        "leave_refs": nested_key,
+    }
+
+
+def from_columnar(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rebuild the row-per-day list from `to_columnar` output"""
+    leaves = payload["leaves"]
+    leave_rows = [dict(zip(leaves, values)) for values in zip(*leaves.values())] if leaves else []
+    nested_key = payload.get("leave_refs")
+    columns = payload["columns"]
+    days = []
+    for i in range(payload["length"]):
+        day = {name: values[i] for name, values in columns.items()}
+        if nested_key in day:
+            day[nested_key] = [leave_rows[ref] for ref in day[nested_key]]
+        days.append(day)
+    return days
@@ -0,0 +1,120 @@
+"""
+Cold-start import report for the API, from `python -X importtime` in a fresh interpreter.
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --top 30 --budget-ms 900 --fail-over-budget
+    python -m benchmarks.importtime --module app.report_jobs --runs 5 --output imports.json
+
+Prints the slowest modules by cumulative time, the total per top-level package, and any heavy
+optional dependency (ReportLab, pyarrow, pandas, numpy...) that was imported at startup even though
+only a few endpoints use it. Those should be imported inside the function that needs them, like
+analytics_export.require_pyarrow(). Timings are the median over --runs interpreters.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only a few endpoints or worker processes need these; none should load when the API starts
+HEAVY_MODULES = ("reportlab", "pyarrow", "pandas", "numpy", "matplotlib", "scipy", "openpyxl")
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of `-X importtime` output as {module, self_us, cumulative_us, depth}, in import order"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+    return rows
+
+
+def measure(module: str) -> List[Dict[str, Any]]:
+    """Import `module` in a fresh interpreter and return its import-time rows"""
+    env = {**os.environ, "EMAIL_OUTBOX_WORKER": "false", "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(runs: List[List[Dict[str, Any]]], module: str) -> Dict[str, Any]:
+    """Median per-module timings across runs, per-package totals and heavy modules that were loaded"""
+    cumulative, self_time = defaultdict(list), defaultdict(list)
+    for rows in runs:
+        for row in rows:
+            cumulative[row["module"]].append(row["cumulative_us"])
+            self_time[row["module"]].append(row["self_us"])
+    modules = {
+        name: {"cumulative_ms": statistics.median(values) / 1000, "self_ms": statistics.median(self_time[name]) / 1000}
+        for name, values in cumulative.items()
+    }
+    packages = defaultdict(float)
+    for name, timing in modules.items():
+        packages[name.split(".")[0]] += timing["self_ms"]
+    heavy = sorted({name.split(".")[0] for name in modules if name.split(".")[0] in HEAVY_MODULES})
+    return {
+        "module": module,
+        "runs": len(runs),
+        "total_ms": round(modules.get(module, {}).get("cumulative_ms", 0.0), 3),
+        "modules": modules,
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])),
+        "heavy_imports": heavy,
+    }
+
+
+def print_report(report: Dict[str, Any], top: int):
+    print(f"import {report['module']}: {report['total_ms']:.1f} ms (median of {report['runs']} runs)\n")
+    print(f"{'module':<52} {'cumulative ms':>14} {'self ms':>9}")
+    slowest = sorted(report["modules"].items(), key=lambda item: -item[1]["cumulative_ms"])[:top]
+    for name, timing in slowest:
+        print(f"{name:<52} {timing['cumulative_ms']:>14.1f} {timing['self_ms']:>9.1f}")
+    print(f"\n{'package':<52} {'self ms':>14}")
+    for name, ms in list(report["packages"].items())[:top]:
+        print(f"{name:<52} {ms:>14.1f}")
+    if report["heavy_imports"]:
+        print(f"\nHeavy optional dependencies imported at startup: {', '.join(report['heavy_imports'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, help="Cold-start import target for --module")
+    parser.add_argument("--fail-over-budget", action="store_true",
+                        help="Exit 1 when over --budget-ms or a heavy optional dependency is imported")
+    parser.add_argument("--output", help="Also write the report JSON here")
+    args = parser.parse_args()
+
+    report = summarize([measure(args.module) for _ in range(args.runs)], args.module)
+    print_report(report, args.top)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    problems = list(report["heavy_imports"])
+    if args.budget_ms is not None:
+        verdict = "over" if report["total_ms"] > args.budget_ms else "within"
+        print(f"\n{verdict} budget: {report['total_ms']:.1f} ms vs {args.budget_ms:.1f} ms")
+        if report["total_ms"] > args.budget_ms:
+            problems.append(f"{report['total_ms']:.1f} ms > {args.budget_ms:.1f} ms")
+    if problems and args.fail_over_budget:
+        raise SystemExit(f"Cold start check failed: {', '.join(problems)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+HTTP load test of one app worker with weighted associate / manager / L5 scenarios.
+
+    python -m benchmarks.loadtest --dataset small --mode closed --concurrency 16 --duration 60
+    python -m benchmarks.loadtest --dataset medium --mode open --rate 20 --duration 60 --output load.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --password secret --mode closed
+
+Without --url it starts uvicorn (one worker, outbox worker off) on a throwaway copy of a generated
+dataset (see benchmarks.logic_bench), so it runs entirely offline. Virtual users log in through
+/auth/token once, then replay role scenarios:
+
+    closed: --concurrency users loop scenario after scenario, with --think-ms between requests
+    open:   scenarios start at --rate per second (Poisson arrivals) whether or not earlier ones
+            finished, capped at --max-inflight; latency is measured from the scheduled start
+
+Reports throughput, latency percentiles, a histogram and the error rate per route template. Any
+status >= 400 counts as an error; the per-status counts separate business rejections (400 for an
+overlapping leave, or two managers racing for one approval) from server failures.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import create_engine, select
+
+from app.models import User
+from app.synthetic_org import DEFAULT_PASSWORD
+
+from .logic_bench import DATASETS, dataset_path
+
+API = "/api/v1/leave"
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+DEFAULT_MIX = "associate=70,manager=25,l5=5"
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+class RouteStats:
+    """Latency samples, histogram and status counts for one route template"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.statuses: Dict[str, int] = defaultdict(int)
+        self.errors = 0
+
+    def record(self, elapsed_ms: float, status: str, ok: bool):
+        self.latencies.append(elapsed_ms)
+        self.statuses[status] += 1
+        self.errors += not ok
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        pick = lambda pct: round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 2)  # noqa: E731
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / seconds, 2) if seconds else 0.0,
+            "error_rate": round(self.errors / len(ordered), 4) if ordered else 0.0,
+            "p50_ms": pick(50), "p90_ms": pick(90), "p99_ms": pick(99), "max_ms": round(ordered[-1], 2),
+            "statuses": dict(self.statuses),
+            "histogram": {label: count for label, count in zip(labels, self.histogram) if count},
+        }
+
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, think_seconds: float, rng: random.Random):
+        self.client = client
+        self.think_seconds = think_seconds
+        self.rng = rng
+        self.routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.scenarios = 0
+
+    async def call(self, user: Dict[str, Any], method: str, route: str, url: Optional[str] = None,
+                   started: Optional[float] = None, **kwargs) -> Optional[httpx.Response]:
+        """One request, recorded under its route template (e.g. POST /approve/{leave_id})"""
+        started = started or time.perf_counter()
+        try:
+            response = await self.client.request(method, url or route, headers=user.get("headers"), **kwargs)
+            status, ok = str(response.status_code), response.status_code < 400
+        except httpx.HTTPError as e:
+            response, status, ok = None, type(e).__name__, False
+        self.routes[f"{method} {route}"].record((time.perf_counter() - started) * 1000, status, ok)
+        if self.think_seconds:
+            await asyncio.sleep(self.think_seconds)
+        return response
+
+    # -------------------- Scenarios --------------------
+    async def associate(self, user, started=None):
+        """Check balance and history, sometimes apply for a leave, look at the forecast"""
+        await self.call(user, "GET", f"{API}/balance", started=started)
+        await self.call(user, "GET", f"{API}/history")
+        if self.rng.random() < 0.3:
+            start = date.today() + timedelta(days=self.rng.randint(3, 60))
+            while start.weekday() >= 5:
+                start += timedelta(days=1)
+            await self.call(user, "POST", f"{API}/apply", json={
+                "leave_type": self.rng.choice(["AL", "AL", "CL", "Sick"]),
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(days=self.rng.choice([0, 0, 1]))).isoformat(),
+                "is_half_day": False,
+            })
+        await self.call(user, "GET", f"{API}/forecast/30days")
+
+    async def manager(self, user, started=None):
+        """Dashboards, then act on the oldest pending approval"""
+        await self.call(user, "GET", f"{API}/dashboard/shrinkage", started=started)
+        response = await self.call(user, "GET", f"{API}/pending-approvals")
+        pending = (response.json().get("data") or {}).get("pending_leaves", []) if response is not None and response.is_success else []
+        if pending:
+            leave_id = pending[0]["leave_id"]
+            await self.call(user, "POST", f"{API}/approve/{{leave_id}}", url=f"{API}/approve/{leave_id}",
+                            json={"action": self.rng.choice(["Approved", "Approved", "Rejected"]), "comments": ""})
+        await self.call(user, "GET", f"{API}/forecast/30days")
+        await self.call(user, "GET", f"{API}/shrinkage/weekly-carry-forward")
+
+    async def l5(self, user, started=None):
+        """Org-wide calendars"""
+        await self.call(user, "GET", "/admin/admin/availability/next-30-days", started=started)
+        await self.call(user, "GET", f"{API}/forecast/l5-30days")
+
+    async def run_scenario(self, role: str, users: Dict[str, List[Dict[str, Any]]], started=None):
+        await getattr(self, role)(self.rng.choice(users[role]), started)
+        self.scenarios += 1
+
+
+async def login(client: httpx.AsyncClient, run: LoadRun, users: List[Dict[str, Any]], password: str):
+    """Log every virtual user in once; bcrypt makes this the slowest request, so it is reported separately"""
+    for user in users:
+        response = await run.call(user, "POST", "/auth/token", data={"username": user["username"], "password": password})
+        if response is None or not response.is_success:
+            raise SystemExit(f"Login failed for {user['username']}: {response.status_code if response else 'no response'}")
+        user["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def closed_loop(run: LoadRun, users, roles, weights, concurrency: int, deadline: float):
+    async def virtual_user():
+        while time.perf_counter() < deadline:
+            await run.run_scenario(run.rng.choices(roles, weights)[0], users)
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+
+
+async def open_loop(run: LoadRun, users, roles, weights, rate: float, max_inflight: int, deadline: float):
+    inflight = set()
+    dropped = 0
+    next_start = time.perf_counter()
+    while next_start < deadline:
+        await asyncio.sleep(max(0.0, next_start - time.perf_counter()))
+        if len(inflight) >= max_inflight:
+            dropped += 1
+        else:
+            task = asyncio.create_task(run.run_scenario(run.rng.choices(roles, weights)[0], users, started=next_start))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        next_start += run.rng.expovariate(rate)
+    if inflight:
+        await asyncio.gather(*inflight)
+    return dropped
+
+
+def pick_users(database_url: str, counts: Dict[str, int], rng: random.Random) -> Dict[str, List[Dict[str, Any]]]:
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            by_role = defaultdict(list)
+            for user_id, username, role in conn.execute(select(User.id, User.username, User.role).order_by(User.id)):
+                by_role[role].append({"id": user_id, "username": username})
+    finally:
+        engine.dispose()
+    return {role: rng.sample(by_role[role], min(count, len(by_role[role]))) for role, count in counts.items()}
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(database_url: str, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "EMAIL_OUTBOX_WORKER": "false",
+        "ENVIRONMENT": "production",  # production log level, no docs routes
+        "SECRET_KEY": os.getenv("SECRET_KEY") or secrets.token_hex(32),
+    }
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning", "--no-access-log"],
+        cwd=backend_dir, env=env
+    )
+
+
+async def wait_until_up(base_url: str, server: Optional[subprocess.Popen]):
+    deadline = time.perf_counter() + STARTUP_TIMEOUT_SECONDS
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if server is not None and server.poll() is not None:
+                raise SystemExit(f"Server exited with code {server.returncode}")
+            try:
+                if (await client.get("/health")).is_success:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not come up within {STARTUP_TIMEOUT_SECONDS}s")
+
+
+async def run_load(args, base_url: str, database_url: str, server: Optional[subprocess.Popen]) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    mix = {role: float(weight) for role, weight in (part.split("=") for part in args.mix.split(","))}
+    roles, weights = list(mix), list(mix.values())
+    users = pick_users(database_url, {role: args.users_per_role for role in roles}, rng)
+    roles = [role for role in roles if users.get(role)]
+    weights = [mix[role] for role in roles]
+
+    await wait_until_up(base_url, server)
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_inflight))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        run = LoadRun(client, args.think_ms / 1000, rng)
+        await login(client, run, [user for role in roles for user in users[role]], args.password)
+        login_stats = run.routes.pop("POST /auth/token")
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        dropped = 0
+        if args.mode == "closed":
+            await closed_loop(run, users, roles, weights, args.concurrency, deadline)
+        else:
+            dropped = await open_loop(run, users, roles, weights, args.rate, args.max_inflight, deadline)
+        elapsed = time.perf_counter() - started
+
+    total = RouteStats()
+    for stats in run.routes.values():
+        for latency in stats.latencies:
+            total.latencies.append(latency)
+        total.errors += stats.errors
+    return {
+        "meta": {"mode": args.mode, "duration_s": round(elapsed, 2), "concurrency": args.concurrency,
+                 "rate": args.rate if args.mode == "open" else None, "mix": mix, "seed": args.seed,
+                 "dataset": None if args.url else args.dataset, "scenarios": run.scenarios,
+                 "dropped_arrivals": dropped},
+        "overall": {"requests": len(total.latencies), "rps": round(len(total.latencies) / elapsed, 2),
+                    "error_rate": round(total.errors / len(total.latencies), 4) if total.latencies else 0.0},
+        "login": login_stats.summary(0),
+        "routes": {route: stats.summary(elapsed) for route, stats in sorted(run.routes.items())},
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    meta, overall = report["meta"], report["overall"]
+    print(f"\n{meta['mode']}-loop for {meta['duration_s']}s: {meta['scenarios']} scenarios, "
+          f"{overall['requests']} requests, {overall['rps']} req/s, {overall['error_rate']:.1%} errors"
+          + (f", {meta['dropped_arrivals']} arrivals dropped" if meta["dropped_arrivals"] else ""))
+    print(f"login: p50 {report['login']['p50_ms']} ms over {report['login']['requests']} users")
+    print(f"{'route':<58} {'req':>6} {'req/s':>7} {'err':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for route, row in report["routes"].items():
+        print(f"{route:<58} {row['requests']:>6} {row['rps']:>7} {row['error_rate']:>6.1%} "
+              f"{row['p50_ms']:>9} {row['p90_ms']:>9} {row['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target an already running app instead of starting one")
+    parser.add_argument("--dataset", choices=list(DATASETS), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password of the generated users")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load after login")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop: virtual users")
+    parser.add_argument("--rate", type=float, default=10, help="Open loop: scenario arrivals per second")
+    parser.add_argument("--max-inflight", type=int, default=200, help="Open loop: drop arrivals beyond this")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause after each request")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Role weights, e.g. associate=70,manager=25,l5=5")
+    parser.add_argument("--users-per-role", type=int, default=10, help="Distinct logged-in users per role")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Also write the report JSON here")
+    args = parser.parse_args()
+
+    server, workdir = None, None
+    if args.url:
+        base_url, database_url = args.url, os.getenv("DATABASE_URL", "sqlite:///app/app.db")
+    else:
+        # The scenarios apply for and approve leaves, so the cached dataset is never written to
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+        working_copy = os.path.join(workdir, "load.db")
+        shutil.copyfile(dataset_path(args.dataset, args.seed, date.today()), working_copy)
+        database_url = f"sqlite:///{working_copy}"
+        base_url = f"http://127.0.0.1:{free_port()}"
+        server = start_server(database_url, int(base_url.rsplit(":", 1)[1]))
+    try:
+        report = asyncio.run(run_load(args, base_url, database_url, server))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
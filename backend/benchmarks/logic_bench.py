@@ -0,0 +1,262 @@
+"""
+Latency and query counts for the logic.py hot paths against generated orgs, with JSON baselines.
+
+    python -m benchmarks.logic_bench --dataset small --iterations 20
+    python -m benchmarks.logic_bench --dataset medium --save-baseline
+    python -m benchmarks.logic_bench --dataset medium --fail-on-regression
+
+Datasets come from app.synthetic_org and are cached under benchmarks/data/ (keyed by size, seed and
+date, since the forecasts look at the next 30 days, plus a fingerprint of the schema, so a model change
+regenerates them). Every run works on a throwaway copy, so process_leave_application can commit freely.
+Results are compared with benchmarks/baselines/<dataset>.json when it exists: a case regresses when its
+p50 grows by more than --threshold or it issues more queries.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+from app import logic
+from app.admin_routes import build_l5_org_grid
+from app.database import Base
+from app.models import LeaveRequest, Team, User
+from app.report_jobs import build_leave_export_query
+from app.reporting_routes import iter_leaves_csv
+from app.synthetic_org import generate_org
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+DATASETS = {
+    "small": {"l5s": 1, "managers": 5, "associates": 100, "leaves_per_user": 20},
+    "medium": {"l5s": 2, "managers": 50, "associates": 1000, "leaves_per_user": 40},
+    "large": {"l5s": 10, "managers": 500, "associates": 10000, "leaves_per_user": 100},
+}
+# Full exports dominate a run, so they are timed less often
+SLOW_CASES = {"csv_export": 5}
+
+
+class QueryCounter:
+    """Counts statements sent to the database through one engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def schema_fingerprint() -> str:
+    """Short hash of every table and column name on Base.metadata"""
+    names = sorted(f"{table.name}.{column.name}" for table in Base.metadata.tables.values() for column in table.columns)
+    return hashlib.sha1("\n".join(names).encode()).hexdigest()[:8]
+
+
+def dataset_path(name: str, seed: int, today: date) -> str:
+    """Generate the dataset once per size, seed, day and schema, then reuse it"""
+    path = os.path.join(DATA_DIR, f"{name}-s{seed}-{today.isoformat()}-{schema_fingerprint()}.db")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"Generating {name} dataset -> {path}")
+        engine = create_engine(f"sqlite:///{path}.tmp")
+        try:
+            summary = generate_org(engine, seed=seed, today=today, reset=True, **DATASETS[name])
+        finally:
+            engine.dispose()
+        os.replace(f"{path}.tmp", path)
+        print(f"  {summary['rows']} in {summary['seconds']}s")
+    return path
+
+
+def pick_subjects(db, today: date) -> Dict[str, Any]:
+    """The first manager, their team and L5, and every associate free for two days two weeks out"""
+    manager_id = db.query(User.id).filter(User.role == "manager").order_by(User.id).limit(1).scalar()
+    team_id = db.query(Team.id).filter(Team.manager_id == manager_id).scalar()
+    l5_id = db.query(User.reports_to_id).filter(User.id == manager_id).scalar()
+    apply_start = today + timedelta(days=14 + (7 - (today + timedelta(days=14)).weekday()) % 7)  # a Monday
+    apply_end = apply_start + timedelta(days=1)
+    busy = db.query(LeaveRequest.user_id).filter(
+        LeaveRequest.start_date <= apply_end, LeaveRequest.end_date >= apply_start
+    )
+    free = [user_id for (user_id,) in db.query(User.id).filter(
+        User.role == "associate", ~User.id.in_(busy)
+    ).order_by(User.id)]
+    associate_id = db.query(User.id).filter(User.reports_to_id == manager_id).order_by(User.id).limit(1).scalar()
+    return {"manager_id": manager_id, "team_id": team_id, "l5_id": l5_id, "associate_id": associate_id,
+            "free_associates": free, "apply_start": apply_start, "apply_end": apply_end}
+
+
+def build_cases(subjects: Dict[str, Any], today: date) -> Dict[str, Callable]:
+    """Each case takes a fresh session and the iteration number"""
+    free = subjects["free_associates"]
+
+    def apply_leave(db, i):
+        if i >= len(free):
+            raise RuntimeError("Not enough free associates for this many iterations; lower --iterations")
+        return logic.process_leave_application(db, {
+            "user_id": free[i], "leave_type": "AL",
+            "start_date": subjects["apply_start"].isoformat(), "end_date": subjects["apply_end"].isoformat(),
+            "is_half_day": False, "backup_person": None,
+        })
+
+    def csv_export(db, i):
+        return sum(len(chunk) for chunk in iter_leaves_csv(db, build_leave_export_query()))
+
+    l5 = lambda db: db.get(User, subjects["l5_id"])  # noqa: E731
+    return {
+        "process_leave_application": apply_leave,
+        "get_team_shrinkage": lambda db, i: logic.get_team_shrinkage(db, subjects["team_id"], today),
+        "get_next_30_day_shrinkage": lambda db, i: logic.get_next_30_day_shrinkage(db, subjects["associate_id"]),
+        "get_manager_next_30_day_shrinkage":
+            lambda db, i: logic.get_manager_next_30_day_shrinkage(db, subjects["manager_id"]),
+        "calculate_weekly_shrinkage_with_carry_forward": lambda db, i: logic.calculate_weekly_shrinkage_with_carry_forward(
+            db, subjects["manager_id"], today.year, today.month),
+        "get_leave_analytics": lambda db, i: logic.get_leave_analytics(db, subjects["team_id"], today.year),
+        "l5_calendar": lambda db, i: build_l5_org_grid(db, l5(db)),
+        "csv_export": csv_export,
+    }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_case(name: str, case: Callable, Session, counter: QueryCounter, iterations: int) -> Dict[str, Any]:
+    latencies, queries = [], []
+    for i in range(iterations + 1):
+        db = Session()
+        try:
+            before = counter.count
+            started = time.perf_counter()
+            case(db, i)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+        if i == 0:
+            continue  # warm-up: first-use imports and cold caches
+        latencies.append(elapsed)
+        queries.append(counter.count - before)
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "max_ms": round(max(latencies), 3),
+        "queries": int(statistics.median(queries)),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each case against the baseline; return the cases that regressed"""
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('revision')} ({baseline['meta'].get('created')})")
+    print(f"{'case':<46} {'p50 ms':>10} {'base':>10} {'change':>8} {'queries':>8} {'base':>6}")
+    for name, row in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:<46} {row['p50_ms']:>10} {'-':>10} {'new':>8} {row['queries']:>8} {'-':>6}")
+            continue
+        change = (row["p50_ms"] - base["p50_ms"]) / base["p50_ms"] if base["p50_ms"] else 0.0
+        regressed = change > threshold or row["queries"] > base["queries"]
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<46} {row['p50_ms']:>10} {base['p50_ms']:>10} {change:>+8.0%} "
+              f"{row['queries']:>8} {base['queries']:>6}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", choices=list(DATASETS), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--cases", help="Comma-separated subset of cases to run")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the dataset's baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed p50 slowdown before flagging")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any case regressed")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # logic.py logs every call at INFO
+    today = date.today()
+    source = dataset_path(args.dataset, args.seed, today)
+    workdir = tempfile.mkdtemp(prefix="logic_bench_")
+    working_copy = os.path.join(workdir, "bench.db")
+    shutil.copyfile(source, working_copy)
+    engine = create_engine(f"sqlite:///{working_copy}", connect_args={"check_same_thread": False})
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    counter = QueryCounter(engine)
+
+    try:
+        with Session() as db:
+            subjects = pick_subjects(db, today)
+            rows = db.query(func.count(LeaveRequest.id)).scalar()
+        cases = build_cases(subjects, today)
+        if args.cases:
+            cases = {name: cases[name] for name in args.cases.split(",")}
+
+        print(f"{args.dataset}: {rows} leave rows, {args.iterations} iterations per case")
+        print(f"{'case':<46} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'queries':>8}")
+        results = {}
+        for name, case in cases.items():
+            iterations = min(args.iterations, SLOW_CASES.get(name, args.iterations))
+            results[name] = run_case(name, case, Session, counter, iterations)
+            row = results[name]
+            print(f"{name:<46} {row['p50_ms']:>10} {row['p95_ms']:>10} {row['p99_ms']:>10} {row['queries']:>8}")
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "dataset": args.dataset, "seed": args.seed, "leave_rows": rows, "revision": git_revision(),
+            "created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.dataset}.json")
+    regressions = []
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    if regressions and args.fail_on_regression:
+        raise SystemExit(f"Regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput of per-message SMTP connections versus the pooled sessions in app.smtp_pool.
+
+Runs entirely against a local aiosmtpd stand-in:
+
+    python -m benchmarks.smtp_pool_bench --messages 500 --concurrency 4 --handshake-delay-ms 20
+
+--handshake-delay-ms adds latency to every EHLO to approximate the TCP+TLS+AUTH cost of a real relay.
+"""
+import argparse
+import asyncio
+import smtplib
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.email_utils import build_message
+from app.smtp_pool import SMTPConnectionPool
+
+FROM_ADDR = "bench@example.com"
+
+
+class CountingHandler:
+    def __init__(self, handshake_delay: float):
+        self.handshake_delay = handshake_delay
+        self.messages = 0
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def send_per_message(port: int, to_addr: str, payload: str) -> None:
+    """The pre-pool behaviour: connect, greet and quit for every message"""
+    with smtplib.SMTP("127.0.0.1", port) as server:
+        server.sendmail(FROM_ADDR, to_addr, payload)
+
+
+def run_mode(name, send, messages: int, concurrency: int, handler: CountingHandler):
+    payloads = [
+        (f"user{i}@example.com", build_message(f"user{i}@example.com", f"Balance notice {i}", "<p>Hi</p>").as_string())
+        for i in range(messages)
+    ]
+    sessions_before, messages_before = handler.sessions, handler.messages
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda item: send(*item), payloads))
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": name,
+        "messages": handler.messages - messages_before,
+        "smtp_sessions": handler.sessions - sessions_before,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(messages / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=None, help="Defaults to --concurrency")
+    parser.add_argument("--handshake-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit("aiosmtpd is required: pip install -r requirements-dev.txt")
+
+    port = free_port()
+    handler = CountingHandler(args.handshake_delay_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        pool = SMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=args.pool_size or args.concurrency)
+        results = [
+            run_mode("per-message", lambda to, payload: send_per_message(port, to, payload),
+                     args.messages, args.concurrency, handler),
+            run_mode("pooled", lambda to, payload: pool.sendmail(FROM_ADDR, to, payload),
+                     args.messages, args.concurrency, handler),
+        ]
+        pool.close()
+    finally:
+        controller.stop()
+
+    print(f"{'mode':<12} {'messages':>9} {'sessions':>9} {'seconds':>9} {'msg/s':>9}")
+    for row in results:
+        print(f"{row['mode']:<12} {row['messages']:>9} {row['smtp_sessions']:>9} "
+              f"{row['seconds']:>9} {row['messages_per_second']:>9}")
+    baseline, pooled = results
+    if baseline["messages_per_second"]:
+        print(f"speedup: {pooled['messages_per_second'] / baseline['messages_per_second']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
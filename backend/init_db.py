@@ -1,7 +1,10 @@
 # backend/init_db.py
 from app.database import Base, engine
 from app import models  # ✅ make sure this imports ALL models (User, LeaveRequest, etc.)
+from app.schema_upgrade import upgrade_schema
 
 print("📦 Creating all database tables...")
-Base.metadata.create_all(bind=engine)
+applied = upgrade_schema(engine)
+for change in applied:
+    print(f"  ➕ Added {change}")
 print("✅ Done.")
@@ -21,8 +21,8 @@ class TestLeaveApplication(unittest.TestCase):
         logic.get_team_shrinkage = MagicMock(return_value=5.0)
         logic.get_leave_balance = MagicMock(return_value=10)
         logic.decrement_leave_balance = MagicMock(return_value=True)
-        logic.send_leave_email = MagicMock()
-        logic.send_manager_email = MagicMock()
+        logic.queue_leave_email = MagicMock()
+        logic.queue_manager_email = MagicMock()
 
     def test_convert_cl_to_al(self):
         start = datetime(2025, 5, 1).date()
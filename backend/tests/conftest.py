@@ -1,8 +1,15 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Routes that go over their declared query budget fail the test instead of logging
+os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+
 from app.main import app
+from app.query_budget import install_budget_hooks
 from app.models import Base, User
 from app.database import get_db
 from passlib.hash import bcrypt
@@ -11,6 +18,12 @@ from passlib.hash import bcrypt
 TEST_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+install_budget_hooks(engine)
+
+# --- In-memory DB for tests that seed their own data ---
+memory_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+MemorySessionLocal = sessionmaker(bind=memory_engine, autocommit=False, autoflush=False)
+install_budget_hooks(memory_engine)
 
 # --- Override DB Dependency ---
 def override_get_db():
@@ -36,6 +49,21 @@ def db():
     finally:
         db.close()
 
+@pytest.fixture
+def memory_sessions():
+    """Session factory on an empty in-memory schema, recreated for every test"""
+    Base.metadata.drop_all(bind=memory_engine)
+    Base.metadata.create_all(bind=memory_engine)
+    return MemorySessionLocal
+
+@pytest.fixture
+def memory_db(memory_sessions):
+    db = memory_sessions()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @pytest.fixture
 def client():
     return TestClient(app)
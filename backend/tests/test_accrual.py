@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from app.accrual import AccrualError, run_accrual
+from app.models import AccrualRun, LeaveBalance, User
+from app.schema_upgrade import upgrade_schema
+
+
+@pytest.fixture
+def seeded_db(memory_db):
+    veteran = User(username="veteran", hashed_password="x", role="associate")
+    joiner = User(username="joiner", hashed_password="x", role="associate", joined_on=date(2026, 3, 16))
+    manager = User(username="mgr", hashed_password="x", role="manager")
+    memory_db.add_all([veteran, joiner, manager])
+    memory_db.flush()
+    memory_db.add_all([
+        LeaveBalance(user_id=veteran.id, leave_type="AL", balance=15),
+        LeaveBalance(user_id=veteran.id, leave_type="CL", balance=2),
+    ])
+    memory_db.commit()
+    return memory_db
+
+
+def balances(db):
+    return {(b.user.username, b.leave_type): b.balance for b in db.query(LeaveBalance).all()}
+
+
+def test_january_caps_carry_over_then_accrues(seeded_db):
+    report = run_accrual(seeded_db, "2026-01")
+    assert report["leave_types"]["AL"]["days_forfeited"] == 5
+    assert balances(seeded_db) == {
+        ("veteran", "AL"): 11.5,  # capped at 10, then 18 / 12
+        ("veteran", "CL"): 6,     # lapsed, then the annual grant
+        ("veteran", "Sick"): 6,
+    }
+    with pytest.raises(AccrualError):
+        run_accrual(seeded_db, "2026-01")
+
+
+def test_mid_year_joiner_is_pro_rated(seeded_db):
+    run_accrual(seeded_db, "2026-01")
+    run_accrual(seeded_db, "2026-02")
+    run_accrual(seeded_db, "2026-03")
+    result = balances(seeded_db)
+    assert result[("veteran", "AL")] == 14.5
+    assert result[("joiner", "AL")] == 0.77   # 16 of March's 31 days
+    assert result[("joiner", "CL")] == 5      # 10 of 12 months
+    assert ("mgr", "AL") not in result
+
+
+def test_dry_run_reports_without_changing_balances(seeded_db):
+    before = balances(seeded_db)
+    report = run_accrual(seeded_db, "2026-01", dry_run=True)
+    assert report["leave_types"]["Sick"]["rows_created"] == 1
+    assert report["leave_types"]["AL"]["days_credited"] == 1.5
+    assert balances(seeded_db) == before
+    assert seeded_db.query(AccrualRun).count() == 0
+
+
+def test_upgrade_schema_adds_missing_columns():
+    old = create_engine("sqlite://", poolclass=StaticPool)
+    with old.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, hashed_password VARCHAR, "
+                          "role VARCHAR, team_id INTEGER, reports_to_id INTEGER)"))
+    assert upgrade_schema(old) == ["users.joined_on"]
+    assert "joined_on" in {c["name"] for c in inspect(old).get_columns("users")}
+    assert upgrade_schema(old) == []
@@ -0,0 +1,50 @@
+import pytest
+from passlib.hash import bcrypt
+
+from app.models import Team, User
+
+
+@pytest.fixture
+def admin_headers(client, db):
+    if not db.query(User).filter_by(username="list_admin").first():
+        team = Team(name="list_team")
+        db.add(team)
+        db.flush()
+        admin = User(username="list_admin", hashed_password=bcrypt.hash("adminpass"), role="l5")
+        db.add(admin)
+        db.flush()
+        db.add_all([
+            User(username=f"list_assoc{i}", hashed_password="x", role="associate",
+                 team_id=team.id, reports_to_id=admin.id)
+            for i in range(5)
+        ])
+        db.commit()
+    response = client.post("/auth/token", data={"username": "list_admin", "password": "adminpass"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_list_users_pages_with_keyset_and_filters(client, db, admin_headers):
+    admin = db.query(User).filter_by(username="list_admin").one()
+    params = {"manager_id": admin.id, "limit": 2, "include_total": True}
+
+    first = client.get("/admin/admin/users", params=params, headers=admin_headers).json()
+    assert first["total"] == 5
+    assert [u["username"] for u in first["items"]] == ["list_assoc0", "list_assoc1"]
+    assert all("hashed_password" not in u for u in first["items"])
+
+    usernames = [u["username"] for u in first["items"]]
+    after_id = first["next_after_id"]
+    while after_id is not None:
+        page = client.get("/admin/admin/users", params={**params, "after_id": after_id}, headers=admin_headers).json()
+        usernames += [u["username"] for u in page["items"]]
+        after_id = page["next_after_id"]
+    assert usernames == [f"list_assoc{i}" for i in range(5)]
+
+
+def test_list_users_projects_fields(client, admin_headers):
+    response = client.get("/admin/admin/users", params={"fields": "username", "role": "l5"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert all(set(u) == {"id", "username"} for u in response.json()["items"])
+
+    response = client.get("/admin/admin/users", params={"fields": "hashed_password"}, headers=admin_headers)
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+import os
+from datetime import date
+
+import pytest
+
+from app.analytics_export import build_leave_facts_query, export_month_partitions, write_leave_facts
+from app.models import LeaveRequest, Team, User
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def seeded_db(memory_db):
+    team = Team(name="Ops")
+    memory_db.add(team)
+    memory_db.flush()
+    manager = User(username="mgr", hashed_password="x", role="manager", team_id=team.id)
+    memory_db.add(manager)
+    memory_db.flush()
+    alice = User(username="alice", hashed_password="x", role="associate", team_id=team.id, reports_to_id=manager.id)
+    memory_db.add(alice)
+    memory_db.flush()
+    memory_db.add_all([
+        LeaveRequest(user_id=alice.id, leave_type="AL", start_date=date(2025, 1, 6), end_date=date(2025, 1, 8), status="Approved"),
+        LeaveRequest(user_id=alice.id, leave_type="SL", start_date=date(2025, 3, 3), end_date=date(2025, 3, 3),
+                     status="Pending", is_half_day=True),
+    ])
+    memory_db.commit()
+    return memory_db
+
+
+def test_arrow_export_is_memory_mappable(seeded_db, tmp_path):
+    path = str(tmp_path / "facts.arrow")
+    assert write_leave_facts(seeded_db, path, "arrow", batch_rows=1) == 2
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    rows = table.to_pylist()
+    assert [row["manager_username"] for row in rows] == ["mgr", "mgr"]
+    assert rows[0]["team_name"] == "Ops"
+    assert [row["days"] for row in rows] == [3.0, 0.5]
+    assert [row["month"] for row in rows] == ["2025-01", "2025-03"]
+
+
+def test_month_partitions_are_incremental(seeded_db, tmp_path):
+    out = str(tmp_path / "leaves")
+    summary = export_month_partitions(seeded_db, out)
+    assert summary["written"] == ["2025-01", "2025-03"]
+    assert pq.read_table(os.path.join(out, "month=2025-01", "part-0.parquet")).num_rows == 1
+
+    assert export_month_partitions(seeded_db, out)["unchanged"] == ["2025-01", "2025-03"]
+
+    alice = seeded_db.query(User).filter_by(username="alice").one()
+    seeded_db.add(LeaveRequest(user_id=alice.id, leave_type="AL", start_date=date(2025, 3, 17), end_date=date(2025, 3, 18), status="Pending"))
+    seeded_db.commit()
+    summary = export_month_partitions(seeded_db, out)
+    assert summary["written"] == ["2025-03"] and summary["unchanged"] == ["2025-01"]
+    table = pq.read_table(os.path.join(out, "month=2025-03", "part-0.parquet"))
+    assert table.column("leave_id").to_pylist() == [2, 3]
+
+    filtered = build_leave_facts_query(start_date=date(2025, 3, 1))
+    assert write_leave_facts(seeded_db, str(tmp_path / "march.parquet"), "parquet", filtered) == 2
+
+
+def test_org_changes_rewrite_every_month(seeded_db, tmp_path):
+    out = str(tmp_path / "leaves")
+    export_month_partitions(seeded_db, out)
+
+    seeded_db.query(Team).filter_by(name="Ops").one().name = "Operations"
+    seeded_db.commit()
+    assert export_month_partitions(seeded_db, out)["written"] == ["2025-01", "2025-03"]
+    table = pq.read_table(os.path.join(out, "month=2025-01", "part-0.parquet"))
+    assert table.column("team_name").to_pylist() == ["Operations"]
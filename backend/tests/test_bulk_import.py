@@ -0,0 +1,80 @@
+import pytest
+from passlib.hash import bcrypt
+
+from app.bulk_import import BulkImportError, hash_passwords, import_org, parse_users_csv
+from app.models import LeaveBalance, Team, User
+
+USERS_CSV = """username,password,role,team,manager,balance_AL
+alice,alice123,associate,Ops,mgr,15
+bob,bob123,associate,Ops,mgr,
+mgr,mgr123,manager,,boss,
+boss,boss123,l5,,,
+"""
+
+
+def test_csv_import_resolves_forward_reporting_lines(memory_db):
+    payload = {"teams": [{"name": "Ops", "manager": "mgr"}], "users": parse_users_csv(USERS_CSV)}
+    summary = import_org(memory_db, payload, workers=1, rounds=4)
+    assert summary["users_created"] == 4 and summary["teams_created"] == 1
+    assert summary["reporting_lines"] == 3
+
+    users = {user.username: user for user in memory_db.query(User).all()}
+    team = memory_db.query(Team).filter_by(name="Ops").one()
+    assert users["alice"].reports_to_id == users["mgr"].id
+    assert users["mgr"].reports_to_id == users["boss"].id
+    assert users["alice"].team_id == team.id and team.manager_id == users["mgr"].id
+    assert users["alice"].check_password("alice123")
+
+    balances = {(b.user_id, b.leave_type): b.balance for b in memory_db.query(LeaveBalance).all()}
+    assert balances[(users["alice"].id, "AL")] == 15
+    assert balances[(users["bob"].id, "AL")] == 10
+    assert len(balances) == 12
+
+
+def test_validation_reports_every_error_and_inserts_nothing(memory_db):
+    memory_db.add(User(username="taken", hashed_password="x", role="associate"))
+    memory_db.commit()
+    payload = {"users": [
+        {"username": "taken", "password": "p", "role": "associate"},
+        {"username": "carol", "password": "p", "role": "intern", "manager": "nobody"},
+        {"username": "carol", "role": "associate"},
+    ]}
+    with pytest.raises(BulkImportError) as exc:
+        import_org(memory_db, payload, workers=1, rounds=4)
+    errors = exc.value.errors
+    assert any("'taken' already exists" in e for e in errors)
+    assert any("role must be" in e for e in errors)
+    assert any("unknown manager 'nobody'" in e for e in errors)
+    assert any("duplicate username 'carol'" in e for e in errors)
+    assert any("password is required" in e for e in errors)
+    assert memory_db.query(User).count() == 1
+
+
+@pytest.mark.parametrize("payload, error", [
+    ({"users": ["bob"]}, "users row 1: must be an object"),
+    ({"users": {"username": "bob"}}, "users must be a list of objects"),
+    ({"users": [{"username": ["x"], "password": "p", "role": "associate"}]}, "users row 1: username must be a string"),
+    ({"users": [{"username": "bob", "password": "p", "role": "associate", "team": {"name": "Ops"}}]},
+     "users row 1: team must be a string"),
+    ({"teams": [{"name": "Ops", "manager": 7}]}, "teams row 1: manager must be a string"),
+])
+def test_malformed_rows_are_validation_errors(memory_db, payload, error):
+    with pytest.raises(BulkImportError) as exc:
+        import_org(memory_db, payload, workers=1, rounds=4)
+    assert error in exc.value.errors
+
+
+def test_malformed_import_is_a_bad_request(client, db):
+    if not db.query(User).filter_by(username="import_l5").first():
+        db.add(User(username="import_l5", hashed_password=bcrypt.hash("l5pass"), role="l5"))
+        db.commit()
+    token = client.post("/auth/token", data={"username": "import_l5", "password": "l5pass"}).json()["access_token"]
+    response = client.post("/admin/admin/users/bulk-import", json={"users": ["bob"]},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == ["users row 1: must be an object"]
+
+
+def test_hash_passwords_in_process_pool_preserves_order():
+    hashes = hash_passwords(["a", "b", "c"], workers=2, rounds=4)
+    assert [bcrypt.verify(p, h) for p, h in zip(["a", "b", "c"], hashes)] == [True, True, True]
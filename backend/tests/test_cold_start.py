@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("reportlab", "pyarrow", "pandas", "numpy")
+
+
+def test_api_import_leaves_heavy_optional_dependencies_unloaded():
+    check = (
+        "import sys, app.main\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", check], cwd=BACKEND_DIR, capture_output=True, text=True,
+                            env={**os.environ, "EMAIL_OUTBOX_WORKER": "false"})
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip() == ""
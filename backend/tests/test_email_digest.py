@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.email_digest import queue_due_manager_digests
+from app.models import EmailOutbox, LeaveRequest, User
+
+
+@pytest.fixture
+def manager_with_pending(memory_db):
+    now = datetime.utcnow()
+    manager = User(username="mgr", hashed_password="x", role="manager")
+    memory_db.add(manager)
+    memory_db.flush()
+    for i, start_offset in enumerate([2, 20, 30]):
+        associate = User(username=f"assoc{i}", hashed_password="x", role="associate", reports_to_id=manager.id)
+        memory_db.add(associate)
+        memory_db.flush()
+        start = date.today() + timedelta(days=start_offset)
+        memory_db.add(LeaveRequest(
+            user_id=associate.id, leave_type="AL", start_date=start, end_date=start,
+            status="Pending", applied_on=now - timedelta(minutes=45 - i)
+        ))
+    memory_db.commit()
+    return manager
+
+
+def test_one_digest_per_manager_after_window(memory_db, manager_with_pending):
+    now = datetime.utcnow()
+    # Window still open: oldest pending is 45 minutes old
+    assert queue_due_manager_digests(memory_db, now=now, window_minutes=60) == 0
+
+    assert queue_due_manager_digests(memory_db, now=now, window_minutes=30) == 1
+    emails = memory_db.query(EmailOutbox).all()
+    assert len(emails) == 1
+    assert emails[0].to_email.startswith("mgr@")
+    assert "3 leave request(s) pending (1 urgent)" in emails[0].subject
+    for i in range(3):
+        assert f"assoc{i}" in emails[0].html_body
+
+    # Nothing new since the last digest
+    assert queue_due_manager_digests(memory_db, now=now + timedelta(hours=1), window_minutes=30) == 0
+
+
+def test_new_pending_leave_reopens_window(memory_db, manager_with_pending):
+    now = datetime.utcnow()
+    queue_due_manager_digests(memory_db, now=now, window_minutes=30)
+
+    associate = memory_db.query(User).filter_by(username="assoc0").one()
+    start = date.today() + timedelta(days=40)
+    memory_db.add(LeaveRequest(user_id=associate.id, leave_type="CL", start_date=start, end_date=start,
+                        status="Pending", applied_on=now + timedelta(minutes=5)))
+    memory_db.commit()
+
+    assert queue_due_manager_digests(memory_db, now=now + timedelta(minutes=20), window_minutes=30) == 0
+    assert queue_due_manager_digests(memory_db, now=now + timedelta(minutes=40), window_minutes=30) == 1
+    assert memory_db.query(EmailOutbox).count() == 2
@@ -0,0 +1,99 @@
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import email_outbox, email_utils
+from app.email_outbox import OutboxMetrics, drain_outbox_once, get_outbox_stats
+from app.email_utils import queue_email, queue_leave_email
+from app.models import EmailOutbox
+
+def _queue(sessions, count=1):
+    db = sessions()
+    for i in range(count):
+        queue_email(db, f"user{i}@example.com", f"Subject {i}", "<p>Hi</p>")
+    db.commit()
+    db.close()
+
+
+def test_queued_email_rolls_back_with_transaction(memory_sessions):
+    db = memory_sessions()
+    queue_leave_email(db, "a@example.com", "a", "AL", "2025-01-01", "2025-01-02", "Approved", None)
+    db.rollback()
+    assert db.query(EmailOutbox).count() == 0
+
+    # Rejected leaves produce no email at all
+    assert queue_leave_email(db, "a@example.com", "a", "AL", "2025-01-01", "2025-01-02", "Rejected", None) is None
+    db.close()
+
+
+def test_drain_marks_messages_sent(memory_sessions):
+    _queue(memory_sessions, 3)
+    delivered = []
+    metrics = OutboxMetrics()
+    processed = drain_outbox_once(memory_sessions, lambda to, subject, body: delivered.append(to), metrics=metrics)
+
+    assert processed == 3
+    assert len(delivered) == 3
+    db = memory_sessions()
+    stats = get_outbox_stats(db, metrics)
+    db.close()
+    assert stats["counts"]["Sent"] == 3
+    assert stats["worker"]["sent"] == 3
+
+
+def test_failed_delivery_backs_off_then_dead_letters(memory_sessions, monkeypatch):
+    monkeypatch.setattr(email_outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    _queue(memory_sessions, 1)
+
+    def failing_sender(to, subject, body):
+        raise ConnectionRefusedError("relay down")
+
+    drain_outbox_once(memory_sessions, failing_sender)
+    db = memory_sessions()
+    message = db.query(EmailOutbox).one()
+    assert message.status == "Pending"
+    assert message.attempts == 1
+    assert message.next_attempt_at > datetime.utcnow()
+    db.close()
+
+    # Not due yet, so nothing is attempted
+    assert drain_outbox_once(memory_sessions, failing_sender) == 0
+
+    drain_outbox_once(memory_sessions, failing_sender, now=datetime.utcnow() + timedelta(hours=2))
+    db = memory_sessions()
+    message = db.query(EmailOutbox).one()
+    assert message.status == "Dead"
+    assert "relay down" in message.last_error
+    db.close()
+
+
+def test_delivery_against_local_smtp_server(memory_sessions, monkeypatch):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    received = []
+
+    class Handler:
+        async def handle_DATA(self, server, session, envelope):
+            received.append(envelope)
+            return "250 OK"
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    controller = controller_module.Controller(Handler(), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        monkeypatch.setattr(email_utils, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(email_utils, "SMTP_PORT", port)
+        monkeypatch.setattr(email_utils, "SMTP_USE_TLS", False)
+        monkeypatch.setattr(email_utils, "SMTP_USER", None)
+        monkeypatch.setattr(email_utils, "EMAIL_FROM", "leave@example.com")
+
+        _queue(memory_sessions, 2)
+        assert drain_outbox_once(memory_sessions, email_utils.deliver_email) == 2
+    finally:
+        controller.stop()
+
+    assert sorted(env.rcpt_tos[0] for env in received) == ["user0@example.com", "user1@example.com"]
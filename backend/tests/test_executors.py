@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from app.executors import (
+    EXECUTOR_QUEUE_SECONDS, EXECUTOR_TASKS, THREAD, ExecutorPool, PoolSaturated,
+)
+
+request_tag = contextvars.ContextVar("request_tag", default=None)
+
+
+@pytest.fixture
+def pool():
+    pool = ExecutorPool("test-pool", THREAD, max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_full_pool_rejects_and_queued_tasks_can_be_cancelled(pool):
+    release = threading.Event()
+    ran = []
+    running = pool.submit(release.wait, 5)
+    queued = pool.submit(ran.append, "queued")
+    with pytest.raises(PoolSaturated):
+        pool.submit(ran.append, "rejected")
+    assert EXECUTOR_TASKS.value("test-pool", "rejected") >= 1
+
+    assert queued.cancel()
+    release.set()
+    assert running.result(5) is True
+    pool.call(ran.append, "after")
+    assert ran == ["after"]
+    assert pool.stats()["pending"] == 0
+
+
+def test_tasks_see_the_callers_context_and_report_queue_time(pool):
+    before = EXECUTOR_QUEUE_SECONDS.count("test-pool")
+    token = request_tag.set("req-1")
+    try:
+        assert pool.call(request_tag.get) == "req-1"
+    finally:
+        request_tag.reset(token)
+    assert EXECUTOR_QUEUE_SECONDS.count("test-pool") == before + 1
+
+    with pytest.raises(ZeroDivisionError):
+        pool.call(lambda: 1 / 0)
+
+
+def test_stream_and_run_from_the_event_loop(pool):
+    async def consume():
+        chunks = await pool.stream(iter(["a", "b", "c"]))
+        streamed = [chunk async for chunk in chunks]
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(threading.Event().wait, 0.5, timeout=0.01)
+        return streamed, await pool.run(sum, [1, 2, 3])
+
+    assert asyncio.run(consume()) == (["a", "b", "c"], 6)
+
+
+def test_login_returns_503_when_the_auth_pool_is_full(client, monkeypatch):
+    from app import auth
+
+    full = ExecutorPool("full", THREAD, max_workers=0, max_queue=0)
+    monkeypatch.setattr(auth, "auth_pool", full)
+    response = client.post("/auth/token", data={"username": "nobody", "password": "x"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
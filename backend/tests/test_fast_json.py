@@ -0,0 +1,29 @@
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app import routes
+
+
+def test_fast_json_matches_jsonable_encoder():
+    payload = {
+        "forecast": [{"date": date(2026, 3, 2), "shrinkage": 12.5, "on_leave": ["a", "b"]}],
+        "generated_at": datetime(2026, 3, 1, 9, 30, 15, 123456),
+        "by_day": {date(2026, 3, 2): 1, 7: "int key"},
+        "total": Decimal("2.5"),
+        "window": timedelta(days=1),
+    }
+    fast = json.loads(routes.FastJSONResponse(payload).body)
+    assert fast == json.loads(json.dumps(jsonable_encoder(payload)))
+
+
+def test_read_endpoint_keeps_standard_shape(client, monkeypatch):
+    slow = client.get("/api/v1/leave/health").json()
+    monkeypatch.setattr(routes, "FAST_JSON_RESPONSES", True)
+    response = client.get("/api/v1/leave/health")
+    assert response.status_code == 200
+    fast = response.json()
+    assert set(fast) == set(slow) == {"message", "status", "data", "timestamp"}
+    assert (fast["message"], fast["status"], set(fast["data"])) == (slow["message"], slow["status"], set(slow["data"]))
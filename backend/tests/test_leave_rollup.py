@@ -0,0 +1,132 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+from passlib.hash import bcrypt
+from sqlalchemy import select, update
+
+from app.leave_rollup import count_weekdays, month_days, rebuild_leave_rollup
+from app.logic import get_leave_analytics, get_monthly_shrinkage
+from app.models import LeaveRequest, LeaveRollup, User
+
+TEAM = 9101
+OTHER_TEAM = 9102
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rollup(db, team_id):
+    rows = db.execute(select(LeaveRollup.year, LeaveRollup.month, LeaveRollup.leave_type, LeaveRollup.status,
+                             LeaveRollup.days).where(LeaveRollup.team_id == team_id, LeaveRollup.days != 0))
+    return sorted(tuple(row) for row in rows)
+
+
+def test_leave_days_are_split_by_month_over_weekdays():
+    assert count_weekdays(date(2025, 3, 1), date(2025, 3, 31)) == 21
+    # Fri 2025-01-31 to Tue 2025-02-04: one weekday in January, two in February
+    assert month_days(date(2025, 1, 31), date(2025, 2, 4), False) == {(2025, 1): 1.0, (2025, 2): 2.0}
+    assert month_days(date(2025, 2, 3), date(2025, 2, 3), True) == {(2025, 2): 0.5}
+    assert month_days(date(2025, 2, 1), date(2025, 2, 2), False) == {}
+
+
+def test_rollup_follows_leave_writes_and_matches_a_rebuild(db):
+    alice = User(username="rollup_alice", hashed_password="x", role="associate", team_id=TEAM)
+    manager = User(username="rollup_mgr", hashed_password="x", role="manager", team_id=TEAM)
+    db.add_all([alice, manager])
+    db.flush()
+    leave = LeaveRequest(user_id=alice.id, leave_type="AL", start_date=date(2025, 1, 30),
+                         end_date=date(2025, 2, 3), status="Pending")
+    half = LeaveRequest(user_id=alice.id, leave_type="CL", start_date=date(2025, 2, 10),
+                        end_date=date(2025, 2, 10), status="Approved", is_half_day=True)
+    db.add_all([leave, half, LeaveRequest(user_id=manager.id, leave_type="AL", start_date=date(2025, 2, 3),
+                                          end_date=date(2025, 2, 3), status="Approved")])
+    db.commit()
+    assert rollup(db, TEAM) == [(2025, 1, "AL", "Pending", 2.0), (2025, 2, "AL", "Pending", 1.0),
+                                (2025, 2, "CL", "Approved", 0.5)]
+
+    leave.status = "Approved"
+    db.commit()
+    assert rollup(db, TEAM) == [(2025, 1, "AL", "Approved", 2.0), (2025, 2, "AL", "Approved", 1.0),
+                                (2025, 2, "CL", "Approved", 0.5)]
+    assert get_monthly_shrinkage(db, TEAM, 2025, 2) == round(1.5 / 20 * 100, 2)
+    analytics = get_leave_analytics(db, TEAM, 2025)
+    assert analytics["leave_by_type"] == {"AL": 3.0, "CL": 0.5}
+    assert analytics["leave_by_month"][1] == 2.0
+
+    half.status = "Deleted"
+    db.execute(update(LeaveRequest).where(LeaveRequest.id == leave.id).values(end_date=date(2025, 2, 4)))
+    db.commit()
+    incremental = rollup(db, TEAM)
+    assert (2025, 2, "AL", "Approved", 2.0) in incremental
+
+    with db.get_bind().begin() as conn:
+        rebuild_leave_rollup(conn)
+    db.expire_all()
+    assert rollup(db, TEAM) == incremental
+
+    alice.team_id = OTHER_TEAM
+    db.commit()
+    assert rollup(db, TEAM) == []
+    assert rollup(db, OTHER_TEAM) == incremental
+
+
+def test_moving_or_deleting_an_associate_applies_a_delta(db, monkeypatch):
+    from app import leave_rollup
+
+    bob = User(username="rollup_bob", hashed_password="x", role="associate", team_id=TEAM + 10)
+    db.add(bob)
+    db.flush()
+    leave = LeaveRequest(user_id=bob.id, leave_type="AL", start_date=date(2025, 3, 3),
+                         end_date=date(2025, 3, 4), status="Approved")
+    db.add(leave)
+    db.commit()
+
+    def no_rebuild(connection):
+        raise AssertionError("a full rebuild is not needed")
+
+    monkeypatch.setattr(leave_rollup, "rebuild_leave_rollup", no_rebuild)
+    # A move and a leave edit in the same flush
+    bob.team_id = OTHER_TEAM + 10
+    leave.status = "Pending"
+    db.commit()
+    assert rollup(db, TEAM + 10) == []
+    assert rollup(db, OTHER_TEAM + 10) == [(2025, 3, "AL", "Pending", 2.0)]
+
+    db.execute(update(User).where(User.id == bob.id).values(reports_to_id=None))
+    db.commit()
+    db.delete(bob)
+    db.commit()
+    assert rollup(db, OTHER_TEAM + 10) == []
+
+
+def test_scripts_that_never_import_the_app_keep_the_rollup_current(tmp_path):
+    script = (
+        "from datetime import date\n"
+        "from sqlalchemy import create_engine\n"
+        "from sqlalchemy.orm import Session\n"
+        "from app.database import Base\n"
+        "from app.logic import get_leave_analytics\n"
+        "from app.models import LeaveRequest, User\n"
+        f"engine = create_engine('sqlite:///{tmp_path / 'script.db'}')\n"
+        "Base.metadata.create_all(engine)\n"
+        "with Session(engine) as db:\n"
+        "    user = User(username='scripted', hashed_password='x', role='associate', team_id=7)\n"
+        "    db.add(user)\n"
+        "    db.flush()\n"
+        "    db.add(LeaveRequest(user_id=user.id, leave_type='AL', status='Approved',\n"
+        "                        start_date=date(2025, 3, 3), end_date=date(2025, 3, 4)))\n"
+        "    db.commit()\n"
+        "    print(get_leave_analytics(db, 7, 2025)['leave_by_type'])\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True)
+    assert result.stdout.strip() == "{'AL': 2.0}", result.stderr
+
+
+def test_admins_can_rebuild_the_rollup(client, db):
+    if not db.query(User).filter_by(username="rollup_l5").first():
+        db.add(User(username="rollup_l5", hashed_password=bcrypt.hash("l5pass"), role="l5"))
+        db.commit()
+    token = client.post("/auth/token", data={"username": "rollup_l5", "password": "l5pass"}).json()["access_token"]
+    response = client.post("/admin/admin/leave-rollup/rebuild", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["rows"] == db.query(LeaveRollup).count()
@@ -91,7 +91,7 @@ def test_process_leave_approval(db: Session, test_user: User, setup_leave_balanc
         "is_half_day": False,
         "backup_person": "backupuser"
     }
-    with patch("app.logic.send_leave_email") as mock_email:
+    with patch("app.logic.queue_leave_email") as mock_email:
         response = process_leave_application(db, data)
         assert mock_email.called
         assert "leave_id" in response
@@ -107,7 +107,7 @@ def test_process_leave_rejection_due_to_balance(db: Session, test_user: User):
         "is_half_day": False,
         "backup_person": "backupuser"
     }
-    with patch("app.logic.send_leave_email"):
+    with patch("app.logic.queue_leave_email"):
         response = process_leave_application(db, data)
         assert "pending" in response["message"].lower() or "rejected" in response["message"].lower()
 
@@ -121,7 +121,7 @@ def test_process_leave_rejection_due_to_threshold(db: Session, test_user: User,
         "is_half_day": False,
         "backup_person": "backupuser"
     }
-    with patch("app.logic.send_leave_email"):
+    with patch("app.logic.queue_leave_email"):
         response = process_leave_application(db, data)
         assert "pending" in response["message"].lower() or "rejected" in response["message"].lower()
 
@@ -134,7 +134,7 @@ def test_process_optional_leave_rejection(db: Session, test_user: User, setup_le
         "is_half_day": False,
         "backup_person": "backupuser"
     }
-    with patch("app.logic.send_leave_email"):
+    with patch("app.logic.queue_leave_email"):
         response = process_leave_application(db, data)
         assert "rejected" in response["message"].lower()
 
@@ -0,0 +1,34 @@
+from app.metrics import Histogram, LATENCY, REQUEST_QUERIES, REQUESTS, install_query_hooks
+
+from .conftest import engine
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{route="/a"} 4' in lines
+
+
+def test_requests_are_recorded_by_route_template_with_query_counts(client):
+    install_query_hooks(engine)
+    route = "/api/v1/leave/shrinkage/next30days"
+    before = REQUESTS.value("GET", route, "200")
+    queries_before = REQUEST_QUERIES.count("GET", route)
+
+    assert client.get(route, params={"user_id": 424242}).status_code == 200
+    client.get("/no/such/path/123")
+
+    assert REQUESTS.value("GET", route, "200") == before + 1
+    assert REQUEST_QUERIES.count("GET", route) == queries_before + 1
+    assert LATENCY.count("GET", "unmatched") >= 1
+
+    body = client.get("/metrics").text
+    assert f'http_requests_total{{method="GET",route="{route}",status="200"}}' in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'db_queries_per_request_bucket{method="GET",route="' + route + '",le="1"} ' in body
+    assert "/no/such/path/123" not in body
@@ -0,0 +1,80 @@
+import json
+import time
+
+import pytest
+from passlib.hash import bcrypt
+
+from app.main import app
+from app.models import User
+from app.profiler import ProfilerControl, ProfilerMiddleware, SamplingProfiler, profile_name
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(500))
+
+
+@pytest.fixture
+def control(tmp_path, monkeypatch):
+    control = ProfilerControl(directory=str(tmp_path), token="s3cret", min_interval=60, max_files=2)
+    for middleware in app.user_middleware:
+        if middleware.cls is ProfilerMiddleware:
+            monkeypatch.setitem(middleware.kwargs, "control", control)
+    app.middleware_stack = None  # rebuild with the test control
+    yield control
+    app.middleware_stack = None
+
+
+def test_sampler_exports_speedscope_with_the_busy_function():
+    profiler = SamplingProfiler(interval_ms=1)
+    profiler.start()
+    busy_loop(0.1)
+    profiler.stop()
+    profile = profiler.speedscope("demo")
+
+    frames = profile["shared"]["frames"]
+    sampled = profile["profiles"][0]
+    assert sampled["type"] == "sampled" and len(sampled["samples"]) == len(sampled["weights"]) > 0
+    assert any(frames[i]["name"] == "busy_loop" for stack in sampled["samples"] for i in stack)
+    assert frames[sampled["samples"][0][0]]["name"].startswith("thread ")
+
+
+def test_profile_names_are_path_safe():
+    assert profile_name("../../etc/passwd") == "_.._etc_passwd.speedscope.json"
+    assert profile_name("abc-123") == "abc-123.speedscope.json"
+
+
+def test_header_triggers_one_profile_then_rate_limits(client, control):
+    headers = {"X-Profile": "s3cret", "X-Request-ID": "req-1"}
+    assert "x-profile-id" not in client.get("/health", headers={"X-Profile": "wrong"}).headers
+
+    response = client.get("/health", headers=headers)
+    assert response.headers["x-profile-id"] == "req-1"
+    with open(control.profile_path("req-1")) as f:
+        assert json.load(f)["profiles"][0]["type"] == "sampled"
+
+    again = client.get("/health", headers={**headers, "X-Request-ID": "req-2"})
+    assert "x-profile-id" not in again.headers
+    assert control.profile_path("req-2") is None
+
+
+def test_admin_arming_and_download(client, db, control, monkeypatch):
+    monkeypatch.setattr("app.admin_routes.profiler_control", control)
+    if not db.query(User).filter_by(username="prof_admin").first():
+        db.add(User(username="prof_admin", hashed_password=bcrypt.hash("adminpass"), role="l5"))
+        db.commit()
+    token = client.post("/auth/token", data={"username": "prof_admin", "password": "adminpass"}).json()["access_token"]
+    admin = {"Authorization": f"Bearer {token}"}
+
+    armed = client.post("/admin/admin/profiler", json={"requests": 1, "path_prefix": "/health"}, headers=admin)
+    assert armed.json()["armed_requests"] == 1
+    client.get("/", headers={"X-Request-ID": "not-matched"})
+    client.get("/health", headers={"X-Request-ID": "armed-1"})
+    assert control.status()["armed_requests"] == 0
+
+    listed = client.get("/admin/admin/profiler", headers=admin).json()["profiles"]
+    assert [p["request_id"] for p in listed] == ["armed-1"]
+    download = client.get("/admin/admin/profiles/armed-1", headers=admin)
+    assert download.status_code == 200 and download.json()["exporter"] == "app.profiler"
+    assert client.get("/admin/admin/profiles/missing", headers=admin).status_code == 404
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import routes
+from app.logic import get_pending_approvals
+from app.models import LeaveRequest, User
+from app.query_budget import QueryBudgetExceeded, normalize_sql, track_queries
+
+
+@pytest.fixture
+def seeded_db(memory_db):
+    manager = User(username="mgr", hashed_password="x", role="manager")
+    memory_db.add(manager)
+    memory_db.flush()
+    start = date.today() + timedelta(days=10)
+    for i in range(8):
+        user = User(username=f"a{i}", hashed_password="x", role="associate", reports_to_id=manager.id)
+        memory_db.add(user)
+        memory_db.flush()
+        memory_db.add(LeaveRequest(user_id=user.id, start_date=start, end_date=start, leave_type="AL", status="Pending"))
+    memory_db.commit()
+    return memory_db
+
+
+def test_normalize_sql_groups_repeats():
+    assert normalize_sql("SELECT * FROM users WHERE id = 5 AND name = 'x'") == \
+        normalize_sql("SELECT *\n  FROM users WHERE id = 77 AND name = 'y'")
+    assert normalize_sql("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?...)"
+
+
+def test_pending_approvals_stays_within_budget(seeded_db):
+    manager = seeded_db.query(User).filter_by(username="mgr").one()
+    seeded_db.expire_all()
+    with track_queries("get_pending_approvals", budget=3, mode="raise") as recorder:
+        approvals = get_pending_approvals(seeded_db, manager.id)
+    assert len(approvals) == 8
+    assert recorder.count <= 3
+
+
+def test_lazy_loads_in_a_loop_are_reported_with_call_site(seeded_db):
+    seeded_db.expire_all()
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with track_queries("loop", budget=3, mode="raise"):
+            leaves = seeded_db.query(LeaveRequest).all()
+            [leave.user.username for leave in leaves]
+    assert error.value.used == 9
+    assert "8x SELECT users." in error.value.report
+    assert "from outside app" in error.value.report  # issued from this test, not app code
+
+
+def test_route_over_budget_fails_request(client, monkeypatch):
+    endpoint = routes.get_next_30_days_shrinkage
+    monkeypatch.setattr(endpoint, "__query_budget__", 0)
+    with pytest.raises(QueryBudgetExceeded, match="GET /api/v1/leave/shrinkage/next30days"):
+        client.get("/api/v1/leave/shrinkage/next30days", params={"user_id": 1})
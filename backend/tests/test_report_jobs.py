@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import Future
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, LeaveRequest, User
+from app.report_jobs import ReportJobManager, artifact_path, data_version, spec_hash
+
+
+@pytest.fixture
+def setup(tmp_path):
+    # A file database, since the report is rendered in a separate process
+    database_url = f"sqlite:///{tmp_path / 'reports.db'}"
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    user = User(username="alice", hashed_password="x", role="associate")
+    db.add(user)
+    db.flush()
+    db.add(LeaveRequest(user_id=user.id, leave_type="AL", start_date=date(2025, 1, 6),
+                        end_date=date(2025, 1, 8), status="Approved"))
+    db.commit()
+
+    manager = ReportJobManager(cache_dir=str(tmp_path / "cache"), max_workers=1, database_url=database_url)
+    yield db, manager, user
+    manager.shutdown()
+    db.close()
+    engine.dispose()
+
+
+def test_spec_hash_ignores_unset_filters_and_date_types():
+    assert spec_hash({"status": "Approved", "team_id": None}) == spec_hash({"status": "Approved"})
+    assert spec_hash({"start_date": date(2025, 1, 1)}) == spec_hash({"start_date": "2025-01-01"})
+    assert spec_hash({"status": "Approved"}) != spec_hash({"status": "Pending"})
+
+
+def test_report_job_is_cached_until_data_changes(setup):
+    db, manager, user = setup
+
+    job = manager.submit(db, {"status": "Approved"})
+    job = manager.wait(job["job_id"], timeout=60)
+    assert job["status"] == "Done", job["error"]
+    assert job["rows"] == 1 and not job["cached"]
+    first_path = manager.artifact(job["job_id"])
+    with open(first_path, "rb") as f:
+        assert f.read(4) == b"%PDF"
+
+    again = manager.submit(db, {"status": "Approved"})
+    assert again["status"] == "Done" and again["cached"]
+    assert manager.artifact(again["job_id"]) == first_path
+
+    db.add(LeaveRequest(user_id=user.id, leave_type="SL", start_date=date(2025, 2, 3),
+                        end_date=date(2025, 2, 3), status="Approved"))
+    db.commit()
+    fresh = manager.wait(manager.submit(db, {"status": "Approved"})["job_id"], timeout=60)
+    assert fresh["status"] == "Done" and not fresh["cached"] and fresh["rows"] == 2
+    assert fresh["data_version"] != job["data_version"]
+    # The artifact built from older data is pruned
+    assert not os.path.exists(first_path)
+
+
+def test_user_edits_change_the_report_data_version(setup):
+    db, manager, user = setup
+    before = data_version(db)
+    user.team_id = 5
+    db.commit()
+    assert data_version(db) != before
+
+
+class ManualPool:
+    """Holds submitted renders so a test decides when, and in which order, they finish"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+    def shutdown(self):
+        pass
+
+
+def test_an_older_job_finishing_last_keeps_the_newer_report(setup, tmp_path):
+    db, _, user = setup
+    cache_dir = str(tmp_path / "manual")
+    pool = ManualPool()
+    manager = ReportJobManager(cache_dir=cache_dir, pool=pool)
+
+    old = manager.submit(db, {})
+    db.add(LeaveRequest(user_id=user.id, leave_type="SL", start_date=date(2025, 2, 3),
+                        end_date=date(2025, 2, 3), status="Approved"))
+    db.commit()
+    new = manager.submit(db, {})
+    old_path, new_path = (artifact_path(cache_dir, spec_hash({}), job["data_version"]) for job in (old, new))
+
+    for path, future in ((new_path, pool.futures[1]), (old_path, pool.futures[0])):
+        with open(path, "wb") as f:
+            f.write(b"%PDF")
+        future.set_result(1)
+
+    assert manager.artifact(new["job_id"]) == new_path
+    with manager.open_artifact(new["job_id"]) as report:
+        assert report.read() == b"%PDF"
+
+    # A job on the newest data prunes every older version of the spec
+    user.team_id = 3
+    db.commit()
+    newest = manager.submit(db, {})
+    newest_path = artifact_path(cache_dir, spec_hash({}), newest["data_version"])
+    with open(newest_path, "wb") as f:
+        f.write(b"%PDF")
+    pool.futures[2].set_result(1)
+    assert os.listdir(cache_dir) == [os.path.basename(newest_path)]
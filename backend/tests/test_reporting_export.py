@@ -0,0 +1,60 @@
+import csv
+from datetime import date
+from io import StringIO
+
+import pytest
+
+from app.models import LeaveRequest, Team, User
+from app.reporting_routes import CSV_HEADER, build_leave_export_query, iter_leaves_csv
+
+
+@pytest.fixture
+def seeded_db(memory_db):
+    team = Team(name="Ops")
+    memory_db.add(team)
+    memory_db.flush()
+    manager = User(username="mgr", hashed_password="x", role="manager", team_id=team.id)
+    memory_db.add(manager)
+    memory_db.flush()
+    alice = User(username="alice", hashed_password="x", role="associate", team_id=team.id, reports_to_id=manager.id)
+    bob = User(username="bob", hashed_password="x", role="associate")
+    memory_db.add_all([alice, bob])
+    memory_db.flush()
+    memory_db.add_all([
+        LeaveRequest(user_id=alice.id, leave_type="AL", start_date=date(2025, 1, 6), end_date=date(2025, 1, 8), status="Approved"),
+        LeaveRequest(user_id=alice.id, leave_type="SL", start_date=date(2025, 3, 3), end_date=date(2025, 3, 3), status="Pending"),
+        LeaveRequest(user_id=bob.id, leave_type="AL", start_date=date(2025, 1, 31), end_date=date(2025, 2, 3), status="Approved"),
+    ])
+    memory_db.commit()
+    return memory_db
+
+
+def read_csv(chunks):
+    return list(csv.reader(StringIO("".join(chunks))))
+
+
+def test_export_streams_in_chunks(seeded_db):
+    chunks = list(iter_leaves_csv(seeded_db, build_leave_export_query(), chunk_rows=2))
+    assert len(chunks) == 2
+    rows = read_csv(chunks)
+    assert rows[0] == CSV_HEADER
+    assert rows[1:] == [
+        ["alice", "AL", "2025-01-06", "2025-01-08", "Approved"],
+        ["alice", "SL", "2025-03-03", "2025-03-03", "Pending"],
+        ["bob", "AL", "2025-01-31", "2025-02-03", "Approved"],
+    ]
+
+
+def test_export_filters(seeded_db, memory_sessions):
+    alice = seeded_db.query(User).filter_by(username="alice").one()
+    team_id, manager_id = alice.team_id, alice.reports_to_id
+
+    def usernames_and_types(**filters):
+        rows = read_csv(iter_leaves_csv(memory_sessions(), build_leave_export_query(**filters)))
+        return [(row[0], row[1]) for row in rows[1:]]
+
+    # Date range matches overlapping leaves, including ones that straddle the boundary
+    assert usernames_and_types(start_date=date(2025, 2, 1), end_date=date(2025, 2, 28)) == [("bob", "AL")]
+    assert usernames_and_types(team_id=team_id) == [("alice", "AL"), ("alice", "SL")]
+    assert usernames_and_types(manager_id=manager_id, status="Pending") == [("alice", "SL")]
+    assert read_csv(iter_leaves_csv(memory_sessions(), build_leave_export_query(status="Rejected"))) == [CSV_HEADER]
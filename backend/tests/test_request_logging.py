@@ -0,0 +1,94 @@
+import asyncio
+import json
+import logging
+import queue
+import sys
+
+from app.request_logging import (JsonFormatter, NonBlockingQueueHandler, RequestIDMiddleware, RequestIdFilter,
+                                 current_request_id)
+
+
+def run_asgi(app, path="/"):
+    """Drive one GET through a bare ASGI app; returns the messages it sent, in order"""
+    sent = []
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [(b"x-request-id", b"abc-1")]}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+def test_request_id_and_process_time_headers(client):
+    response = client.get("/health", headers={"X-Request-ID": "given-id"})
+    assert response.headers["x-request-id"] == "given-id"
+    assert float(response.headers["x-process-time"]) >= 0
+    assert len(client.get("/health").headers["x-request-id"]) == 36
+
+
+def test_streaming_bodies_pass_through_chunk_by_chunk():
+    events = []
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for chunk in (b"a,b\n", b"1,2\n"):
+            events.append(f"produced {chunk!r}")
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = RequestIDMiddleware(streaming_app)
+
+    async def recording_send_app(scope, receive, send):
+        async def send_and_record(message):
+            if message.get("body"):
+                events.append(f"sent {message['body']!r}")
+            await send(message)
+        await middleware(scope, receive, send_and_record)
+
+    sent = run_asgi(recording_send_app)
+    assert events == ["produced b'a,b\\n'", "sent b'a,b\\n'", "produced b'1,2\\n'", "sent b'1,2\\n'"]
+    assert (b"x-request-id", b"abc-1") in sent[0]["headers"]
+    assert current_request_id.get() is None
+
+
+def test_unhandled_errors_return_500_with_request_id():
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    sent = run_asgi(RequestIDMiddleware(failing_app))
+    assert sent[0]["status"] == 500
+    assert json.loads(sent[1]["body"]) == {"detail": "Internal server error", "request_id": "abc-1"}
+
+
+def test_json_records_carry_request_id_and_extra_fields():
+    record = logging.makeLogRecord({"name": "app.test", "levelname": "INFO", "msg": "done %s", "args": ("x",),
+                                    "status": 200})
+    token = current_request_id.set("req-9")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        current_request_id.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "done x"
+    assert entry["request_id"] == "req-9"
+    assert entry["status"] == 200
+    assert entry["logger"] == "app.test"
+
+
+def test_queued_records_keep_their_traceback_as_a_field():
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = logging.getLogger("app.test").makeRecord("app.test", logging.ERROR, __file__, 1, "failed %s", ("x",),
+                                                          sys.exc_info())
+    queued = NonBlockingQueueHandler(queue.Queue()).prepare(record)
+
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry["message"] == "failed x"
+    assert "ZeroDivisionError" in entry["exc_info"]
+    assert queued.exc_info is None
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+from passlib.hash import bcrypt
+from sqlalchemy import insert
+
+from app.models import OptionalLeaveDate, Team, User
+from app.response_cache import CachedResponse, accepted_encodings, data_version, response_cache
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def l5_headers(client, db):
+    if not db.query(User).filter_by(username="cache_l5").first():
+        l5 = User(username="cache_l5", hashed_password=bcrypt.hash("l5pass"), role="l5")
+        db.add(l5)
+        db.flush()
+        for i in range(4):
+            manager = User(username=f"cache_mgr{i}", hashed_password="x", role="manager", reports_to_id=l5.id)
+            db.add(manager)
+            db.flush()
+            db.add(Team(name=f"cache team with a long enough name {i}", manager_id=manager.id))
+        db.commit()
+    response = client.post("/auth/token", data={"username": "cache_l5", "password": "l5pass"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_encoding_negotiation():
+    assert accepted_encodings("gzip;q=1.0, br;q=0, identity") == ["gzip", "identity"]
+    entry = CachedResponse.build(b"x" * 2000)
+    assert entry.select("br;q=0, gzip")[0] == "gzip"
+    assert entry.select(None) == (None, entry.body)
+    assert CachedResponse.build(b"{}").variants == {}
+
+
+def test_writes_bump_the_data_version(db):
+    before = data_version(db)
+    db.add(OptionalLeaveDate(date=date(2029, 12, 24)))
+    db.commit()
+    after_flush = data_version(db)
+    db.execute(insert(Team), [{"name": "cache core insert team"}])
+    db.commit()
+    assert before < after_flush < data_version(db)
+
+
+def test_org_grid_is_served_precompressed_until_the_data_changes(client, db, l5_headers):
+    response_cache.backend.clear()
+    url = "/admin/admin/availability/next-30-days"
+    first = client.get(url, headers=l5_headers)
+    assert first.headers["x-cache"] == "MISS"
+
+    hit = client.get(url, headers={**l5_headers, "Accept-Encoding": "gzip"})
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.headers["content-encoding"] == "gzip"
+    assert hit.json() == first.json() and len(hit.json()) > 0
+
+    shared = client.get("/api/v1/leave/forecast/l5-30days", headers=l5_headers)
+    assert shared.headers["x-cache"] == "HIT"
+
+    assert client.get(url, headers={**l5_headers, "If-None-Match": hit.headers["etag"]}).status_code == 304
+
+    db.add(Team(name="cache team added later"))
+    db.commit()
+    assert client.get(url, headers=l5_headers).headers["x-cache"] == "MISS"
+
+    days = client.get("/api/v1/leave/optional-days", params={"year": 2029}, headers=l5_headers)
+    assert days.json() == {"year": 2029, "dates": ["2029-12-24"]}
+
+
+def test_scripts_that_never_import_the_app_still_bump_versions(tmp_path):
+    # bulk_import, seed and ad-hoc scripts only import the session factory and models
+    script = (
+        "from sqlalchemy import create_engine\n"
+        "from sqlalchemy.orm import Session\n"
+        "from app.database import Base\n"
+        "from app.models import Team\n"
+        "from app.data_versions import data_version\n"
+        f"engine = create_engine('sqlite:///{tmp_path / 'script.db'}')\n"
+        "Base.metadata.create_all(engine)\n"
+        "with Session(engine) as db:\n"
+        "    db.add(Team(name='scripted'))\n"
+        "    db.commit()\n"
+        "    print(data_version(db))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True)
+    assert result.stdout.strip() == "1", result.stderr
@@ -0,0 +1,82 @@
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import LeaveRequest, Team, User
+from app.response_cache import (ALL_TEAMS_SCOPE, CachedResponse, MmapBackend, data_versions, manager_scope,
+                                team_scope)
+from app.shared_cache import MmapStore, database_tag
+
+pytest.importorskip("fcntl")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_entries_written_by_one_worker_are_read_by_another(path):
+    writer, reader = MmapStore(path, size=256 * 1024, slots=64), MmapStore(path, size=256 * 1024, slots=64)
+    entry = CachedResponse.build(b'{"days": [' + b"1," * 900 + b"1]}")
+    MmapBackend(writer).set("team:1|next30", entry)
+
+    shared = MmapBackend(reader).get("team:1|next30")
+    assert shared.body == entry.body and shared.etag == entry.etag
+    assert shared.variants["gzip"] == entry.variants["gzip"]
+    assert reader.get("team:2|next30") is None
+
+
+def test_other_processes_see_the_entry(path):
+    MmapStore(path, size=256 * 1024, slots=64).set("k", b"from the parent")
+    code = f"from app.shared_cache import MmapStore; print(MmapStore({path!r}, size=256 * 1024, slots=64).get('k'))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "b'from the parent'"
+
+
+def test_ring_wrap_invalidates_overwritten_records(path):
+    store = MmapStore(path, size=64 * 1024, slots=16)
+    store.set("old", b"x" * 20000)
+    for i in range(4):
+        store.set(f"new{i}", b"y" * 20000)
+    assert store.get("old") is None
+    assert store.get("new3") == b"y" * 20000
+
+
+def test_each_database_gets_its_own_default_store(tmp_path, monkeypatch):
+    assert database_tag("sqlite:////srv/a/app.db") != database_tag("sqlite:////srv/b/app.db")
+    monkeypatch.chdir(tmp_path)
+    assert database_tag("sqlite:///app.db") == database_tag(f"sqlite:///{tmp_path / 'app.db'}")
+
+
+def test_leave_writes_bump_only_their_team_and_manager(client, db):
+    manager = User(username="stamp_mgr", hashed_password="x", role="manager")
+    db.add(manager)
+    db.flush()
+    team_a, team_b = Team(name="stamp team a", manager_id=manager.id), Team(name="stamp team b")
+    db.add_all([team_a, team_b])
+    db.flush()
+    associate = User(username="stamp_assoc", hashed_password="x", role="associate",
+                     team_id=team_a.id, reports_to_id=manager.id)
+    teammate = User(username="stamp_mate", hashed_password="x", role="associate", team_id=team_a.id)
+    db.add_all([associate, teammate])
+    db.commit()
+
+    scopes = [team_scope(team_a.id), team_scope(team_b.id), manager_scope(manager.id), ALL_TEAMS_SCOPE]
+    before = data_versions(db, scopes)
+    start = date.today() + timedelta(days=3)
+    db.add(LeaveRequest(user_id=associate.id, start_date=start, end_date=start, leave_type="AL", status="Approved"))
+    db.commit()
+    after = data_versions(db, scopes)
+
+    assert after[team_scope(team_a.id)] == before[team_scope(team_a.id)] + 1
+    assert after[manager_scope(manager.id)] == before[manager_scope(manager.id)] + 1
+    assert after[team_scope(team_b.id)] == before[team_scope(team_b.id)]
+    assert after[ALL_TEAMS_SCOPE] == before[ALL_TEAMS_SCOPE]
+
+    url = "/api/v1/leave/shrinkage/next30days"
+    assert client.get(url, params={"user_id": associate.id}).headers["x-cache"] == "MISS"
+    shared = client.get(url, params={"user_id": teammate.id})
+    assert shared.headers["x-cache"] == "HIT"
+    assert any(day["on_leave"] for day in shared.json())
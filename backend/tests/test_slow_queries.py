@@ -0,0 +1,55 @@
+import pytest
+from passlib.hash import bcrypt
+
+from app.models import LeaveRequest, User
+from app.slow_queries import full_scans, install_slow_query_hooks, redact_parameters, slow_query_log
+
+from .conftest import engine
+
+
+@pytest.fixture
+def record_everything(monkeypatch):
+    install_slow_query_hooks(engine)
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+    slow_query_log.clear()
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+def test_parameters_are_redacted_and_scans_detected():
+    assert redact_parameters(("alice@example.com", 7, None)) == ["<str:17>", "<int>", None]
+    assert redact_parameters({"name": "bob"}) == {"name": "<str:3>"}
+    plan = ["SCAN leave_requests", "SEARCH users USING INTEGER PRIMARY KEY (rowid=?)",
+            "SCAN thresholds USING INDEX ux_thresholds_user_month"]
+    assert full_scans(plan) == ["leave_requests"]
+
+
+def test_slow_statements_are_recorded_with_route_and_plan(client, db, record_everything):
+    route = "/api/v1/leave/shrinkage/next30days"
+    assert client.get(route, params={"user_id": 424242}).status_code == 200
+
+    entries = [e for e in record_everything.entries() if e["route"] == f"GET {route}"]
+    assert entries and all(e["plan"] for e in entries)
+    assert all("424242" not in str(e["parameters"]) for e in entries)
+
+    db.query(LeaveRequest).filter(LeaveRequest.leave_type == "AL").all()
+    latest = record_everything.entries(limit=1, full_scans_only=True)[0]
+    assert latest["route"] == "outside request"
+    assert latest["full_scans"] == ["leave_requests"]
+    assert latest["parameters"] == ["<str:2>"]
+
+
+def test_admin_endpoint_requires_l5(client, db, record_everything):
+    if not db.query(User).filter_by(username="slow_admin").first():
+        db.add(User(username="slow_admin", hashed_password=bcrypt.hash("adminpass"), role="l5"))
+        db.commit()
+    token = client.post("/auth/token", data={"username": "slow_admin", "password": "adminpass"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    body = client.get("/admin/admin/slow-queries", params={"limit": 5}, headers=headers).json()
+    assert body["threshold_ms"] == 0
+    assert 0 < len(body["entries"]) <= 5
+    assert body["entries"][0]["route"] == "GET /admin/admin/slow-queries"
+
+    assert client.delete("/admin/admin/slow-queries", headers=headers).status_code == 200
+    assert client.get("/admin/admin/slow-queries").status_code == 401
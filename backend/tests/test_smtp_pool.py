@@ -0,0 +1,64 @@
+import socket
+
+import pytest
+
+from app.smtp_pool import SMTPConnectionPool
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+
+class Handler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = Handler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield port, handler
+    controller.stop()
+
+
+def test_pool_reuses_sessions(smtp_server):
+    port, handler = smtp_server
+    pool = SMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=2)
+    for i in range(5):
+        pool.sendmail("leave@example.com", f"user{i}@example.com", "Subject: hi\r\n\r\nbody")
+    pool.close()
+
+    assert len(handler.messages) == 5
+    assert pool.stats()["connections_opened"] == 1
+    assert pool.stats()["messages_sent"] == 5
+
+
+def test_pool_reconnects_dropped_session(smtp_server):
+    port, handler = smtp_server
+    pool = SMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1)
+    pool.sendmail("leave@example.com", "a@example.com", "Subject: one\r\n\r\nbody")
+
+    # Simulate the relay dropping the idle session
+    pool._idle[0][0].close()
+    pool.sendmail("leave@example.com", "b@example.com", "Subject: two\r\n\r\nbody")
+    pool.close()
+
+    assert len(handler.messages) == 2
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_pool_replaces_idle_sessions(smtp_server):
+    port, _ = smtp_server
+    pool = SMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1, idle_timeout=0)
+    pool.sendmail("leave@example.com", "a@example.com", "Subject: one\r\n\r\nbody")
+    pool.sendmail("leave@example.com", "b@example.com", "Subject: two\r\n\r\nbody")
+    pool.close()
+
+    assert pool.stats()["connections_opened"] == 2
@@ -0,0 +1,45 @@
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+
+from app.models import LeaveRequest, Team, Threshold, User
+from app.synthetic_org import generate_org
+
+
+def generate(path, seed):
+    engine = create_engine(f"sqlite:///{path}")
+    summary = generate_org(engine, l5s=1, managers=3, associates=30, leaves_per_user=15, seed=seed,
+                           start=date(2026, 1, 1), end=date(2026, 6, 30), today=date(2026, 4, 1))
+    with engine.connect() as conn:
+        leaves = conn.execute(select(LeaveRequest.user_id, LeaveRequest.start_date, LeaveRequest.end_date,
+                                     LeaveRequest.leave_type, LeaveRequest.status)
+                              .order_by(LeaveRequest.id)).all()
+        approved = conn.execute(select(func.count()).where(LeaveRequest.status == "Approved")).scalar()
+        counted = conn.execute(select(func.sum(Threshold.leave_count))).scalar()
+        unmanaged = conn.execute(select(func.count()).where(Team.manager_id.is_(None))).scalar()
+        roles = dict(conn.execute(select(User.role, func.count()).group_by(User.role)).all())
+    engine.dispose()
+    return summary, leaves, approved, counted, unmanaged, roles
+
+
+def test_generator_is_deterministic_and_consistent(tmp_path):
+    summary, leaves, approved, counted, unmanaged, roles = generate(tmp_path / "a.db", seed=3)
+    assert summary["rows"]["leave_requests"] == 450
+    assert roles == {"l5": 1, "manager": 3, "associate": 30}
+    assert unmanaged == 0
+    assert approved == counted
+    assert {leave[3] for leave in leaves} <= {"AL", "CL", "Sick", "Optional"}
+    assert any(leave[4] == "Pending" and leave[1] >= date(2026, 4, 1) for leave in leaves)
+
+    assert generate(tmp_path / "b.db", seed=3)[1] == leaves
+    assert generate(tmp_path / "c.db", seed=4)[1] != leaves
+
+
+def test_fast_load_settings_do_not_outlive_the_load(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.connect() as conn:
+        defaults = [conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in ("journal_mode", "synchronous")]
+    generate_org(engine, l5s=1, managers=1, associates=2, leaves_per_user=2, seed=1)
+    with engine.connect() as conn:
+        assert [conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in ("journal_mode", "synchronous")] == defaults
+    engine.dispose()
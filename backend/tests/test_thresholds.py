@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.logic import (
+    decrement_leave_balance, decrement_monthly_leave_count, get_monthly_leave_counts,
+    increment_monthly_leave, reserve_leave_allowance, MONTHLY_LEAVE_LIMIT
+)
+from app.models import LeaveBalance, Threshold, User
+from app.schema_upgrade import upgrade_schema
+
+
+@pytest.fixture
+def seeded_db(memory_db):
+    memory_db.add_all([User(id=1, username="a", hashed_password="x", role="associate"),
+                       User(id=2, username="b", hashed_password="x", role="associate")])
+    memory_db.add(LeaveBalance(user_id=1, leave_type="AL", balance=3))
+    memory_db.commit()
+    return memory_db
+
+
+def test_increment_upserts_one_row_and_respects_limit(seeded_db):
+    assert increment_monthly_leave(seeded_db, 1, month="2026-05")
+    assert increment_monthly_leave(seeded_db, 1, month="2026-05")
+    assert not increment_monthly_leave(seeded_db, 1, limit=2, month="2026-05")
+    seeded_db.commit()
+    assert seeded_db.query(Threshold).filter_by(user_id=1).count() == 1
+    assert get_monthly_leave_counts(seeded_db, [1, 2], month="2026-05") == {1: 2, 2: 0}
+
+    decrement_monthly_leave_count(seeded_db, 1, month="2026-05")
+    decrement_monthly_leave_count(seeded_db, 1, month="2026-05")
+    decrement_monthly_leave_count(seeded_db, 1, month="2026-05")
+    assert get_monthly_leave_counts(seeded_db, [1], month="2026-05") == {1: 0}
+
+
+def test_balance_decrement_is_conditional(seeded_db):
+    assert decrement_leave_balance(seeded_db, 1, "AL", 2)
+    assert not decrement_leave_balance(seeded_db, 1, "AL", 2)
+    assert seeded_db.query(LeaveBalance.balance).filter_by(user_id=1).scalar() == 1
+
+
+def test_reserve_restores_balance_when_month_is_full(seeded_db):
+    for _ in range(MONTHLY_LEAVE_LIMIT):
+        increment_monthly_leave(seeded_db, 1)
+    assert reserve_leave_allowance(seeded_db, 1, "AL", 1) == "Monthly FCFS limit exceeded"
+    assert seeded_db.query(LeaveBalance.balance).filter_by(user_id=1).scalar() == 3
+    assert reserve_leave_allowance(seeded_db, 2, "AL", 1) == "Insufficient leave balance"
+
+
+def test_upgrade_folds_duplicate_counters():
+    old = create_engine("sqlite://", poolclass=StaticPool)
+    with old.begin() as conn:
+        conn.execute(text("CREATE TABLE thresholds (id INTEGER PRIMARY KEY, user_id INTEGER, month VARCHAR, "
+                          "leave_count INTEGER)"))
+        conn.execute(text("INSERT INTO thresholds (user_id, month, leave_count) VALUES "
+                          "(1, '2026-05', 2), (1, '2026-05', 3), (1, '2026-06', 1)"))
+    assert "ux_thresholds_user_month" in upgrade_schema(old)
+    with old.connect() as conn:
+        rows = conn.execute(text("SELECT user_id, month, leave_count FROM thresholds ORDER BY month")).all()
+    assert [tuple(r) for r in rows] == [(1, "2026-05", 5), (1, "2026-06", 1)]
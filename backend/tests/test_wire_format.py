@@ -0,0 +1,45 @@
+import json
+from datetime import date, timedelta
+
+from app.routes import FastJSONResponse
+from app.wire_format import COLUMNAR_MEDIA_TYPE, from_columnar, to_columnar, wants_columnar
+
+
+def forecast(days=30):
+    long_leave = {"username": "a", "leave_type": "AL", "is_half_day": False,
+                  "start_date": "2026-03-02", "end_date": "2026-03-13"}
+    half_day = {"username": "b", "leave_type": "Sick", "is_half_day": True,
+                "start_date": "2026-03-04", "end_date": "2026-03-04"}
+    rows = []
+    for i in range(days):
+        day = date(2026, 3, 2) + timedelta(days=i)
+        on_leave = [leave for leave in (long_leave, half_day)
+                    if leave["start_date"] <= day.isoformat() <= leave["end_date"]]
+        rows.append({"date": day.isoformat(), "day_name": day.strftime("%A"), "shrinkage": 10.0 * len(on_leave),
+                     "status": "Safe", "on_leave": on_leave, "is_weekend": day.weekday() >= 5})
+    return rows
+
+
+def test_columnar_round_trips_and_shares_leaves():
+    rows = forecast()
+    columnar = to_columnar(rows)
+    assert columnar["length"] == 30
+    assert len(columnar["leaves"]["username"]) == 2
+    assert columnar["columns"]["on_leave"][2] == [0, 1]
+    assert from_columnar(json.loads(FastJSONResponse(columnar).body)) == rows
+    assert len(FastJSONResponse(columnar).body) * 2 < len(FastJSONResponse(rows).body)
+
+
+def test_negotiation():
+    assert wants_columnar("columnar", None)
+    assert wants_columnar(None, f"{COLUMNAR_MEDIA_TYPE}, application/json")
+    assert not wants_columnar(None, "application/json")
+    assert not wants_columnar("rows", COLUMNAR_MEDIA_TYPE)
+
+
+def test_day_series_endpoint_honours_accept(client):
+    response = client.get("/api/v1/leave/shrinkage/next30days", params={"user_id": 999999},
+                          headers={"Accept": COLUMNAR_MEDIA_TYPE})
+    assert response.headers["content-type"].startswith(COLUMNAR_MEDIA_TYPE)
+    assert response.json()["format"] == "columnar"
+    assert client.get("/api/v1/leave/shrinkage/next30days", params={"user_id": 999999}).json() == []